@@ -6,11 +6,12 @@ MIPS assembly.
 from typing import *
 from assembly.common import *
 from common.compilerSupport import *
-from assembly.tacToTacSpill import tacToTacSpill
+from assembly.tacToTacSpill import tacToTacSpill, RegAlloc
 from assembly.tacSpillToMips import tacSpillToMips
 from assembly.tac_ast import *
 import common.utils as utils
 import common.log as log
+import common.timings as timings
 import common.genericCompiler as genCompiler
 import assembly.mipsPretty as mipsPretty
 from assembly.loopToTac import loopToTac
@@ -32,15 +33,17 @@ MIPS_END = """
   syscall
 """
 
-def compileFile(args: genCompiler.Args):
+def compileFile(args: genCompiler.Args, optLevel: int = 0, regAlloc: RegAlloc = 'coloring'):
     log.info(f'Compiling {args.input} to assembly file {args.output}, args={args}')
-    tacInstrs = loopToTac(args)
+    tacInstrs = loopToTac(args, optLevel)
     log.debug('TAC:\n' + tacPretty.prettyInstrs(tacInstrs))
     maxRegs = args.maxRegisters if args.maxRegisters is not None else MAX_REGISTERS
-    tacSpillInstrs = tacToTacSpill(tacInstrs, maxRegs)
+    tacSpillInstrs = tacToTacSpill(tacInstrs, maxRegs, regAlloc)
     log.debug('TAC spill:\n' + tacSpillPretty.prettyInstrs(tacSpillInstrs))
-    mipsInstrs = tacSpillToMips(tacSpillInstrs)
-    s = mipsPretty.mipsPretty(mipsInstrs)
-    utils.writeTextFile(args.output, MIPS_START + s + MIPS_END)
+    with timings.phase('MIPS selection'):
+        mipsInstrs = tacSpillToMips(tacSpillInstrs)
+    with timings.phase('render MIPS'):
+        s = mipsPretty.mipsPretty(mipsInstrs)
+        utils.writeTextFile(args.output, MIPS_START + s + MIPS_END)
     log.info(f'Wrote assembly file {args.output}')
 
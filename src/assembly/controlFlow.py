@@ -3,9 +3,9 @@ This module exports the function `buildControlFlowGraph` which translates a list
 of TAC instructions into a control flow graph.
 """
 
-import assembly.tac_ast as tac
 from typing import *
 from assembly.common import *
+import assembly.tac_ast as tac
 import common.log as log
 
 def _firstBasicBlock(instrs: list[tac.instr], blockIdx: int) -> tuple[BasicBlock, list[tac.instr]]:
@@ -73,6 +73,14 @@ class Graph[V, T]:
             return list(self.__edges[v])
         else:
             return []
+    def degree(self, v: V) -> int:
+        """
+        Returns the number of edges starting at vertex v. Runs in constant time.
+        """
+        if v in self.__edges:
+            return len(self.__edges[v])
+        else:
+            return 0
     @property
     def edges(self) -> list[tuple[V, V]]:
         """
@@ -0,0 +1,83 @@
+"""
+This module implements register allocation by linear scan (Poletto and Sarkar, 1999),
+an alternative to graph coloring that does not need an interference graph.
+
+The instructions of the control flow graph are numbered in the order of the basic blocks.
+The live interval of a variable ranges from the first to the last point where the variable
+is live (according to the liveness analysis) or defined. Intervals are processed in order
+of their start. If no register is free, the interval ending last is spilled.
+
+Intervals are an over-approximation of liveness, so the allocation usually spills more
+variables than graph coloring, but it runs in O(n log n) for n variables.
+"""
+
+from typing import *
+from dataclasses import dataclass
+import heapq
+from assembly.common import *
+import assembly.tac_ast as tac
+import common.log as log
+import common.utils as utils
+
+@dataclass
+class Interval:
+    var: tac.ident
+    start: int
+    end: int
+
+def liveIntervals(g: ControlFlowGraph) -> list[Interval]:
+    """
+    Computes the live intervals of all variables, sorted by start. The point before
+    instruction k has number 2k, the point after has number 2k+1.
+    """
+    liveness = utils.importModuleNotInStudent('compilers.assembly.liveness')
+    builder = liveness.InterfGraphBuilder()
+    builder.liveness(g)
+    intervals: dict[tac.ident, Interval] = {}
+    def extend(x: tac.ident, point: int):
+        i = intervals.get(x)
+        if i is None:
+            intervals[x] = Interval(x, point, point)
+        else:
+            i.start = min(i.start, point)
+            i.end = max(i.end, point)
+    k = 0
+    for idx in sorted(g.vertices):
+        bb = g.getData(idx)
+        for (j, instr) in enumerate(bb.instrs):
+            for x in builder.before.get((idx, j), set()) | liveness.instrUse(instr):
+                extend(x, 2 * k)
+            for x in builder.after.get((idx, j), set()) | liveness.instrDef(instr):
+                extend(x, 2 * k + 1)
+            k += 1
+    return sorted(intervals.values(), key=lambda i: (i.start, i.end, i.var.name))
+
+def linearScan(g: ControlFlowGraph, maxRegs: int=MAX_REGISTERS) -> RegisterMap:
+    """
+    Allocates at most maxRegs registers for the variables of g.
+    """
+    log.debug(f'Linear scan register allocation with maxRegs={maxRegs}')
+    regs: dict[tac.ident, int] = {}
+    free = list(range(maxRegs))
+    # active intervals with a register, as a heap ordered by end
+    active: list[tuple[int, str, Interval]] = []
+    for i in liveIntervals(g):
+        while active and active[0][0] < i.start:
+            (_, _, old) = heapq.heappop(active)
+            heapq.heappush(free, regs[old.var])
+        if free:
+            regs[i.var] = heapq.heappop(free)
+            heapq.heappush(active, (i.end, i.var.name, i))
+            continue
+        # spill the interval ending last
+        last = max(active, key=lambda a: (a[0], a[1]), default=None)
+        if last is not None and last[0] > i.end:
+            (_, _, spilled) = last
+            active.remove(last)
+            heapq.heapify(active)
+            regs[i.var] = regs[spilled.var]
+            regs[spilled.var] = -1
+            heapq.heappush(active, (i.end, i.var.name, i))
+        else:
+            regs[i.var] = -1
+    return RegisterAllocMap(regs, maxRegs)
@@ -10,18 +10,31 @@ from assembly.tac_ast import *
 import common.log as log
 import common.genericCompiler as genCompiler
 import assembly.wasmToTac as wasmToTac
-import common.sexp as sexp
+import assembly.tacOptimize as tacOptimize
+import io
+import dataclasses
+import common.timings as timings
 import common.utils as utils
 
-def loopToTac(args: genCompiler.Args) -> list[tac.instr]:
+def loopToTac(args: genCompiler.Args, optLevel: int = 0) -> list[tac.instr]:
+    """
+    The wasm code is always compiled without optimizations (args.optLevel is ignored)
+    because the translation to TAC supports only the unoptimized instructions. With
+    optLevel >= 1, the TAC is optimized afterwards.
+    """
     c = utils.importModuleNotInStudent('compilers.lang_loop.loop_compiler')
     import lang_loop.loop_ast as ast
     log.debug(f'Generating TAC from {args.input}')
-    wasmMod = genCompiler.compileMain(args, c.compileModule, ast)
+    wasmMod = genCompiler.compileMain(dataclasses.replace(args, optLevel=0), c.compileModule, ast)
     wasmInstrs = wasmMod.funcs[0].instrs
-    wasmCode = sexp.renderSExp(wasmMod.render())
-    log.debug('Wasm instructions:\n' + wasmCode)
-    (res, tacInstrs) = wasmToTac.wasmToTac(wasmToTac.downcast(wasmInstrs))
+    wasmCode = io.StringIO()
+    wasmMod.write(wasmCode)
+    log.debug('Wasm instructions:\n' + wasmCode.getvalue())
+    with timings.phase('wasm to TAC'):
+        (res, tacInstrs) = wasmToTac.wasmToTac(wasmToTac.downcast(wasmInstrs))
     if res is not None:
         raise ValueError(f'Value returned from tac.toTac is not None: {res}')
+    if optLevel >= 1:
+        with timings.phase('TAC optimize'):
+            tacInstrs = tacOptimize.optimizeInstrs(tacInstrs)
     return tacInstrs
@@ -3,6 +3,7 @@ An interpreter for TAC.
 """
 from assembly.tac_ast import *
 import common.utils as utils
+import common.timings as timings
 import common.genericCompiler as genCompiler
 import assembly.tacPretty as tacPretty
 from assembly.loopToTac import loopToTac
@@ -74,12 +75,13 @@ def interpInstrs(instrs: list[instr]):
             case Label(_):
                 pc += 1
 
-def interpFile(args: genCompiler.Args, printTac: bool):
-    tacInstrs = loopToTac(args)
+def interpFile(args: genCompiler.Args, printTac: bool, optLevel: int = 0):
+    tacInstrs = loopToTac(args, optLevel)
     if printTac:
         halfDelim = '-----------------------------'
         delim = f'{halfDelim} TAC {halfDelim}'
         print(delim)
         print(tacPretty.prettyInstrs(tacInstrs))
         print(delim)
-    interpInstrs(tacInstrs)
+    with timings.phase('TAC interp'):
+        interpInstrs(tacInstrs)
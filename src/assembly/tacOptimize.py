@@ -0,0 +1,276 @@
+"""
+This module implements optimizations on TAC, performed before register allocation.
+Entry point is the function `optimizeInstrs`.
+
+The optimizations work on the control flow graph and are repeated until nothing changes:
+
+- Constant and copy propagation: a use of x is replaced by c (or y) if, on all paths to
+  the use, the last assignment to x is x = c (or x = y and y was not reassigned since).
+- Constant folding of binary operators with two constant operands. A conditional jump
+  with a constant test becomes an unconditional jump or is removed.
+- Dead assignment elimination: assignments to variables that are not live afterwards are
+  removed. Calls are never removed, they have side effects.
+- Removal of jumps to the label directly following the jump, and of code directly after
+  an unconditional jump.
+
+Fewer temporaries mean less register pressure and thus fewer spills.
+"""
+
+from typing import *
+from assembly.common import *
+import assembly.tac_ast as tac
+import assembly.controlFlow as controlFlow
+import common.log as log
+
+type Facts = dict[tac.ident, tac.prim]
+
+def _bi(b: bool) -> int:
+    return 1 if b else 0
+
+_FOLD: dict[str, Callable[[int, int], int]] = {
+    'ADD': lambda a, b: a + b,
+    'SUB': lambda a, b: a - b,
+    'MUL': lambda a, b: a * b,
+    'EQ': lambda a, b: _bi(a == b),
+    'NE': lambda a, b: _bi(a != b),
+    'LT_S': lambda a, b: _bi(a < b),
+    'GT_S': lambda a, b: _bi(a > b),
+    'LE_S': lambda a, b: _bi(a <= b),
+    'GE_S': lambda a, b: _bi(a >= b),
+}
+
+def optimizeInstrs(instrs: list[tac.instr]) -> list[tac.instr]:
+    """
+    Optimizes the given TAC instructions and reports the number of removed instructions.
+    """
+    n = len(instrs)
+    while True:
+        g = controlFlow.buildControlFlowGraph(instrs)
+        _propagate(g)
+        _removeDeadAssigns(g)
+        new = _removeJumpsToNext(_flatten(g))
+        if new == instrs:
+            break
+        instrs = new
+    log.info(f'TAC optimizer removed {n - len(instrs)} of {n} instructions')
+    return instrs
+
+def _flatten(g: ControlFlowGraph) -> list[tac.instr]:
+    """
+    Turns g back into a list of instructions, dropping unreachable blocks without labels
+    (code directly after an unconditional jump).
+    """
+    preds = _preds(g)
+    res: list[tac.instr] = []
+    for i in sorted(g.vertices):
+        bb = g.getData(i)
+        if i != 0 and not bb.labels and not preds[i]:
+            continue
+        res.extend(tac.Label(l) for l in bb.labels)
+        res.extend(bb.instrs)
+    return res
+
+def _preds(g: ControlFlowGraph) -> dict[int, list[int]]:
+    preds: dict[int, list[int]] = {v: [] for v in g.vertices}
+    for (src, tgt) in g.edges:
+        preds[tgt].append(src)
+    return preds
+
+# Constant and copy propagation ----------------------------------------------------------
+
+def _propagate(g: ControlFlowGraph):
+    """
+    Forward dataflow analysis computing, for the start of each block, which variables hold
+    a known constant or a copy of another variable. Afterwards, the uses in each block are
+    rewritten according to these facts.
+    """
+    preds = _preds(g)
+    vertices = sorted(g.vertices)
+    # None means that the block has not been reached yet
+    facts: dict[int, Optional[Facts]] = {v: None for v in vertices}
+    changed = True
+    while changed:
+        changed = False
+        for v in vertices:
+            inFacts = _meet([facts[p] for p in preds[v]] + ([{}] if v == 0 else []))
+            bb = g.getData(v)
+            outFacts = _transferBlock(bb.instrs, inFacts)
+            if outFacts != facts[v]:
+                facts[v] = outFacts
+                changed = True
+    for v in vertices:
+        inFacts = _meet([facts[p] for p in preds[v]] + ([{}] if v == 0 else []))
+        bb = g.getData(v)
+        bb.instrs = _rewriteBlock(bb.instrs, inFacts)
+
+def _meet(l: list[Optional[Facts]]) -> Facts:
+    known = [f for f in l if f is not None]
+    if not known:
+        return {}
+    res = dict(known[0])
+    for f in known[1:]:
+        for x in list(res):
+            if f.get(x) != res[x]:
+                del res[x]
+    return res
+
+def _kill(x: tac.ident, facts: Facts):
+    facts.pop(x, None)
+    for (y, p) in list(facts.items()):
+        if p == tac.Name(x):
+            del facts[y]
+
+def _transferBlock(instrs: list[tac.instr], facts: Facts) -> Facts:
+    facts = dict(facts)
+    for i in instrs:
+        _step(_rewriteInstr(i, facts), facts)
+    return facts
+
+def _step(i: tac.instr, facts: Facts):
+    """
+    Updates facts with the effect of the (already rewritten) instruction i.
+    """
+    match i:
+        case tac.Assign(x, e):
+            _kill(x, facts)
+            match e:
+                case tac.Prim(p) if p != tac.Name(x):
+                    facts[x] = p
+                case _:
+                    pass
+        case tac.Call(x, _, _) if x is not None:
+            _kill(x, facts)
+        case _:
+            pass
+
+def _rewriteBlock(instrs: list[tac.instr], facts: Facts) -> list[tac.instr]:
+    facts = dict(facts)
+    res: list[tac.instr] = []
+    for i in instrs:
+        i = _rewriteInstr(i, facts)
+        _step(i, facts)
+        match i:
+            case tac.Assign(x, tac.Prim(tac.Name(y))) if x == y:
+                pass
+            case tac.GotoIf(tac.Const(0), _):
+                pass
+            case tac.GotoIf(tac.Const(_), label):
+                res.append(tac.Goto(label))
+            case _:
+                res.append(i)
+    return res
+
+def _rewritePrim(p: tac.prim, facts: Facts) -> tac.prim:
+    match p:
+        case tac.Name(x) if x in facts:
+            return facts[x]
+        case _:
+            return p
+
+def _rewriteInstr(i: tac.instr, facts: Facts) -> tac.instr:
+    match i:
+        case tac.Assign(x, tac.Prim(p)):
+            return tac.Assign(x, tac.Prim(_rewritePrim(p, facts)))
+        case tac.Assign(x, tac.BinOp(l, op, r)):
+            l = _rewritePrim(l, facts)
+            r = _rewritePrim(r, facts)
+            match (l, r):
+                case (tac.Const(a), tac.Const(b)) if op.name in _FOLD:
+                    return tac.Assign(x, tac.Prim(tac.Const(_FOLD[op.name](a, b))))
+                case _:
+                    return tac.Assign(x, tac.BinOp(l, op, r))
+        case tac.Call(x, f, args):
+            return tac.Call(x, f, [_rewritePrim(a, facts) for a in args])
+        case tac.GotoIf(test, label):
+            return tac.GotoIf(_rewritePrim(test, facts), label)
+        case _:
+            return i
+
+# Dead assignment elimination ------------------------------------------------------------
+
+def _primUses(p: tac.prim) -> set[tac.ident]:
+    match p:
+        case tac.Name(x):
+            return {x}
+        case tac.Const():
+            return set()
+
+def _uses(i: tac.instr) -> set[tac.ident]:
+    match i:
+        case tac.Assign(_, tac.Prim(p)):
+            return _primUses(p)
+        case tac.Assign(_, tac.BinOp(l, _, r)):
+            return _primUses(l) | _primUses(r)
+        case tac.Call(_, _, args):
+            return set[tac.ident]().union(*[_primUses(a) for a in args])
+        case tac.GotoIf(test, _):
+            return _primUses(test)
+        case _:
+            return set()
+
+def _defs(i: tac.instr) -> set[tac.ident]:
+    match i:
+        case tac.Assign(x, _):
+            return {x}
+        case tac.Call(x, _, _) if x is not None:
+            return {x}
+        case _:
+            return set()
+
+def _liveIn(instrs: list[tac.instr], liveOut: set[tac.ident]) -> set[tac.ident]:
+    live = set(liveOut)
+    for i in reversed(instrs):
+        live = (live - _defs(i)) | _uses(i)
+    return live
+
+def _removeDeadAssigns(g: ControlFlowGraph):
+    vertices = sorted(g.vertices, reverse=True)
+    liveIn: dict[int, set[tac.ident]] = {v: set() for v in vertices}
+    changed = True
+    while changed:
+        changed = False
+        for v in vertices:
+            out = set[tac.ident]().union(*[liveIn[w] for w in g.succs(v)])
+            new = _liveIn(g.getData(v).instrs, out)
+            if new != liveIn[v]:
+                liveIn[v] = new
+                changed = True
+    for v in vertices:
+        bb = g.getData(v)
+        live = set[tac.ident]().union(*[liveIn[w] for w in g.succs(v)])
+        res: list[tac.instr] = []
+        for i in reversed(bb.instrs):
+            match i:
+                case tac.Assign(x, _) if x not in live:
+                    continue
+                case _:
+                    pass
+            live = (live - _defs(i)) | _uses(i)
+            res.append(i)
+        bb.instrs = list(reversed(res))
+
+# Jumps ----------------------------------------------------------------------------------
+
+def _removeJumpsToNext(instrs: list[tac.instr]) -> list[tac.instr]:
+    """
+    Removes jumps to one of the labels directly following the jump.
+    """
+    res: list[tac.instr] = []
+    for idx, i in enumerate(instrs):
+        match i:
+            case tac.Goto(label) | tac.GotoIf(_, label) if label in _labelsAt(instrs, idx + 1):
+                pass
+            case _:
+                res.append(i)
+    return res
+
+def _labelsAt(instrs: list[tac.instr], idx: int) -> set[str]:
+    res: set[str] = set()
+    while idx < len(instrs):
+        match instrs[idx]:
+            case tac.Label(l):
+                res.add(l)
+                idx += 1
+            case _:
+                break
+    return res
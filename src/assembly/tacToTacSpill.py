@@ -2,8 +2,9 @@
 This module provides the transformation from TAC to TACspill.
 It first turn the TAC program into a control flow graph, then
 computes variable interference graph from, then performs
-register allocation by graph coloring, and then assigns
-variable to register. Some variables potentially require spilling.
+register allocation by graph coloring (or by linear scan, see
+assembly.linearScan), and then assigns variable to register. Some
+variables potentially require spilling.
 
 The resulting TACspill program use MIPS register names as variable
 names. It uses at most as many $s registers as specified in the
@@ -24,9 +25,11 @@ import assembly.mips_ast as mips
 from typing import *
 from assembly.common import *
 import assembly.controlFlow as controlFlow
+import assembly.linearScan as linearScan
 import assembly.loopToTac as asCommon
 from common.compilerSupport import *
 import common.utils as utils
+import common.timings as timings
 
 class Regs:
     t0 = tacSpill.Ident('$t0')
@@ -98,14 +101,25 @@ def spillInstr(i: tac.instr, regMap: RegisterMap) -> list[tacSpill.instr]:
         case tac.Label(label):
             return [tacSpill.Label(label)]
 
-def tacToTacSpill(instrs: list[tac.instr], maxRegs: int=asCommon.MAX_REGISTERS) -> list[tacSpill.instr]:
-    log.info(f'Starting TAC to TACspill transformation, maxRegs={maxRegs}')
-    liveness =  utils.importModuleNotInStudent('compilers.assembly.liveness')
-    graphColoring = utils.importModuleNotInStudent('compilers.assembly.graphColoring')
-    ctrlFlowG = controlFlow.buildControlFlowGraph(instrs)
+type RegAlloc = Literal['coloring', 'linear']
+
+def tacToTacSpill(instrs: list[tac.instr], maxRegs: int=asCommon.MAX_REGISTERS,
+                  regAlloc: RegAlloc='coloring') -> list[tacSpill.instr]:
+    log.info(f'Starting TAC to TACspill transformation, maxRegs={maxRegs}, regAlloc={regAlloc}')
+    with timings.phase('control flow graph'):
+        ctrlFlowG = controlFlow.buildControlFlowGraph(instrs)
     log.debug(f'control flow graph: {ctrlFlowG}')
-    interfGraph = liveness.buildInterfGraph(ctrlFlowG)
-    log.debug(f'interference graph: {interfGraph}')
-    regMap = graphColoring.colorInterfGraph(interfGraph, maxRegs=maxRegs)
+    if regAlloc == 'linear':
+        with timings.phase('linear scan'):
+            regMap = linearScan.linearScan(ctrlFlowG, maxRegs=maxRegs)
+    else:
+        liveness =  utils.importModuleNotInStudent('compilers.assembly.liveness')
+        graphColoring = utils.importModuleNotInStudent('compilers.assembly.graphColoring')
+        with timings.phase('liveness'):
+            interfGraph = liveness.buildInterfGraph(ctrlFlowG)
+        log.debug(f'interference graph: {interfGraph}')
+        with timings.phase('coloring'):
+            regMap = graphColoring.colorInterfGraph(interfGraph, maxRegs=maxRegs)
     log.debug(f'Register map: {regMap}')
-    return [x for i in instrs for x in spillInstr(i, regMap)]
+    with timings.phase('spilling'):
+        return [x for i in instrs for x in spillInstr(i, regMap)]
@@ -8,11 +8,18 @@ from typing import *
 import assembly.tac_ast as tac
 from common.utils import assertNotNone
 
-class _Emitter:
+class _LabelCounter:
+    """
+    Shared by all emitters of one translation, so that labels are unique.
+    """
     def __init__(self):
+        self.count: int = 0
+
+class _Emitter:
+    def __init__(self, labels: _LabelCounter):
         self.instrs: list[tac.instr] = []
         self.regCount: int = 0
-        self.labelCount: int = 0
+        self.labels = labels
     def emit(self, i: tac.instr):
         self.instrs.append(i)
     def add(self, l: list[tac.instr]):
@@ -22,21 +29,26 @@ class _Emitter:
         self.regCount = i + 1
         return tac.Ident(f'%R{i}')
     def freshLabel(self, hint: str) -> str:
-        i = self.labelCount
-        self.labelCount = self.labelCount + 1
+        i = self.labels.count
+        self.labels.count = i + 1
         return f'L_{hint}_{i}'
+    def toTac(self, instrs: list[WasmInstrL]) -> tuple[Optional[tac.prim], list[tac.instr]]:
+        return _toTacR(list(reversed(instrs)), self.labels)
 
 def wasmToTac(instrs: list[WasmInstrL]) -> tuple[Optional[tac.prim], list[tac.instr]]:
-    return _toTacR(list(reversed(instrs)))
+    return _toTacR(list(reversed(instrs)), _LabelCounter())
 
-def _toTacR(rInstrs: list[WasmInstrL]) -> tuple[Optional[tac.prim], list[tac.instr]]:
-    e = _Emitter()
+def _toTacR(rInstrs: list[WasmInstrL], labels: _LabelCounter) -> tuple[Optional[tac.prim], list[tac.instr]]:
+    e = _Emitter(labels)
     (val, rest) = _toTacSingle(rInstrs, None, e)
-    if rest:
-        (_, l) = _toTacR(rest)
-    else:
-        l = []
-    return (val, l + e.instrs)
+    # The instructions in rest come before those of e. A loop instead of recursion,
+    # so that long instruction sequences do not exceed the recursion limit.
+    chunks = [e.instrs]
+    while rest:
+        e = _Emitter(labels)
+        (_, rest) = _toTacSingle(rest, None, e)
+        chunks.append(e.instrs)
+    return (val, [i for c in reversed(chunks) for i in c])
 
 def _callInfo(id: WasmId) -> tuple[int, bool]:
     """
@@ -106,15 +118,15 @@ def _toTacSingle(rInstrs: list[WasmInstrL], targetVar: Optional[tac.ident], e: _
             (val, rest) = _toTacSingleNotNone(rest, None, e)
             labelEnd = e.freshLabel('end')
             e.emit(tac.GotoIf(val, labelEnd))
-            (_, elseInstrsTac) = wasmToTac(downcast(elseInstrs))
+            (_, elseInstrsTac) = e.toTac(downcast(elseInstrs))
             e.add(elseInstrsTac)
             e.emit(tac.Label(labelEnd))
             return (None, rest)
         case [WasmInstrIf(resTy, thenInstrs, elseInstrs), *rest]:
             (val, rest) = _toTacSingleNotNone(rest, None, e)
             targetReg = targetVar or e.freshReg()
-            (valElse, elseInstrsTac) = wasmToTac(downcast(elseInstrs))
-            (valThen, thenInstrsTac) = wasmToTac(downcast(thenInstrs))
+            (valElse, elseInstrsTac) = e.toTac(downcast(elseInstrs))
+            (valThen, thenInstrsTac) = e.toTac(downcast(thenInstrs))
             labelThen = e.freshLabel('then')
             labelEnd = e.freshLabel('end')
             e.emit(tac.GotoIf(val, labelThen))
@@ -132,12 +144,12 @@ def _toTacSingle(rInstrs: list[WasmInstrL], targetVar: Optional[tac.ident], e: _
             else:
                 return (None, rest)
         case [WasmInstrLoop(label, body), *rest]:
-            (_, instrsTac) = wasmToTac(downcast(body))
+            (_, instrsTac) = e.toTac(downcast(body))
             e.emit(tac.Label(label.id))
             e.add(instrsTac)
             return (None, rest)
         case [WasmInstrBlock(label, resultTy, body), *rest]:
-            (val, instrsTac) = wasmToTac(downcast(body))
+            (val, instrsTac) = e.toTac(downcast(body))
             e.add(instrsTac)
             if resultTy is not None:
                 targetReg = targetVar or e.freshReg()
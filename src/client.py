@@ -0,0 +1,18 @@
+"""
+Thin client for the compile server started with `python src/main.py serve`.
+It accepts the same commandline arguments as src/main.py. If no server is running,
+the request is handled in the current process.
+"""
+import sys
+import common.compileServer as compileServer
+
+def main():
+    code = compileServer.runClient(compileServer.defaultSocketPath(), sys.argv[1:])
+    if code is None:
+        import main as localMain
+        localMain.main()
+    else:
+        sys.exit(code)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Compiles many input files in parallel with a pool of worker processes.
+Each worker imports the compiler modules only once and then reuses them for
+all files it is asked to compile.
+"""
+from __future__ import annotations
+from typing import *
+from dataclasses import dataclass
+import concurrent.futures
+import io
+import os
+import sys
+import time
+import traceback
+import shell
+import common.constants as constants
+import common.genericCompiler as genericCompiler
+import common.log as log
+import common.utils as utils
+from common.compileServer import exitCodeOf
+from common.langModules import importModule, getFun
+
+@dataclass(frozen=True)
+class BatchJob:
+    lang: str
+    args: genericCompiler.Args
+
+@dataclass(frozen=True)
+class BatchResult:
+    job: BatchJob
+    exitcode: int
+    stderr: str
+    seconds: float
+    @property
+    def ok(self) -> bool:
+        return self.exitcode == 0
+
+def compileJob(job: BatchJob) -> BatchResult:
+    """
+    Compiles a single file, capturing the output on stderr and the exit code.
+    Runs inside a worker process.
+    """
+    start = time.perf_counter()
+    err = io.StringIO()
+    oldStderr = sys.stderr
+    oldStreams = log.setConsoleStream(err)
+    sys.stderr = err
+    try:
+        ast = importModule(job.lang, 'ast')
+        compilerMod = importModule(job.lang, 'compile')
+        compileFun = getFun(compilerMod, 'compileModule')
+        genericCompiler.compileMain(job.args, compileFun, ast)
+        code = 0
+    except SystemExit as e:
+        code = exitCodeOf(e)
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stderr = oldStderr
+        log.restoreConsoleStream(oldStreams)
+    return BatchResult(job, code, err.getvalue(), time.perf_counter() - start)
+
+def collectInputs(inputs: list[str]) -> list[tuple[str, str]]:
+    """
+    Expands directories to the .py files they contain. Returns a list of pairs
+    (input file, path of the input relative to the directory given on the commandline).
+    Aborts if two inputs have the same relative path (without extension), because their
+    results would overwrite each other in the output directory.
+    """
+    res: list[tuple[str, str]] = []
+    for i in inputs:
+        if shell.isDir(i):
+            for root, dirs, files in os.walk(i):
+                dirs.sort()
+                for f in sorted(files):
+                    if f.endswith('.py') and not f.startswith('.'):
+                        p = shell.pjoin(root, f)
+                        res.append((p, os.path.relpath(p, i)))
+        else:
+            res.append((i, shell.basename(i)))
+    seen: dict[str, str] = {}
+    for (p, relPath) in res:
+        key = shell.removeExt(relPath)
+        other = seen.setdefault(key, p)
+        if other != p:
+            utils.abort(f'Inputs {other} and {p} would both be compiled to {key} in the output '
+                        'directory')
+    return res
+
+def outputFile(outputDir: str, relPath: str, ext: str) -> str:
+    return shell.pjoin(outputDir, shell.removeExt(relPath) + ext)
+
+def runJobs(jobs: list[BatchJob], maxWorkers: Optional[int]=None,
+            onResult: Callable[[BatchResult], None]=lambda _: None) -> list[BatchResult]:
+    """
+    Runs all jobs in a process pool. onResult is called for each result as soon as
+    it is available. The results are returned in the order of jobs.
+    """
+    results: dict[int, BatchResult] = {}
+    if maxWorkers == 1 or len(jobs) <= 1:
+        for i, j in enumerate(jobs):
+            results[i] = compileJob(j)
+            onResult(results[i])
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=maxWorkers) as pool:
+            futures = {pool.submit(compileJob, j): i for i, j in enumerate(jobs)}
+            for f in concurrent.futures.as_completed(futures):
+                r = f.result()
+                results[futures[f]] = r
+                onResult(r)
+    return [results[i] for i in range(len(jobs))]
+
+def batchExitCode(results: list[BatchResult]) -> int:
+    """
+    0 if all files compiled, COMPILE_ERROR_EXIT_CODE if all failures are compile errors,
+    1 otherwise.
+    """
+    codes = set(r.exitcode for r in results if not r.ok)
+    if not codes:
+        return 0
+    elif codes == {constants.COMPILE_ERROR_EXIT_CODE}:
+        return constants.COMPILE_ERROR_EXIT_CODE
+    else:
+        return 1
+
+def printResult(r: BatchResult):
+    ms = round(r.seconds * 1000)
+    if r.ok:
+        print(f'OK      {r.job.args.input} -> {r.job.args.output} ({ms}ms)')
+    else:
+        lines = r.stderr.strip().splitlines()
+        firstLine = lines[0] if lines else ''
+        print(f'FAILED  {r.job.args.input} (exit code {r.exitcode}, {ms}ms): {firstLine}')
+
+def batchMain(jobs: list[BatchJob], maxWorkers: Optional[int]) -> int:
+    """
+    Compiles all jobs, prints the status of each file and a summary. Returns the exit code.
+    """
+    start = time.perf_counter()
+    results = runJobs(jobs, maxWorkers, printResult)
+    total = time.perf_counter() - start
+    failed = len([r for r in results if not r.ok])
+    rate = len(results) / total if total > 0 else 0
+    print(f'Compiled {len(results) - failed} of {len(results)} files in {total:.2f}s ' \
+          f'({rate:.1f} files/s), {failed} failed')
+    return batchExitCode(results)
@@ -0,0 +1,198 @@
+"""
+A content-addressed cache for compiled artifacts (.wat, .wasm, and the pickled WasmModule).
+
+The key of an entry is a hash over the source file, all python and grammar files of the
+compiler, and all settings affecting the output (see cacheKey).
+Thus, changing the compiler invalidates all entries produced by the old version.
+
+Each entry is a directory inside the cache directory. Entries are written to a temporary
+directory first and then renamed, so concurrent compiler processes never see partial
+entries. The modification time of an entry directory is updated on every hit; if the total
+size of the cache exceeds its limit, the least recently used entries are removed.
+"""
+from __future__ import annotations
+from typing import *
+from dataclasses import dataclass
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import common.log as log
+
+CACHE_DIR_ENV_VAR = 'MINIPY_CACHE_DIR'
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024 # 256MB
+# Scanning the cache for eviction is done at most once in this many seconds
+EVICT_INTERVAL = 60
+
+_SRC_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def defaultCacheDir() -> str:
+    """
+    Returns the cache directory, either from the environment variable MINIPY_CACHE_DIR
+    or a per-user default.
+    """
+    p = os.environ.get(CACHE_DIR_ENV_VAR)
+    if p:
+        return p
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'minipy')
+
+def _fileHash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def compilerFiles() -> list[str]:
+    """
+    Returns all python and grammar files of this repository. The list does not depend on the
+    modules loaded, so all processes (command line, compile server, batch workers) agree on it.
+    """
+    files: list[str] = []
+    for (d, dirs, names) in os.walk(_SRC_ROOT):
+        dirs[:] = [x for x in dirs if x != '__pycache__' and not x.startswith('.')]
+        for n in names:
+            if n.endswith('.py') or n.endswith('.lark'):
+                files.append(os.path.join(d, n))
+    return sorted(files)
+
+_compilerHash: Optional[str] = None
+
+def compilerHash() -> str:
+    """
+    Returns a hash over all files returned by compilerFiles. It is computed once per process:
+    the modules loaded into a process do not change either.
+    """
+    global _compilerHash
+    if _compilerHash is None:
+        h = hashlib.sha256()
+        for f in compilerFiles():
+            h.update(os.path.relpath(f, _SRC_ROOT).encode())
+            h.update(_fileHash(f).encode())
+        _compilerHash = h.hexdigest()
+    return _compilerHash
+
+def cacheKey(input: str, settings: list[str]) -> str:
+    """
+    Computes the key for compiling the file input. settings must contain all values
+    (besides the input and the compiler modules) that influence the output.
+    """
+    h = hashlib.sha256()
+    with open(input, 'rb') as f:
+        h.update(hashlib.sha256(f.read()).digest())
+    h.update(compilerHash().encode())
+    for s in settings:
+        h.update(b'\0' + s.encode())
+    return h.hexdigest()
+
+@dataclass(frozen=True)
+class CompileCache:
+    dir: str
+    maxSize: int = DEFAULT_MAX_SIZE
+
+    def entryDir(self, key: str) -> str:
+        return os.path.join(self.dir, key[:2], key)
+
+    def lookup(self, key: str, name: str) -> Optional[str]:
+        """
+        Returns the path of file name in the entry for key, or None if there is no such file.
+        Marks the entry as recently used.
+        """
+        d = self.entryDir(key)
+        p = os.path.join(d, name)
+        if not os.path.isfile(p):
+            return None
+        try:
+            os.utime(d)
+        except OSError:
+            # entry was evicted concurrently
+            return None
+        return p
+
+    def store(self, key: str, files: dict[str, bytes | str]):
+        """
+        Adds files to the entry for key. The values of files are either the content or the path
+        of a file to copy. Existing files of the entry are kept.
+        Errors are logged but otherwise ignored: the cache is an optimization only.
+        """
+        try:
+            self._store(key, files)
+            self.maybeEvict()
+        except OSError as e:
+            log.warn(f'Could not write to compile cache {self.dir}: {e}')
+
+    def _store(self, key: str, files: dict[str, bytes | str]):
+        d = self.entryDir(key)
+        os.makedirs(os.path.dirname(d), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(d))
+        try:
+            if os.path.isdir(d):
+                for name in os.listdir(d):
+                    if name not in files:
+                        shutil.copyfile(os.path.join(d, name), os.path.join(tmp, name))
+            for name, content in files.items():
+                if isinstance(content, str):
+                    shutil.copyfile(content, os.path.join(tmp, name))
+                else:
+                    with open(os.path.join(tmp, name), 'wb') as f:
+                        f.write(content)
+            if os.path.isdir(d):
+                shutil.rmtree(d, ignore_errors=True)
+            try:
+                os.rename(tmp, d)
+            except OSError:
+                # another process stored the same entry in the meantime
+                pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        """
+        Returns a list of triples (time of last use, size in bytes, directory) for all entries.
+        """
+        res: list[tuple[float, int, str]] = []
+        if not os.path.isdir(self.dir):
+            return res
+        for prefix in os.listdir(self.dir):
+            pd = os.path.join(self.dir, prefix)
+            if not os.path.isdir(pd):
+                continue
+            for name in os.listdir(pd):
+                d = os.path.join(pd, name)
+                if name.startswith('.'):
+                    continue
+                try:
+                    size = sum(e.stat().st_size for e in os.scandir(d) if e.is_file())
+                    res.append((os.stat(d).st_mtime, size, d))
+                except OSError:
+                    pass
+        return res
+
+    def maybeEvict(self):
+        """
+        Calls evict if the last eviction happened more than EVICT_INTERVAL seconds ago.
+        """
+        marker = os.path.join(self.dir, '.last-evict')
+        try:
+            if time.time() - os.stat(marker).st_mtime < EVICT_INTERVAL:
+                return
+        except FileNotFoundError:
+            pass
+        with open(marker, 'w'):
+            pass
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is at most maxSize bytes big.
+        """
+        entries = self.entries()
+        total = sum(size for (_, size, _) in entries)
+        if total <= self.maxSize:
+            return
+        entries.sort()
+        for (_, size, d) in entries:
+            if total <= self.maxSize:
+                break
+            log.debug(f'Evicting {d} from compile cache')
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
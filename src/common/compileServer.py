@@ -0,0 +1,176 @@
+"""
+This module implements a small server that keeps the compiler warm between invocations,
+together with the client side of the protocol.
+
+The server listens on a unix socket. A client connects and sends a single line of JSON
+(the command line arguments, the working directory, and the environment) together with
+its stdin, stdout, and stderr file descriptors. For each request, the server forks.
+The child process installs the file descriptors of the client, runs the request and
+finally sends the exit code back to the client. Thus, all modules imported by the server
+before forking are shared by all requests, and requests cannot interfere with each other.
+
+This module must only import modules from the standard library: the client should start
+as fast as possible.
+"""
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import traceback
+from typing import *
+
+SOCKET_ENV_VAR = 'MINIPY_SERVER_SOCKET'
+
+_MAX_HEADER_SIZE = 16 * 1024 * 1024
+
+type RequestHandler = Callable[[list[str]], None]
+
+def defaultSocketPath() -> str:
+    """
+    Returns the path of the unix socket, either from the environment variable
+    MINIPY_SERVER_SOCKET or a per-user default in the temp directory.
+    """
+    p = os.environ.get(SOCKET_ENV_VAR)
+    if p:
+        return p
+    return os.path.join(tempfile.gettempdir(), f'minipy-{os.getuid()}.sock')
+
+def exitCodeOf(e: SystemExit) -> int:
+    """
+    Returns the exit code the interpreter would use for e.
+    """
+    match e.code:
+        case None: return 0
+        case int(n): return n
+        case msg:
+            sys.stderr.write(f'{msg}\n')
+            return 1
+
+def _recvLine(conn: socket.socket, maxFds: int) -> tuple[bytes, list[int]]:
+    data = b''
+    fds: list[int] = []
+    while not data.endswith(b'\n'):
+        if len(data) > _MAX_HEADER_SIZE:
+            raise ValueError('Request header too large')
+        (chunk, newFds, _flags, _addr) = socket.recv_fds(conn, 65536, maxFds)
+        fds.extend(newFds)
+        if not chunk:
+            break
+        data += chunk
+    return (data, fds)
+
+def _runRequest(conn: socket.socket, handler: RequestHandler):
+    """
+    Runs in the forked child. Never returns.
+    """
+    code = 1
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        (data, fds) = _recvLine(conn, 3)
+        if len(fds) != 3:
+            raise ValueError(f'Expected 3 file descriptors, got {len(fds)}')
+        req = json.loads(data)
+        for i, fd in enumerate(fds):
+            os.dup2(fd, i)
+            os.close(fd)
+        os.chdir(req['cwd'])
+        os.environ.clear()
+        os.environ.update(req['env'])
+        argv: list[str] = req['argv']
+        sys.argv = [req.get('prog', 'main.py')] + argv
+        try:
+            handler(argv)
+            code = 0
+        except SystemExit as e:
+            code = exitCodeOf(e)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            conn.sendall(f'{code}\n'.encode())
+            conn.close()
+        finally:
+            os._exit(0)
+
+def _checkNotRunning(path: str):
+    if not os.path.exists(path):
+        return
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except OSError:
+        # stale socket file from a server that is no longer running
+        os.unlink(path)
+        return
+    finally:
+        s.close()
+    raise ValueError(f'A server is already listening on {path}')
+
+def serve(path: str, handler: RequestHandler):
+    """
+    Serves requests on the unix socket at path until interrupted. The handler is
+    called with the command line arguments of a request in a forked child process.
+    """
+    _checkNotRunning(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(64)
+    # children are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda _sig, _frame: sys.exit(0))
+    sys.stderr.write(f'Listening on {path}\n')
+    sys.stderr.flush()
+    try:
+        while True:
+            (conn, _) = listener.accept()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                listener.close()
+                _runRequest(conn, handler)
+            conn.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+def runClient(path: str, argv: list[str], prog: str = 'main.py') -> Optional[int]:
+    """
+    Sends argv to the server listening at path and returns the exit code of the request.
+    Returns None if no server is listening.
+    """
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except OSError:
+        s.close()
+        return None
+    with s:
+        req = {'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ), 'prog': prog}
+        data = (json.dumps(req) + '\n').encode()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        sent = socket.send_fds(s, [data[:65536]], [0, 1, 2])
+        s.sendall(data[sent:])
+        reply = b''
+        while True:
+            chunk = s.recv(64)
+            if not chunk:
+                break
+            reply += chunk
+    try:
+        return int(reply.strip())
+    except ValueError:
+        sys.stderr.write('ERROR: compile server terminated without sending an exit code\n')
+        return 1
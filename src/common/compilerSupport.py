@@ -6,7 +6,8 @@ import sys
 import traceback
 
 def wasmImports(maxMemSize: int) -> list[WasmImport]: return [
-    WasmImport("env", "memory", WasmImportMemory(maxMemSize, None)),
+    # The memory starts with one page and can grow up to maxMemSize pages with memory.grow
+    WasmImport("env", "memory", WasmImportMemory(min(1, maxMemSize), maxMemSize)),
     WasmImport("env", "print", WasmImportFunc(WasmId('$print'), ['i32', 'i32'], None)),
     WasmImport("env", "print_err", WasmImportFunc(WasmId('$print_err'), ['i32', 'i32'], None)),
     WasmImport("env", "print_i32", WasmImportFunc(WasmId("$print_i32"), ['i32'], None)),
@@ -34,4 +35,6 @@ class CompilerConfig:
     defaultMaxMemSize = (100 * 1024) // 64  # 100MB
     maxArraySize: int # (in bytes)
     defaultMaxArraySize = 50 * 1024 * 1024 # 50MB
+    optLevel: int = constants.DEFAULT_OPT_LEVEL
+    gc: bool = False # reclaim unreachable arrays (only supported by the array compiler)
 
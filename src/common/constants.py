@@ -3,6 +3,10 @@ from typing import Literal, cast
 COMPILE_ERROR_EXIT_CODE = 3
 RUN_ERROR_EXIT_CODE = 100
 
+# -O0: no optimizations, -O1: local packing and peephole optimizations on the generated wasm code
+DEFAULT_OPT_LEVEL = 1
+MAX_OPT_LEVEL = 1
+
 type Language = Literal['var', 'loop', 'array', 'fun']
 ALL_LANGUAGES = ['var', 'loop', 'array', 'fun']
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 import common.genericParser as parser
 import common.log as log
+import common.constants as constants
 from typing import *
 from dataclasses import dataclass
 from common.wasm import *
@@ -8,27 +9,55 @@ import common.sexp as sexp
 import common.utils as utils
 from common.compilerSupport import CompilerConfig
 import common.compilerSupport as compilerSupport
+from common.compileCache import CompileCache
+import common.compileCache as compileCache
+import common.wasmBinary as wasmBinary
+import common.wasmPeephole as wasmPeephole
+import common.wasmLocals as wasmLocals
+import common.timings as timings
+import pickle
+import shutil
 import shell
 
 type CompileFun = Callable[[Any, CompilerConfig], WasmModule]
 
-def compileToWat(compileFun: CompileFun, astMod: Any, cfg: CompilerConfig,
-                 input: str, output: str) -> WasmModule:
+def compileToModule(compileFun: CompileFun, astMod: Any, cfg: CompilerConfig,
+                    input: str) -> WasmModule:
+    """
+    Parses and compiles input. With cfg.optLevel >= 1, the compilers optimize the AST, and
+    afterwards unused locals are removed, locals are packed into fewer slots, and the peephole
+    optimizer runs over the result.
+    """
     ast = parser.parseFile(input, astMod)
     log.info(f'Compiling AST with {compileFun}')
     try:
-        wasmMod = compileFun(ast, cfg)
+        with timings.phase('compile'):
+            wasmMod = compileFun(ast, cfg)
     except compilerSupport.CompileError as e:
         e.displayAndDie()
-    code = sexp.renderSExp(wasmMod.render())
-    utils.writeTextFile(output, code)
-    log.info(f'Wrote textual representation of wasm to {output}')
+    if cfg.optLevel >= 1:
+        with timings.phase('optimize locals'):
+            wasmMod = wasmLocals.optimizeModule(wasmMod)
+        with timings.phase('peephole'):
+            wasmMod = wasmPeephole.optimizeModule(wasmMod)
     return wasmMod
 
+def writeWat(wasmMod: WasmModule, output: str, pretty: bool = False):
+    """
+    Writes the textual representation of wasmMod to output. The pretty layout is nicer to
+    read but much slower for big modules.
+    """
+    with timings.phase('render wat'), open(output, 'w') as f:
+        if pretty:
+            f.write(sexp.renderSExp(wasmMod.render()))
+        else:
+            wasmMod.write(f)
+
 def wat2wasm(wat2wasmCmd: str, input: str, output: str):
     cmd = [wat2wasmCmd, '--output=' + output, input]
     log.info(f'Converting textual format of wasm to binary format, cmd: {cmd}')
-    res = shell.run(cmd, onError='ignore')
+    with timings.phase('wat2wasm'):
+        res = shell.run(cmd, onError='ignore')
     if res.exitcode != 0:
         utils.abort(f'wat2wasm failed with exit code {res.exitcode}')
     log.info(f'Successfully converted wat to wasm')
@@ -37,24 +66,98 @@ def wat2wasm(wat2wasmCmd: str, input: str, output: str):
 class Args:
     input: str
     output: str
-    wat2wasm: str = 'wat2wasm'
+    wat2wasm: Optional[str] = None # None: use the builtin encoder for .wasm files
     maxMemSize: Optional[int] = None
     maxArraySize: Optional[int] = None
     maxRegisters: Optional[int] = None
+    useCache: bool = True
+    prettyWat: bool = False
+    optLevel: int = constants.DEFAULT_OPT_LEVEL
+    gc: bool = False
+
+_CACHE_WAT = 'module.wat'
+_CACHE_WASM = 'module.wasm'
+_CACHE_MODULE = 'module.pickle'
+
+def _cacheKey(args: Args, compileFun: CompileFun, astMod: Any, cfg: CompilerConfig) -> str:
+    settings = [astMod.__name__, compileFun.__module__, compileFun.__qualname__,
+                str(args.wat2wasm), str(args.prettyWat), str(args.optLevel), str(args.gc),
+                str(cfg.maxMemSize), str(cfg.maxArraySize)]
+    return compileCache.cacheKey(args.input, settings)
+
+def _lookupModule(cache: CompileCache, key: str) -> Optional[WasmModule]:
+    p = cache.lookup(key, _CACHE_MODULE)
+    if p is None:
+        return None
+    try:
+        with open(p, 'rb') as f:
+            wasmMod = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        log.warn(f'Ignoring broken entry {key} in compile cache: {e}')
+        return None
+    log.info(f'Using cached compilation result {key}')
+    return wasmMod
+
+def _writeOutput(cache: Optional[CompileCache], key: str, name: str, output: str,
+                 produce: Callable[[], None], newFiles: dict[str, bytes | str]):
+    """
+    Writes output, either by copying the file name from the cache entry for key, or by
+    calling produce. In the latter case, output is also recorded in newFiles.
+    """
+    if cache:
+        p = cache.lookup(key, name)
+        if p:
+            try:
+                shutil.copyfile(p, output)
+                return
+            except OSError as e:
+                log.warn(f'Ignoring broken entry {key} in compile cache: {e}')
+    produce()
+    newFiles[name] = output
 
 def compileMain(args: Args, compileFun: CompileFun, astMod: Any) -> WasmModule:
+    """
+    Compiles args.input. Unless args.useCache is False, the results are taken from the
+    compile cache if possible (see common/compileCache.py), and stored in the cache otherwise.
+    .wasm files are produced by the builtin encoder unless args.wat2wasm is set.
+    """
     output = args.output
     outputBase, outputExt = shell.splitExt(output)
     outputWat = outputBase + '.wat'
     if outputExt not in ['.wat', '.wasm', '.as']:
         utils.abort(f'Extension of output file must be .wat or .wasm or .as')
     cfg = CompilerConfig(maxMemSize=args.maxMemSize or CompilerConfig.defaultMaxMemSize,
-                         maxArraySize=args.maxArraySize or CompilerConfig.defaultMaxArraySize)
-    wasmMod = compileToWat(compileFun, astMod, cfg, args.input, outputWat)
-    if outputExt == '.wat':
-        return wasmMod
-    outputBin = outputBase + '.wasm'
-    wat2wasm(args.wat2wasm, outputWat, outputBin)
+                         maxArraySize=args.maxArraySize or CompilerConfig.defaultMaxArraySize,
+                         optLevel=args.optLevel, gc=args.gc)
+    outputBin = outputBase + '.wasm' if outputExt == '.wasm' else None
+    cache = None
+    key = ''
+    wasmMod = None
+    newFiles: dict[str, bytes | str] = {}
+    if args.useCache:
+        cache = CompileCache(compileCache.defaultCacheDir())
+        with timings.phase('cache lookup'):
+            key = _cacheKey(args, compileFun, astMod, cfg)
+            wasmMod = _lookupModule(cache, key)
+    if wasmMod is None:
+        wasmMod = compileToModule(compileFun, astMod, cfg, args.input)
+        if cache:
+            newFiles[_CACHE_MODULE] = pickle.dumps(wasmMod)
+    mod = wasmMod
+    if outputBin is None or args.wat2wasm:
+        _writeOutput(cache, key, _CACHE_WAT, outputWat,
+                     lambda: writeWat(mod, outputWat, args.prettyWat), newFiles)
+        log.info(f'Wrote textual representation of wasm to {outputWat}')
+    if outputBin:
+        def produceBin():
+            if args.wat2wasm:
+                wat2wasm(args.wat2wasm, outputWat, outputBin)
+            else:
+                with timings.phase('encode wasm'):
+                    wasmBinary.writeModule(mod, outputBin)
+        _writeOutput(cache, key, _CACHE_WASM, outputBin, produceBin, newFiles)
+        log.info(f'Wrote binary representation of wasm to {outputBin}')
+    if cache and newFiles:
+        with timings.phase('cache store'):
+            cache.store(key, newFiles)
     return wasmMod
-
-
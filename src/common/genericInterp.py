@@ -1,5 +1,6 @@
 import common.genericParser as parser
 import common.log as log
+import common.timings as timings
 import common.compilerSupport as compilerSupport
 import common.constants as constants
 from typing import *
@@ -16,7 +17,8 @@ def interpMain(args: Args, interpFun: Callable[[Any], None], astMod: Any):
     ast = parser.parseFile(args.filename, astMod)
     log.info(f'Interpreting AST with {interpFun} from file {inspect.getmodule(interpFun)}')
     try:
-        interpFun(ast)
+        with timings.phase('interp'):
+            interpFun(ast)
     except compilerSupport.CompileError as e:
         e.displayAndDie()
     except Exception:
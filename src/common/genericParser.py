@@ -1,13 +1,17 @@
+from __future__ import annotations
 from typing import *
 import ast
 import common.utils as utils
 from common.utils import abort
 import common.log as log
+import common.timings as timings
 import pprint
 import common.constants as constants
 from common.constants import Language
-import parsers.common as p
 import dataclasses
+if TYPE_CHECKING:
+    import parsers.common as p
+    from parsers.common import ParserArgs
 
 # Display the AST of some python code:
 # print(ast.dump(ast.parse('5 * [1]', mode='eval'), indent=4))    # or mode='exec'
@@ -191,18 +195,24 @@ def parseFile(filename: str, m: Any) -> Any:
     modName: str = m.__name__
     l = utils.stripPrefix('lang_', modName[:modName.index('.')])
     lang = constants.asLanguage(l)
-    with open(filename, 'r') as f:
+    with timings.phase('parse'), open(filename, 'r') as f:
         src = f.read()
         module = ast.parse(src, filename)
         w = ModWrapper(m, lang)
         x = transModule(module, w, lang)
-        log.debug(f'AST: {pprint.pformat(x)}')
-        return x
+    log.debug(f'AST: {pprint.pformat(x)}')
+    return x
 
-ParserArgs = p.ParserArgs
+def __getattr__(name: str) -> Any:
+    # parsers.common imports lark, so we only load it when needed
+    if name == 'ParserArgs':
+        import parsers.common as p
+        return p.ParserArgs
+    raise AttributeError(f'module {__name__} has no attribute {name}')
 
 def parseWithOwnParser(filename: str, args: ParserArgs, astMod: Any,
                        parseFun: Callable[[p.ParserArgs], None]):
+    import parsers.common as p
     code = utils.readTextFile(filename)
     args = dataclasses.replace(args, code=code)
     try:
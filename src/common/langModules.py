@@ -0,0 +1,43 @@
+"""
+Access to the modules (AST, compiler, interpreter, parser) of the different languages.
+"""
+from typing import *
+import importlib
+import os
+import common.utils as utils
+
+type ModuleKind = Literal['compile', 'interp', 'ast', 'parse']
+
+def importModule(lang: str, kind: ModuleKind):
+    if lang == 'simple':
+        return None
+    match kind:
+        case "compile":
+            modName = f'compilers.lang_{lang}.{lang}_compiler'
+        case "parse":
+            modName = f'parsers.lang_{lang}.{lang}_parser'
+        case "interp":
+            modName = f'lang_{lang}.{lang}_interp'
+        case "ast":
+            modName = f'lang_{lang}.{lang}_ast'
+    m = importlib.import_module(modName)
+    return m
+
+def getFun(mod: Any, fun: str):
+    try:
+        return getattr(mod, fun)
+    except AttributeError:
+        utils.abort(f'Module {mod} does not define function {fun}')
+
+def guessLang(input: str) -> Optional[str]:
+    """
+    Guesses the language from the path of the input file: the language is given
+    by the last directory of the form lang_L.
+    """
+    lang = None
+    for x in input.split(os.sep):
+        if x.startswith('lang_'):
+            lang = x[len('lang_'):]
+    if lang is None and input.endswith('.json'):
+        lang = 'tinyJson'
+    return lang
@@ -1,12 +1,15 @@
 import logging
 import sys
+from typing import *
 import common.utils as utils
-import lark
+
+# The logger of lark, obtained without importing lark itself (which is slow)
+_larkLogger = logging.getLogger('lark')
 
 def _setupLogging(consoleLevel: int, logfile: str|None):
     log = logging.getLogger('minipy')
     _setupLoggingForLogger(log, consoleLevel, logfile)
-    _setupLoggingForLogger(lark.logger, consoleLevel, logfile)
+    _setupLoggingForLogger(_larkLogger, consoleLevel, logfile)
     return log
 
 def _setupLoggingForLogger(log: logging.Logger, consoleLevel: int, logfile: str|None):
@@ -44,9 +47,31 @@ def init(level: int, filename: str):
     global _log
     if _log:
         removeAllHandlers(_log)
-    removeAllHandlers(lark.logger)
+    removeAllHandlers(_larkLogger)
     _log = _setupLogging(level, filename)
 
+def setConsoleStream(stream: TextIO) -> list[TextIO]:
+    """
+    Redirects console output of all loggers to stream. Returns the old streams, in the
+    order expected by restoreConsoleStream.
+    """
+    old: list[TextIO] = []
+    for h in _consoleHandlers():
+        old.append(h.setStream(stream) or h.stream)
+    return old
+
+def restoreConsoleStream(old: list[TextIO]):
+    for h, s in zip(_consoleHandlers(), old):
+        h.setStream(s)
+
+def _consoleHandlers() -> list[logging.StreamHandler[TextIO]]:
+    res: list[logging.StreamHandler[TextIO]] = []
+    for l in [_log, _larkLogger]:
+        for h in l.handlers:
+            if type(h) is logging.StreamHandler:
+                res.append(cast(logging.StreamHandler[TextIO], h))
+    return res
+
 STACKLEVEL=2
 
 def debug(s: str):
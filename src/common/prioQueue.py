@@ -1,7 +1,10 @@
 from typing import *
+import heapq
 
 type PrioDict[T] = dict[T, int]
 
+type PrioQueueKind = Literal['heap', 'bucket']
+
 class PrioQueue[T]:
     """
     A priority queue for elements of type T.
@@ -34,6 +37,82 @@ class PrioQueue[T]:
     def isEmpty(self) -> bool:
         return self.heap.size == 0
 
+class BucketPrioQueue[T]:
+    """
+    A priority queue for elements of type T with the same interface as PrioQueue,
+    for small non-negative integer priorities.
+
+    Every priority has a bucket with the elements of this priority. Increasing the
+    priority of an element adds it to another bucket; its entry in the old bucket
+    becomes stale and is skipped when popping. The highest non-empty bucket is found by
+    walking down from the highest priority seen so far. Inside a bucket, the secondary
+    order decides, then the order of insertion.
+    """
+    def __init__(self, secondaryOrder: dict[T, int]={}):
+        self.secondaryOrder = secondaryOrder
+        self.buckets: dict[int, list[tuple[int, int, T]]] = {}
+        self.prios: PrioDict[T] = {}
+        # the sequence number of the valid entry of each element
+        self.entries: dict[T, int] = {}
+        self.seq = 0
+        self.maxPrio = 0
+
+    def __repr__(self):
+        return repr(self.prios)
+
+    def push(self, key: T, prio: int=0):
+        """
+        Adds an element to the priority queue.
+        """
+        if key in self.prios:
+            raise ValueError(f'Key {key} already present in queue')
+        if prio < 0:
+            raise ValueError('negative priorities are not allowed')
+        self.prios[key] = prio
+        self.__addEntry(key)
+
+    def __addEntry(self, key: T):
+        prio = self.prios[key]
+        self.seq += 1
+        self.entries[key] = self.seq
+        if prio not in self.buckets:
+            self.buckets[prio] = []
+        heapq.heappush(self.buckets[prio], (-self.secondaryOrder.get(key, 0), self.seq, key))
+        if prio > self.maxPrio:
+            self.maxPrio = prio
+
+    def pop(self) -> T:
+        """
+        Removes an element with the highest priority from the priority queue.
+        """
+        assert self.prios
+        while True:
+            bucket = self.buckets.get(self.maxPrio)
+            if not bucket:
+                self.buckets.pop(self.maxPrio, None)
+                self.maxPrio -= 1
+                continue
+            (_, seq, key) = heapq.heappop(bucket)
+            if self.entries.get(key) == seq:
+                del self.entries[key]
+                del self.prios[key]
+                return key
+
+    def incPrio(self, key: T, by: int=1):
+        """
+        Increase priority of the given key by the given amount. The amount must not be
+        negative (priorities never decrease). Elements already popped are ignored.
+        """
+        if by < 0:
+            raise ValueError('priorities must not decrease')
+        if by == 0 or key not in self.prios:
+            return
+        self.prios[key] += by
+        self.__addEntry(key)
+
+    def isEmpty(self) -> bool:
+        return not self.prios
+
 class Heap[T]:
     def __init__(self, data: list[T]=[], prios: dict[T, int]={}, secondaryOrder: dict[T, int]={}):
         self.secondaryOrder = secondaryOrder
@@ -0,0 +1,87 @@
+"""
+Runs source programs with the python interpreter. Our languages are subsets of python, so
+this gives the reference output for the tests.
+"""
+from typing import *
+import io
+import os
+import signal
+import subprocess
+import sys
+import threading
+import typing
+import common.utils as utils
+
+# Maximum number of seconds a program may run in runCaptured
+TIMEOUT = 10
+
+_MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+PRELUDE_DICT = {
+    'input_int': lambda: utils.inputInt('Input some int: '),
+    'Callable': cast(Any, typing.Callable)
+}
+
+def runWithPython(srcFile: str):
+    src = utils.readTextFile(srcFile)
+    exec(src, PRELUDE_DICT)
+
+def runCaptured(srcFile: str, input: str|None, timeout: float|None=None) -> str:
+    """
+    Runs srcFile and returns its output. input_int reads the lines of input. Raises
+    TimeoutError if the program runs longer than timeout seconds (default: TIMEOUT), and
+    RuntimeError if it exits with a non-zero exit code.
+
+    In the main thread, the program runs inside the current process with a SIGALRM timer.
+    Neither sys.stdin nor sys.stdout are touched. Other threads cannot use signals, so
+    there the program runs in a subprocess.
+    """
+    if timeout is None:
+        timeout = TIMEOUT
+    if threading.current_thread() is threading.main_thread() and hasattr(signal, 'setitimer'):
+        return _runInProcess(srcFile, input, timeout)
+    else:
+        return _runSubprocess(srcFile, input, timeout)
+
+def _timeoutError(srcFile: str, timeout: float) -> TimeoutError:
+    return TimeoutError(f'{srcFile} did not terminate within {timeout} seconds')
+
+def _runSubprocess(srcFile: str, input: str|None, timeout: float) -> str:
+    # pyrun ignores the language, but main.py needs one if it cannot guess it from the path
+    cmd = [sys.executable, _MAIN, '--lang', 'fun', 'pyrun', srcFile]
+    try:
+        res = subprocess.run(cmd, input=input or '', capture_output=True, text=True,
+                             timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise _timeoutError(srcFile, timeout)
+    if res.returncode != 0:
+        raise RuntimeError(f'{srcFile} exited with code {res.returncode}: {res.stderr.strip()}')
+    return res.stdout
+
+def _runInProcess(srcFile: str, input: str|None, timeout: float) -> str:
+    out = io.StringIO()
+    lines = iter((input or '').splitlines())
+    def inputInt() -> int:
+        s = next(lines, '')
+        try:
+            return int(s)
+        except ValueError:
+            raise ValueError(f'input read from stdin was not integer: {s}')
+    def capturedPrint(*args: Any, **kwargs: Any):
+        kwargs.setdefault('file', out)
+        print(*args, **kwargs)
+    def onAlarm(signum: int, frame: Any):
+        raise _timeoutError(srcFile, timeout)
+    prelude = dict(PRELUDE_DICT, input_int=inputInt, print=capturedPrint)
+    code = compile(utils.readTextFile(srcFile), srcFile, 'exec')
+    oldHandler = signal.signal(signal.SIGALRM, onAlarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        exec(code, prelude)
+    except SystemExit as e:
+        if e.code not in [None, 0]:
+            raise RuntimeError(f'{srcFile} exited with code {e.code}')
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, oldHandler if oldHandler is not None else signal.SIG_DFL)
+    return out.getvalue()
@@ -1,30 +1,39 @@
 from __future__ import annotations
 from dataclasses import dataclass
-import common.pretty as pretty
 from typing import *
 import json
+if TYPE_CHECKING:
+    import common.pretty as pretty
 
 type RenderResult = pretty.Doc
 
-@dataclass(frozen=True)
+def _pretty():
+    """
+    Returns the module common.pretty. It imports prettyprinter, which is slow. Hence, it is
+    only imported when needed for rendering with the pretty layout.
+    """
+    import common.pretty as pretty
+    return pretty
+
+@dataclass(frozen=True, slots=True)
 class SExpNum:
     val: int | float
     def render(self) -> RenderResult:
-        return pretty.strDoc(str(self.val))
+        return _pretty().strDoc(str(self.val))
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SExpStr:
     val: str
     def render(self) -> RenderResult:
-        return pretty.strDoc(json.dumps(self.val))
+        return _pretty().strDoc(json.dumps(self.val))
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SExpId:
     id: str
     def render(self) -> RenderResult:
-        return pretty.strDoc(self.id)
+        return _pretty().strDoc(self.id)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SExpSeq:
     sexps: list[SExp]
     def append(self, other: SExpSeq | Iterable[SExp]) -> SExpSeq:
@@ -32,32 +41,117 @@ class SExpSeq:
             other = other.sexps
         return SExpSeq(self.sexps + list(other))
     def render(self) -> RenderResult:
+        pretty = _pretty()
         l = [x.render() for x in self.sexps]
         return pretty.enclose(pretty.LPAREN, pretty.RPAREN, pretty.align(pretty.sep(l)))
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SExpBlockItem:
     start: str
     sexps: list[SExp]
     def render(self) -> pretty.Doc:
+        pretty = _pretty()
         l = [x.render() for x in self.sexps]
         return pretty.sep([pretty.strDoc(self.start),
                            pretty.indent(pretty.align(pretty.sep(l)))])
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class SExpBlock:
     content: list[SExpBlockItem]
     @staticmethod
     def singleItem(start: str, sexps: list[SExp]) -> SExpBlock:
         return SExpBlock([SExpBlockItem(start, sexps)])
     def render(self) -> RenderResult:
+        pretty = _pretty()
         return pretty.sep([x.render() for x in self.content] + [pretty.strDoc('end')])
 
 type SExp = SExpNum | SExpStr | SExpId | SExpSeq | SExpBlock
 
 def renderSExp(s: SExp) -> str:
     d = s.render()
-    return pretty.renderDoc(d)
+    return _pretty().renderDoc(d)
+
+def _isOperand(s: SExp) -> bool:
+    match s:
+        case SExpNum() | SExpStr(): return True
+        case SExpId(id): return id.startswith('$')
+        case _: return False
+
+def _atomStr(s: SExpNum | SExpStr | SExpId) -> str:
+    match s:
+        case SExpNum(val): return str(val)
+        case SExpStr(val): return json.dumps(val)
+        case SExpId(id): return id
+
+_MAX_FLAT_DEPTH = 3
+
+def _isFlat(s: SExp, depth: int = _MAX_FLAT_DEPTH) -> bool:
+    """
+    An atom, or a sequence of flat S-expressions nested at most depth levels. Every node is
+    checked at most _MAX_FLAT_DEPTH times, so writeSExp stays linear.
+    """
+    match s:
+        case SExpSeq(sexps):
+            return depth > 0 and all(_isFlat(x, depth - 1) for x in sexps)
+        case SExpBlock():
+            return False
+        case _:
+            return True
+
+def _writeFlat(s: SExp, out: TextIO):
+    match s:
+        case SExpSeq(sexps):
+            out.write('(')
+            for (i, x) in enumerate(sexps):
+                if i > 0:
+                    out.write(' ')
+                _writeFlat(x, out)
+            out.write(')')
+        case SExpBlock():
+            raise ValueError(f'Block cannot be written on a single line')
+        case _:
+            out.write(_atomStr(s))
+
+def _writeItems(head: str, sexps: list[SExp], out: TextIO, indent: int):
+    """
+    Writes head followed by the leading operands (strings, numbers, and $identifiers) of sexps
+    on the current line. All other elements of sexps are written on lines of their own,
+    indented by two more spaces.
+    """
+    out.write(head)
+    i = 0
+    while i < len(sexps) and _isOperand(sexps[i]):
+        out.write(' ')
+        _writeFlat(sexps[i], out)
+        i += 1
+    for x in sexps[i:]:
+        out.write('\n' + ' ' * (indent + 2))
+        writeSExp(x, out, indent + 2)
+
+def writeSExp(s: SExp, out: TextIO, indent: int = 0):
+    """
+    Writes s to out in time linear in the size of s. Sequences of atoms are written on a single
+    line, everything else is broken into several lines. The first line is not indented, all
+    other lines are indented by at least indent spaces. Use renderSExp for a prettier layout.
+    """
+    match s:
+        case SExpSeq(sexps):
+            if _isFlat(s):
+                _writeFlat(s, out)
+            elif sexps and isinstance(first := sexps[0], (SExpNum, SExpStr, SExpId)):
+                _writeItems('(' + _atomStr(first), sexps[1:], out, indent)
+                out.write(')')
+            else:
+                _writeItems('(', sexps, out, indent)
+                out.write(')')
+        case SExpBlock(content):
+            for (i, item) in enumerate(content):
+                if i > 0:
+                    out.write('\n' + ' ' * indent)
+                _writeItems(item.start, item.sexps, out, indent)
+            out.write('\n' + ' ' * indent + 'end')
+        case _:
+            out.write(_atomStr(s))
 
 def mkSeq(*es: SExp) -> SExpSeq:
     return SExpSeq(list(es))
@@ -0,0 +1,92 @@
+"""
+Compiles and runs many test files up front, so that the tests themselves only have to check
+the results (see test/test_compiler.py).
+
+Compilation happens in a pool of worker processes (see common/batchCompiler.py): each worker
+imports the compilers only once. The compiled modules are then executed by a bounded pool of
+threads, each of them waiting for a subprocess running the wasm file.
+"""
+from __future__ import annotations
+from typing import *
+import concurrent.futures
+import io
+import os
+from types import ModuleType
+import shell
+import common.batchCompiler as batchCompiler
+import common.genericCompiler as genericCompiler
+import common.log as log
+import common.testsupport as testsupport
+import common.utils as utils
+import common.wasmInterp as wasmInterp
+from common.compilerSupport import CompilerConfig
+
+type RunWasm = Callable[[str, str|None], shell.RunResult]
+
+def testArgs(srcFile: str, output: str, extraArgs: str|None) -> genericCompiler.Args:
+    """
+    Returns the compiler arguments for a test file. extraArgs are the options given in a .args
+    file next to the test file, only --max-mem-size, --max-array-size and --gc are supported.
+    The compile cache is disabled, so that tests never see artifacts from earlier runs.
+    """
+    maxMemSize: Optional[int] = None
+    maxArraySize: Optional[int] = None
+    gc = False
+    for a in (extraArgs or '').split():
+        k, _, v = a.partition('=')
+        match k:
+            case '--max-mem-size': maxMemSize = int(v)
+            case '--max-array-size': maxArraySize = int(v)
+            case '--gc': gc = True
+            case _: raise ValueError(f'Unsupported option in .args file: {a}')
+    return genericCompiler.Args(srcFile, output, maxMemSize=maxMemSize, maxArraySize=maxArraySize,
+                                useCache=False, gc=gc)
+
+def runSource(srcFile: str, src: str, compileFun: genericCompiler.CompileFun, astMod: ModuleType,
+              optLevel: int, input: str = '') -> tuple[int, str]:
+    """
+    Writes src to srcFile, compiles it in-process and runs the module with the wasm interpreter.
+    Returns the exit code and the output, stdout and stderr interleaved.
+    """
+    utils.writeTextFile(srcFile, src)
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize,
+                         optLevel)
+    wasmMod = genericCompiler.compileToModule(compileFun, astMod, cfg, srcFile)
+    out = io.StringIO()
+    code = wasmInterp.runModule(wasmMod, wasmInterp.WasmEnv(io.StringIO(input), out, out))
+    return (code, out.getvalue())
+
+def outputFile(outDir: str, lang: str, srcFile: str) -> str:
+    return shell.pjoin(outDir, lang, shell.removeExt(srcFile) + '.wasm')
+
+def compileAndRunAll(tests: list[tuple[str, str]], outDir: str, runWasm: RunWasm,
+                     maxWorkers: Optional[int] = None) -> dict[tuple[str, str], shell.RunResult]:
+    """
+    Compiles all tests (pairs of language and source file, as returned by
+    testsupport.collectTestFiles) and runs the successfully compiled modules with runWasm.
+    The result for a test is the result of running the module, or the result of the compiler
+    if compilation failed.
+    """
+    jobs: list[batchCompiler.BatchJob] = []
+    for (lang, srcFile) in tests:
+        extraArgs = testsupport.readFileOpt(shell.removeExt(srcFile) + '.args')
+        output = outputFile(outDir, lang, srcFile)
+        shell.mkdirs(shell.dirname(output))
+        args = testArgs(srcFile, output, extraArgs)
+        jobs.append(batchCompiler.BatchJob(lang, args))
+    log.info(f'Compiling {len(jobs)} test files')
+    compiled = batchCompiler.runJobs(jobs, maxWorkers)
+    results: dict[tuple[str, str], shell.RunResult] = {}
+    def run(test: tuple[str, str], r: batchCompiler.BatchResult) -> shell.RunResult:
+        input = testsupport.readFileOpt(shell.removeExt(test[1]) + '.in')
+        return runWasm(r.job.args.output, input)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers or os.cpu_count()) as pool:
+        futures: dict[concurrent.futures.Future[shell.RunResult], tuple[str, str]] = {}
+        for test, r in zip(tests, compiled):
+            if r.ok:
+                futures[pool.submit(run, test, r)] = test
+            else:
+                results[test] = shell.RunResult('', r.stderr, r.exitcode)
+        for f in concurrent.futures.as_completed(futures):
+            results[futures[f]] = f.result()
+    return results
@@ -3,40 +3,86 @@ from typing import *
 import os
 import common.utils as utils
 import common.log as log
+import tempfile
 import threading
+import common.pyrun as pyrun
 import common.constants as constants
 
 _CACHE_DIR = '.test_cache'
-_CACHE_LOCK = threading.Lock()
 
 # If IGNORE_HASH is True, the golden file from .test_cache is considered as the only
 # source if truth. This can be useful if you changed test cases but want to make sure
 # that their output is still the same
 IGNORE_HASH = False
 
+# One lock per golden file, so that threads computing different golden files do not
+# wait for each other. Other processes (e.g. pytest-xdist workers) are not blocked at all:
+# all files in the cache are replaced atomically, at worst a golden file is computed twice.
+_KEY_LOCKS: dict[str, threading.Lock] = {}
+_KEY_LOCKS_GUARD = threading.Lock()
+
+def _keyLock(key: str) -> threading.Lock:
+    with _KEY_LOCKS_GUARD:
+        l = _KEY_LOCKS.get(key)
+        if l is None:
+            l = threading.Lock()
+            _KEY_LOCKS[key] = l
+        return l
+
+def _writeAtomically(path: str, content: str):
+    shell.mkdirs(shell.dirname(path))
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=shell.dirname(path))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _readFileIfExists(path: str) -> str|None:
+    try:
+        return utils.readTextFile(path).strip()
+    except FileNotFoundError:
+        return None
+
+def _readCachedGolden(cacheFile: str, hashFile: str, srcMd5: str) -> str|None:
+    if IGNORE_HASH:
+        return _readFileIfExists(cacheFile)
+    if _readFileIfExists(hashFile) != srcMd5:
+        return None
+    golden = _readFileIfExists(cacheFile)
+    # The golden file is written before the hash file. If the hash is still the same, the
+    # golden file belongs to it.
+    if _readFileIfExists(hashFile) != srcMd5:
+        return None
+    return golden
+
+def computeGolden(srcFile: str, input: str|None) -> str:
+    """
+    Runs srcFile with the python interpreter and returns its output. Fails if the program
+    does not terminate within pyrun.TIMEOUT seconds or exits with a non-zero code.
+    """
+    log.info(f'Computing golden output of {srcFile}')
+    try:
+        return pyrun.runCaptured(srcFile, input).strip()
+    except Exception as e:
+        raise Exception(f'Running test file {srcFile} with python failed!') from e
+
 def getGolden(srcFile: str, input: str|None):
-    with _CACHE_LOCK:
-        base = shell.removeExt(srcFile)
+    base = shell.removeExt(srcFile)
+    cacheFile = shell.pjoin(_CACHE_DIR, base + '.golden')
+    hashFile = shell.pjoin(_CACHE_DIR, base + '.hash')
+    with _keyLock(cacheFile):
         srcMd5 = utils.md5(srcFile)
-        cacheFile = shell.pjoin(_CACHE_DIR, base + '.golden')
-        hashFile = shell.pjoin(_CACHE_DIR, base + '.hash')
-        shell.mkdirs(shell.dirname(cacheFile))
-        if IGNORE_HASH and shell.isFile(cacheFile):
-            return utils.readTextFile(cacheFile).strip()
-        if shell.isFile(cacheFile) and shell.isFile(hashFile):
-            haveMd5 = utils.readTextFile(hashFile).strip()
-            if srcMd5 == haveMd5:
-                return utils.readTextFile(cacheFile).strip()
+        golden = _readCachedGolden(cacheFile, hashFile, srcMd5)
+        if golden is not None:
+            return golden
         # We do not have a cache file or it's out-of-date
-        # Be careful to avoid race conditions
-        cmd = ['timeout', '10s', 'python', 'src/main.py', 'pyrun', srcFile]
-        log.info('Running command: {" ".join(cmd)}')
-        res = shell.run(cmd, captureStdout=True, input=input, onError='ignore')
-        if res.exitcode != 0:
-            raise Exception(f'Running test file {srcFile} with python failed!')
-        golden = res.stdout.strip()
-        utils.writeTextFile(cacheFile, golden)
-        utils.writeTextFile(hashFile, srcMd5)
+        golden = computeGolden(srcFile, input)
+        _writeAtomically(cacheFile, golden)
+        _writeAtomically(hashFile, srcMd5)
         return golden
 
 type ErrorKind = Literal['type error', 'run error']
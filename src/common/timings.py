@@ -0,0 +1,100 @@
+"""
+Measures wall time, CPU time, and peak memory (as reported by tracemalloc) of the phases
+of the compiler pipeline.
+
+Measuring is disabled by default, then `phase` does nothing. Once enabled (see `enable`),
+every `with phase(name):` block is recorded. Phases can be nested; the peak memory of a phase
+includes the peak memory of its nested phases.
+"""
+from __future__ import annotations
+from typing import *
+from dataclasses import dataclass
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+type ReportFormat = Literal['text', 'json']
+
+@dataclass
+class Phase:
+    name: str
+    depth: int
+    wallSeconds: float = 0.0
+    cpuSeconds: float = 0.0
+    peakMemBytes: int = 0
+
+_phases: Optional[list[Phase]] = None
+_stack: list[Phase] = []
+
+def enable():
+    """
+    Enables measuring. Tracing memory allocations with tracemalloc slows down
+    the program, so wall and CPU times are higher than without measuring.
+    """
+    global _phases
+    _phases = []
+    _stack.clear()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    global _phases
+    _phases = None
+    _stack.clear()
+    tracemalloc.stop()
+
+def isEnabled() -> bool:
+    return _phases is not None
+
+def phases() -> list[Phase]:
+    return list(_phases or [])
+
+@contextlib.contextmanager
+def phase(name: str) -> Generator[None, None, None]:
+    if _phases is None:
+        yield
+        return
+    p = Phase(name, len(_stack))
+    _phases.append(p)
+    if _stack:
+        parent = _stack[-1]
+        parent.peakMemBytes = max(parent.peakMemBytes, tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    _stack.append(p)
+    wallStart = time.perf_counter()
+    cpuStart = time.process_time()
+    try:
+        yield
+    finally:
+        p.cpuSeconds = time.process_time() - cpuStart
+        p.wallSeconds = time.perf_counter() - wallStart
+        p.peakMemBytes = max(p.peakMemBytes, tracemalloc.get_traced_memory()[1])
+        _stack.pop()
+        if _stack:
+            parent = _stack[-1]
+            parent.peakMemBytes = max(parent.peakMemBytes, p.peakMemBytes)
+
+def formatText(ps: list[Phase]) -> str:
+    nameWidth = max([len('Phase')] + [2 * p.depth + len(p.name) for p in ps])
+    lines = [f'{"Phase":<{nameWidth}}  {"Wall [ms]":>10}  {"CPU [ms]":>10}  {"Peak mem [KiB]":>14}']
+    for p in ps:
+        name = '  ' * p.depth + p.name
+        lines.append(f'{name:<{nameWidth}}  {p.wallSeconds * 1000:>10.1f}  ' \
+                     f'{p.cpuSeconds * 1000:>10.1f}  {p.peakMemBytes / 1024:>14.1f}')
+    return '\n'.join(lines)
+
+def formatJson(ps: list[Phase]) -> str:
+    return json.dumps({'phases': [{'name': p.name, 'depth': p.depth,
+                                   'wallSeconds': p.wallSeconds, 'cpuSeconds': p.cpuSeconds,
+                                   'peakMemBytes': p.peakMemBytes} for p in ps]})
+
+def report(fmt: ReportFormat, out: TextIO = sys.stderr):
+    """
+    Writes all phases recorded so far to out.
+    """
+    ps = phases()
+    s = formatJson(ps) if fmt == 'json' else formatText(ps)
+    out.write(s + '\n')
+    out.flush()
@@ -118,3 +118,9 @@ def isExecutable(p: str):
         return b
     except FileNotFoundError:
         return False
+
+def wrap32(x: int) -> int:
+    return ((x + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+def wrap64(x: int) -> int:
+    return ((x + 0x8000000000000000) & 0xFFFFFFFFFFFFFFFF) - 0x8000000000000000
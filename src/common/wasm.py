@@ -8,8 +8,37 @@ type WasmValtype = Literal['i32', 'i64', 'f32', 'f64']
 def renderValtype(t: WasmValtype) -> SExp:
     return SExpId(t)
 
-@dataclass(frozen=True)
-class WasmId:
+# Interned instances, keyed by class, constructor arguments, and the types of these arguments
+_interned: dict[tuple[Any, ...], Any] = {}
+# The table is cleared if it grows beyond this number of entries, so that a long-running
+# compile server does not collect all constants it has ever seen.
+_INTERN_LIMIT = 100_000
+
+class _Interned:
+    """
+    Base class for small immutable nodes such as identifiers and instructions without nested
+    instructions. Constructing such a node with positional arguments returns a shared instance
+    if an equal node was constructed before. Compilers create millions of nodes such as
+    i32.const 4 or local.get $@tmp_i32, most of them identical.
+    """
+    __slots__ = ()
+    def __new__(cls, *args: Any, **kwargs: Any):
+        if kwargs:
+            return object.__new__(cls)
+        key = (cls, args, tuple(map(type, args)))
+        x = _interned.get(key)
+        if x is None:
+            if len(_interned) >= _INTERN_LIMIT:
+                _interned.clear()
+            x = object.__new__(cls)
+            _interned[key] = x
+        return x
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Unpickling calls the constructor, so unpickled nodes are shared as well
+        return (type(self), tuple(getattr(self, f) for f in cast(Any, self).__match_args__))
+
+@dataclass(frozen=True, slots=True)
+class WasmId(_Interned):
     id: str
     def __post_init__(self):
         if not self.id or self.id[0] != '$':
@@ -17,7 +46,7 @@ class WasmId:
     def render(self) -> SExp:
         return SExpId(self.id)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmModule:
     """
     A whole module, e.g. (module ...)
@@ -25,19 +54,30 @@ class WasmModule:
     imports: list[WasmImport]
     exports: list[WasmExport]
     globals: list[WasmGlobal]
-    data: list[WasmData]
+    data: list[WasmData | WasmDataPassive]
     funcTable: WasmFuncTable
     funcs: list[WasmFunc]
+    def renderItems(self) -> Iterator[SExp]:
+        for i in self.imports: yield i.render()
+        for e in self.exports: yield e.render()
+        for g in self.globals: yield g.render()
+        for d in self.data: yield d.render()
+        yield self.funcTable.render()
+        for f in self.funcs: yield f.render()
     def render(self):
-        return mkNamedSeq('module',
-                          *[i.render() for i in self.imports],
-                          *[e.render() for e in self.exports],
-                          *[g.render() for g in self.globals],
-                          *[d.render() for d in self.data],
-                          self.funcTable.render(),
-                          *[f.render() for f in self.funcs])
-
-@dataclass(frozen=True)
+        return mkNamedSeq('module', *self.renderItems())
+    def write(self, out: TextIO):
+        """
+        Writes the textual representation to out. Only the S-expression of a single
+        item (e.g. a function) is kept in memory at a time.
+        """
+        out.write('(module')
+        for item in self.renderItems():
+            out.write('\n  ')
+            writeSExp(item, out, 2)
+        out.write(')\n')
+
+@dataclass(frozen=True, slots=True)
 class WasmImport:
     """
     Import declaration, e.g. (import "env" "print" <desc>)
@@ -50,7 +90,7 @@ class WasmImport:
 
 type WasmImportDesc = WasmImportMemory | WasmImportFunc
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmImportMemory:
     """
     Memory import, e.g. (memory 1)
@@ -63,7 +103,7 @@ class WasmImportMemory:
             args.append(SExpNum(self.max))
         return mkNamedSeq('memory', *args)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmImportFunc:
     """
     Import of a function, e.g. (func $print (param i32 i32)
@@ -79,7 +119,7 @@ class WasmImportFunc:
         else:
             return mkNamedSeq('func', self.id.render(), params)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmExport:
     """
     An export declaration, e.g. (export "main" <desc>)
@@ -91,7 +131,7 @@ class WasmExport:
 
 type WasmExportDesc = WasmExportFunc
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmExportFunc:
     """
     Export of a function, e.g. (func $foo)
@@ -100,7 +140,7 @@ class WasmExportFunc:
     def render(self) -> SExp:
         return mkNamedSeq('func', self.id.render())
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmGlobal:
     id: WasmId
     ty: WasmValtype
@@ -111,21 +151,32 @@ class WasmGlobal:
         init = [i.render() for i in self.init]
         return mkNamedSeq('global', self.id.render(), t, *init)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmData:
     start: int
     content: str
     def render(self) -> SExp:
         return mkNamedSeq('data', SExpId(f'(i32.const {self.start})'), SExpStr(self.content))
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class WasmDataPassive:
+    """
+    Passive data segment, copied to memory with memory.init, e.g. (data $d "\01\00")
+    """
+    id: WasmId
+    content: bytes
+    def render(self) -> SExp:
+        s = ''.join(f'\\{b:02x}' for b in self.content)
+        return mkNamedSeq('data', self.id.render(), SExpId(f'"{s}"'))
+
+@dataclass(frozen=True, slots=True)
 class WasmFuncTable:
     elems: list[WasmId]
     def render(self):
         ids = [i.render() for i in self.elems]
         return mkNamedSeq('table', SExpId('funcref'), mkNamedSeq('elem', *ids))
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmFunc:
     """
     Function definition, e.g. (func $foo <params> <result> <locals> <instructions>)
@@ -144,8 +195,8 @@ class WasmFunc:
         instrs = [x.render() for x in self.instrs]
         return mkNamedSeq('func', self.id.render()).append(params + res + locals + instrs)
 
-@dataclass(frozen=True)
-class WasmInstrConst:
+@dataclass(frozen=True, slots=True)
+class WasmInstrConst(_Interned):
     """
     Constant instructions, e.g. i32.const
     """
@@ -154,36 +205,36 @@ class WasmInstrConst:
     def render(self) -> SExp:
         return mkSeq(SExpId(f'{self.ty}.const'), SExpNum(self.val))
 
-@dataclass(frozen=True)
-class WasmInstrDrop:
+@dataclass(frozen=True, slots=True)
+class WasmInstrDrop(_Interned):
     def render(self) -> SExp:
         return SExpId('drop')
 
-@dataclass(frozen=True)
-class WasmInstrNumBinOp:
+@dataclass(frozen=True, slots=True)
+class WasmInstrNumBinOp(_Interned):
     """
     Binary operators on numbers, e.g. i32.add
     """
     ty: WasmValtype
-    op: Literal['add', 'sub', 'mul', 'shr_u', 'shl', 'xor']
+    op: Literal['add', 'sub', 'mul', 'shr_u', 'shl', 'xor', 'and', 'or']
     def render(self) -> SExp:
         return SExpId(f'{self.ty}.{self.op}')
 
-@dataclass(frozen=True)
-class WasmInstrIntRelOp:
+@dataclass(frozen=True, slots=True)
+class WasmInstrIntRelOp(_Interned):
     ty: Literal['i32', 'i64']
     op: Literal['eq', 'ne', 'lt_s', 'lt_u', 'gt_s', 'gt_u', 'le_s', 'le_u', 'ge_s', 'ge_u']
     def render(self) -> SExp:
         return SExpId(f'{self.ty}.{self.op}')
 
-@dataclass(frozen=True)
-class WasmInstrConvOp:
+@dataclass(frozen=True, slots=True)
+class WasmInstrConvOp(_Interned):
     op: Literal['i32.wrap_i64', 'i64.extend_i32_u', 'i64.extend_i32_s']
     def render(self) -> SExp:
         return SExpId(self.op)
 
-@dataclass(frozen=True)
-class WasmInstrCall:
+@dataclass(frozen=True, slots=True)
+class WasmInstrCall(_Interned):
     """
     Function call instruction, e.g. call $foo
     """
@@ -191,7 +242,7 @@ class WasmInstrCall:
     def render(self) -> SExp:
         return mkNamedSeq('call', self.id.render())
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmInstrCallIndirect:
     """
     Indirect function call instruction, e.g. call_indirect (param i64) (result i64)
@@ -205,8 +256,8 @@ class WasmInstrCallIndirect:
         return mkNamedSeq('call_indirect', *tys)
 
 
-@dataclass(frozen=True)
-class WasmInstrVarLocal:
+@dataclass(frozen=True, slots=True)
+class WasmInstrVarLocal(_Interned):
     """
     Reading and writing of local variables, e.g. local.get $foo
     """
@@ -215,8 +266,8 @@ class WasmInstrVarLocal:
     def render(self) -> SExp:
         return mkSeq(SExpId(f'local.{self.op}'), self.id.render())
 
-@dataclass(frozen=True)
-class WasmInstrVarGlobal:
+@dataclass(frozen=True, slots=True)
+class WasmInstrVarGlobal(_Interned):
     """
     Reading and writing of local variables, e.g. local.get $foo
     """
@@ -225,15 +276,42 @@ class WasmInstrVarGlobal:
     def render(self) -> SExp:
         return mkSeq(SExpId(f'global.{self.op}'), self.id.render())
 
-@dataclass(frozen=True)
-class WasmInstrMem:
+@dataclass(frozen=True, slots=True)
+class WasmInstrMem(_Interned):
     ty: WasmValtype
     op: Literal['load', 'store']
     def render(self) -> SExp:
         return SExpId(f'{self.ty}.{self.op}')
 
-@dataclass(frozen=True)
-class WasmInstrBranch:
+@dataclass(frozen=True, slots=True)
+class WasmInstrMemBulk(_Interned):
+    """
+    Bulk memory instructions: memory.fill (dest, byte, n) and memory.copy (dest, src, n)
+    """
+    op: Literal['fill', 'copy']
+    def render(self) -> SExp:
+        return SExpId(f'memory.{self.op}')
+
+@dataclass(frozen=True, slots=True)
+class WasmInstrMemSize(_Interned):
+    """
+    memory.size and memory.grow, both measured in pages. memory.grow returns the old size or -1.
+    """
+    op: Literal['size', 'grow']
+    def render(self) -> SExp:
+        return SExpId(f'memory.{self.op}')
+
+@dataclass(frozen=True, slots=True)
+class WasmInstrMemInit(_Interned):
+    """
+    memory.init (dest, offset, n), copying from a passive data segment
+    """
+    data: WasmId
+    def render(self) -> SExp:
+        return mkSeq(SExpId('memory.init'), self.data.render())
+
+@dataclass(frozen=True, slots=True)
+class WasmInstrBranch(_Interned):
     """
     branch instruction, either conditional br_if or unconditional br
     """
@@ -243,7 +321,7 @@ class WasmInstrBranch:
         br = 'br_if' if self.conditional else 'br'
         return mkSeq(SExpId(br), self.target.render())
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmInstrIf:
     """
     Conditional execution, e.g. if (result i32) ... else ... end
@@ -255,10 +333,12 @@ class WasmInstrIf:
         res = [] if self.resultType is None else \
             [SExpSeq([SExpId('result'), (SExpId(self.resultType))])]
         b1 = SExpBlockItem('if', res + [i.render() for i in self.thenInstrs])
+        if not self.elseInstrs:
+            return SExpBlock([b1])
         b2 = SExpBlockItem('else', [i.render() for i in self.elseInstrs])
         return SExpBlock([b1, b2])
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmInstrLoop:
     """
     Loop construct, e.g. loop $label ...
@@ -268,7 +348,7 @@ class WasmInstrLoop:
     def render(self) -> SExp:
         return SExpBlock.singleItem('loop', [self.label.render()] + [i.render() for i in self.body])
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmInstrBlock:
     """
     Block construct, e.g. block $label ...
@@ -283,14 +363,14 @@ class WasmInstrBlock:
         return SExpBlock.singleItem('block',
                                     [self.label.render()] + res + [i.render() for i in self.body])
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class WasmInstrComment:
     text: str
     def render(self) -> SExp:
         return SExpId(f'(;{self.text};)')
 
-@dataclass(frozen=True)
-class WasmInstrTrap:
+@dataclass(frozen=True, slots=True)
+class WasmInstrTrap(_Interned):
     def render(self) -> SExp:
         return SExpId('unreachable')
 
@@ -298,7 +378,7 @@ class WasmInstrTrap:
 type WasmInstr = WasmInstrConst | WasmInstrNumBinOp | WasmInstrIntRelOp | WasmInstrConvOp \
                | WasmInstrCall | WasmInstrCallIndirect | WasmInstrVarLocal | WasmInstrVarGlobal \
                | WasmInstrBranch | WasmInstrIf | WasmInstrLoop | WasmInstrBlock | WasmInstrMem \
-               | WasmInstrComment | WasmInstrTrap | WasmInstrDrop
+               | WasmInstrMemBulk | WasmInstrMemSize | WasmInstrMemInit | WasmInstrComment | WasmInstrTrap | WasmInstrDrop
 
 # instructions used for loop and for compiling to assembly
 type WasmInstrL = WasmInstrConst | WasmInstrNumBinOp | WasmInstrIntRelOp \
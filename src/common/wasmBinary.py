@@ -0,0 +1,371 @@
+"""
+Encoder for the binary format of WebAssembly, see
+https://webassembly.github.io/spec/core/binary/index.html
+
+encodeModule produces the same module as rendering the WasmModule to the textual format
+and converting it with wat2wasm, but without an external process and without parsing text.
+"""
+from __future__ import annotations
+from typing import *
+import struct
+from common.wasm import *
+
+MAGIC = b'\x00asm'
+VERSION = b'\x01\x00\x00\x00'
+
+_VALTYPES: dict[WasmValtype, int] = {'i32': 0x7F, 'i64': 0x7E, 'f32': 0x7D, 'f64': 0x7C}
+_EMPTY_BLOCKTYPE = 0x40
+_FUNCREF = 0x70
+_END = 0x0B
+
+_NUM_BIN_OPS: dict[tuple[str, str], int] = {
+    ('i32', 'add'): 0x6A, ('i32', 'sub'): 0x6B, ('i32', 'mul'): 0x6C,
+    ('i32', 'div_s'): 0x6D, ('i32', 'div_u'): 0x6E, ('i32', 'rem_s'): 0x6F, ('i32', 'rem_u'): 0x70,
+    ('i32', 'and'): 0x71, ('i32', 'or'): 0x72, ('i32', 'xor'): 0x73,
+    ('i32', 'shl'): 0x74, ('i32', 'shr_s'): 0x75, ('i32', 'shr_u'): 0x76,
+    ('i64', 'add'): 0x7C, ('i64', 'sub'): 0x7D, ('i64', 'mul'): 0x7E,
+    ('i64', 'div_s'): 0x7F, ('i64', 'div_u'): 0x80, ('i64', 'rem_s'): 0x81, ('i64', 'rem_u'): 0x82,
+    ('i64', 'and'): 0x83, ('i64', 'or'): 0x84, ('i64', 'xor'): 0x85,
+    ('i64', 'shl'): 0x86, ('i64', 'shr_s'): 0x87, ('i64', 'shr_u'): 0x88,
+    ('f32', 'add'): 0x92, ('f32', 'sub'): 0x93, ('f32', 'mul'): 0x94,
+    ('f64', 'add'): 0xA0, ('f64', 'sub'): 0xA1, ('f64', 'mul'): 0xA2
+}
+
+_INT_REL_OPS: dict[tuple[str, str], int] = {
+    ('i32', 'eq'): 0x46, ('i32', 'ne'): 0x47, ('i32', 'lt_s'): 0x48, ('i32', 'lt_u'): 0x49,
+    ('i32', 'gt_s'): 0x4A, ('i32', 'gt_u'): 0x4B, ('i32', 'le_s'): 0x4C, ('i32', 'le_u'): 0x4D,
+    ('i32', 'ge_s'): 0x4E, ('i32', 'ge_u'): 0x4F,
+    ('i64', 'eq'): 0x51, ('i64', 'ne'): 0x52, ('i64', 'lt_s'): 0x53, ('i64', 'lt_u'): 0x54,
+    ('i64', 'gt_s'): 0x55, ('i64', 'gt_u'): 0x56, ('i64', 'le_s'): 0x57, ('i64', 'le_u'): 0x58,
+    ('i64', 'ge_s'): 0x59, ('i64', 'ge_u'): 0x5A
+}
+
+_CONV_OPS: dict[str, int] = {
+    'i32.wrap_i64': 0xA7, 'i64.extend_i32_s': 0xAC, 'i64.extend_i32_u': 0xAD
+}
+
+# opcode and natural alignment (log2 of the size in bytes)
+_MEM_OPS: dict[tuple[str, str], tuple[int, int]] = {
+    ('i32', 'load'): (0x28, 2), ('i64', 'load'): (0x29, 3),
+    ('f32', 'load'): (0x2A, 2), ('f64', 'load'): (0x2B, 3),
+    ('i32', 'store'): (0x36, 2), ('i64', 'store'): (0x37, 3),
+    ('f32', 'store'): (0x38, 2), ('f64', 'store'): (0x39, 3)
+}
+
+class EncodeError(Exception):
+    pass
+
+def unsignedLeb128(n: int) -> bytes:
+    if n < 0:
+        raise EncodeError(f'Negative value for unsigned LEB128: {n}')
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+def signedLeb128(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if (n == 0 and not (b & 0x40)) or (n == -1 and (b & 0x40)):
+            out.append(b)
+            return bytes(out)
+        out.append(b | 0x80)
+
+def _wrapSigned(n: int, bits: int) -> int:
+    """
+    Interprets n as a bits-wide integer in two's complement. The textual format allows
+    constants in the range of both signed and unsigned integers.
+    """
+    if n < -(1 << (bits - 1)) or n >= (1 << bits):
+        raise EncodeError(f'Constant {n} out of range for i{bits}')
+    n &= (1 << bits) - 1
+    return n - (1 << bits) if n >= (1 << (bits - 1)) else n
+
+def _vec(items: list[bytes]) -> bytes:
+    return unsignedLeb128(len(items)) + b''.join(items)
+
+def _bytes(b: bytes) -> bytes:
+    return unsignedLeb128(len(b)) + b
+
+def _name(s: str) -> bytes:
+    return _bytes(s.encode('utf-8'))
+
+def _valtype(t: WasmValtype) -> bytes:
+    return bytes([_VALTYPES[t]])
+
+def _blocktype(t: Optional[WasmValtype]) -> bytes:
+    return bytes([_EMPTY_BLOCKTYPE]) if t is None else _valtype(t)
+
+def _section(id: int, content: bytes) -> bytes:
+    return bytes([id]) + unsignedLeb128(len(content)) + content
+
+type FuncType = tuple[tuple[WasmValtype, ...], tuple[WasmValtype, ...]]
+
+def _funcType(params: Iterable[WasmValtype], result: Optional[WasmValtype]) -> FuncType:
+    return (tuple(params), () if result is None else (result,))
+
+class _ModuleIndices:
+    """
+    Index spaces of a module: types, functions, globals, and passive data segments.
+    """
+    def __init__(self, m: WasmModule):
+        self.types: dict[FuncType, int] = {}
+        self.funcs: dict[str, int] = {}
+        self.globals: dict[str, int] = {}
+        for i in m.imports:
+            match i.desc:
+                case WasmImportFunc(id, params, result):
+                    self.typeIndex(_funcType(params, result))
+                    self.funcs[id.id] = len(self.funcs)
+                case WasmImportMemory():
+                    pass
+        for f in m.funcs:
+            self.typeIndex(_funcType([t for (_, t) in f.params], f.result))
+            self.funcs[f.id.id] = len(self.funcs)
+        for g in m.globals:
+            self.globals[g.id.id] = len(self.globals)
+        self.data: dict[str, int] = {}
+        for k, d in enumerate(m.data):
+            if isinstance(d, WasmDataPassive):
+                self.data[d.id.id] = k
+    def typeIndex(self, t: FuncType) -> int:
+        i = self.types.get(t)
+        if i is None:
+            i = len(self.types)
+            self.types[t] = i
+        return i
+    def funcIndex(self, id: WasmId) -> int:
+        try:
+            return self.funcs[id.id]
+        except KeyError:
+            raise EncodeError(f'Unknown function {id.id}')
+    def globalIndex(self, id: WasmId) -> int:
+        try:
+            return self.globals[id.id]
+        except KeyError:
+            raise EncodeError(f'Unknown global {id.id}')
+    def dataIndex(self, id: WasmId) -> int:
+        try:
+            return self.data[id.id]
+        except KeyError:
+            raise EncodeError(f'Unknown data segment {id.id}')
+
+class _InstrEncoder:
+    """
+    Encodes the instructions of a single function (or of a constant expression).
+    """
+    def __init__(self, indices: _ModuleIndices, locals: dict[str, int]):
+        self.indices = indices
+        self.locals = locals
+        # labels of the enclosing blocks, innermost last (None for if, which has no label)
+        self.labels: list[Optional[str]] = []
+        self.out = bytearray()
+
+    def localIndex(self, id: WasmId) -> int:
+        try:
+            return self.locals[id.id]
+        except KeyError:
+            raise EncodeError(f'Unknown local variable {id.id}')
+
+    def labelIndex(self, id: WasmId) -> int:
+        for (depth, l) in enumerate(reversed(self.labels)):
+            if l == id.id:
+                return depth
+        raise EncodeError(f'Unknown label {id.id}')
+
+    def encodeInstrs(self, instrs: list[WasmInstr]):
+        for i in instrs:
+            self.encodeInstr(i)
+
+    def encodeBlock(self, label: Optional[str], instrs: list[WasmInstr]):
+        self.labels.append(label)
+        self.encodeInstrs(instrs)
+        self.labels.pop()
+
+    def encodeInstr(self, instr: WasmInstr):
+        out = self.out
+        match instr:
+            case WasmInstrConst('i32', val):
+                out.append(0x41)
+                out += signedLeb128(_wrapSigned(int(val), 32))
+            case WasmInstrConst('i64', val):
+                out.append(0x42)
+                out += signedLeb128(_wrapSigned(int(val), 64))
+            case WasmInstrConst('f32', val):
+                out.append(0x43)
+                out += struct.pack('<f', val)
+            case WasmInstrConst('f64', val):
+                out.append(0x44)
+                out += struct.pack('<d', val)
+            case WasmInstrDrop():
+                out.append(0x1A)
+            case WasmInstrNumBinOp(ty, op):
+                out.append(_lookupOp(_NUM_BIN_OPS, (ty, op)))
+            case WasmInstrIntRelOp(ty, op):
+                out.append(_lookupOp(_INT_REL_OPS, (ty, op)))
+            case WasmInstrConvOp(op):
+                out.append(_lookupOp(_CONV_OPS, op))
+            case WasmInstrCall(id):
+                out.append(0x10)
+                out += unsignedLeb128(self.indices.funcIndex(id))
+            case WasmInstrCallIndirect(params, result):
+                out.append(0x11)
+                out += unsignedLeb128(self.indices.typeIndex(_funcType(params, result)))
+                out.append(0x00) # table index
+            case WasmInstrVarLocal(op, id):
+                out.append({'get': 0x20, 'set': 0x21, 'tee': 0x22}[op])
+                out += unsignedLeb128(self.localIndex(id))
+            case WasmInstrVarGlobal(op, id):
+                out.append({'get': 0x23, 'set': 0x24}[op])
+                out += unsignedLeb128(self.indices.globalIndex(id))
+            case WasmInstrMem(ty, op):
+                (opcode, align) = _lookupOp(_MEM_OPS, (ty, op))
+                out.append(opcode)
+                out += unsignedLeb128(align)
+                out += unsignedLeb128(0) # offset
+            case WasmInstrMemBulk('fill'):
+                out += bytes([0xFC]) + unsignedLeb128(11)
+                out.append(0x00) # memory index
+            case WasmInstrMemBulk('copy'):
+                out += bytes([0xFC]) + unsignedLeb128(10)
+                out += bytes([0x00, 0x00]) # memory indices of destination and source
+            case WasmInstrMemInit(data):
+                out += bytes([0xFC]) + unsignedLeb128(8)
+                out += unsignedLeb128(self.indices.dataIndex(data))
+                out.append(0x00) # memory index
+            case WasmInstrMemSize(op):
+                out.append(0x3F if op == 'size' else 0x40)
+                out.append(0x00) # memory index
+            case WasmInstrBranch(target, conditional):
+                out.append(0x0D if conditional else 0x0C)
+                out += unsignedLeb128(self.labelIndex(target))
+            case WasmInstrIf(resultType, thenInstrs, elseInstrs):
+                out.append(0x04)
+                out += _blocktype(resultType)
+                self.labels.append(None)
+                self.encodeInstrs(thenInstrs)
+                if elseInstrs:
+                    out.append(0x05)
+                    self.encodeInstrs(elseInstrs)
+                self.labels.pop()
+                out.append(_END)
+            case WasmInstrLoop(label, body):
+                out.append(0x03)
+                out += _blocktype(None)
+                self.encodeBlock(label.id, body)
+                out.append(_END)
+            case WasmInstrBlock(label, result, body):
+                out.append(0x02)
+                out += _blocktype(result)
+                self.encodeBlock(label.id, body)
+                out.append(_END)
+            case WasmInstrComment():
+                pass
+            case WasmInstrTrap():
+                out.append(0x00)
+            case _:
+                raise EncodeError(f'Unsupported instruction: {instr}')
+
+def _lookupOp[K, V](table: dict[K, V], key: K) -> V:
+    try:
+        return table[key]
+    except KeyError:
+        raise EncodeError(f'Unsupported instruction: {key}')
+
+def _constExpr(indices: _ModuleIndices, instrs: list[WasmInstr]) -> bytes:
+    enc = _InstrEncoder(indices, {})
+    enc.encodeInstrs(instrs)
+    enc.out.append(_END)
+    return bytes(enc.out)
+
+def _limits(min: int, max: Optional[int]) -> bytes:
+    if max is None:
+        return b'\x00' + unsignedLeb128(min)
+    else:
+        return b'\x01' + unsignedLeb128(min) + unsignedLeb128(max)
+
+def _encodeImport(indices: _ModuleIndices, i: WasmImport) -> bytes:
+    res = _name(i.module) + _name(i.name)
+    match i.desc:
+        case WasmImportFunc(_, params, result):
+            return res + b'\x00' + unsignedLeb128(indices.typeIndex(_funcType(params, result)))
+        case WasmImportMemory(min, max):
+            return res + b'\x02' + _limits(min, max)
+
+def _encodeFunc(indices: _ModuleIndices, f: WasmFunc) -> bytes:
+    locals: dict[str, int] = {}
+    for (id, _) in f.params + f.locals:
+        locals[id.id] = len(locals)
+    # consecutive locals of the same type are grouped together
+    groups: list[tuple[int, WasmValtype]] = []
+    for (_, t) in f.locals:
+        if groups and groups[-1][1] == t:
+            groups[-1] = (groups[-1][0] + 1, t)
+        else:
+            groups.append((1, t))
+    enc = _InstrEncoder(indices, locals)
+    enc.encodeInstrs(f.instrs)
+    enc.out.append(_END)
+    body = _vec([unsignedLeb128(n) + _valtype(t) for (n, t) in groups]) + bytes(enc.out)
+    return unsignedLeb128(len(body)) + body
+
+def encodeModule(m: WasmModule) -> bytes:
+    """
+    Returns the binary representation of m.
+    """
+    indices = _ModuleIndices(m)
+    # code may reference types of call_indirect, so encode it before the type section
+    code = [_encodeFunc(indices, f) for f in m.funcs]
+    imports = [_encodeImport(indices, i) for i in m.imports]
+    sections: list[bytes] = []
+    types = [b'\x60' + _vec([_valtype(t) for t in params]) + _vec([_valtype(t) for t in results])
+             for (params, results) in indices.types]
+    if types:
+        sections.append(_section(1, _vec(types)))
+    if imports:
+        sections.append(_section(2, _vec(imports)))
+    if m.funcs:
+        funcTypes = [unsignedLeb128(indices.typeIndex(_funcType([t for (_, t) in f.params], f.result)))
+                     for f in m.funcs]
+        sections.append(_section(3, _vec(funcTypes)))
+    n = len(m.funcTable.elems)
+    sections.append(_section(4, _vec([bytes([_FUNCREF]) + _limits(n, n)])))
+    if m.globals:
+        globals = [_valtype(g.ty) + (b'\x01' if g.mutable else b'\x00') +
+                   _constExpr(indices, g.init) for g in m.globals]
+        sections.append(_section(6, _vec(globals)))
+    if m.exports:
+        exports = [_name(e.name) + b'\x00' + unsignedLeb128(indices.funcIndex(e.desc.id))
+                   for e in m.exports]
+        sections.append(_section(7, _vec(exports)))
+    # the table is declared with inline elements, so there is always an element segment
+    offset = _constExpr(indices, [WasmInstrConst('i32', 0)])
+    elems = _vec([unsignedLeb128(indices.funcIndex(id)) for id in m.funcTable.elems])
+    sections.append(_section(9, _vec([unsignedLeb128(0) + offset + elems])))
+    if indices.data:
+        # memory.init requires the data count section
+        sections.append(_section(12, unsignedLeb128(len(m.data))))
+    if m.funcs:
+        sections.append(_section(10, _vec(code)))
+    if m.data:
+        sections.append(_section(11, _vec([_encodeData(indices, d) for d in m.data])))
+    return MAGIC + VERSION + b''.join(sections)
+
+def _encodeData(indices: _ModuleIndices, d: WasmData | WasmDataPassive) -> bytes:
+    match d:
+        case WasmData(start, content):
+            return unsignedLeb128(0) + _constExpr(indices, [WasmInstrConst('i32', start)]) + \
+                _bytes(content.encode('utf-8'))
+        case WasmDataPassive(_, content):
+            return unsignedLeb128(1) + _bytes(content)
+
+def writeModule(m: WasmModule, output: str):
+    with open(output, 'wb') as f:
+        f.write(encodeModule(m))
@@ -0,0 +1,611 @@
+"""
+An interpreter for WasmModule objects, so that compiled programs can run inside the current
+process, without wat2wasm, iwasm and the native library from wasm-support.
+
+Only the subset of wasm emitted by our compilers is supported (see common/wasm.py), together
+with the functions imported from the env module (see compilerSupport.wasmImports).
+
+Before execution, the body of every function is translated into a tree of python closures.
+Each closure operates on the operand stack and the locals of the current call and returns -1
+if execution continues with the next instruction, or the number of enclosing blocks to leave
+if it executes a branch.
+"""
+from __future__ import annotations
+from typing import *
+from dataclasses import dataclass
+import struct
+import sys
+from common.wasm import *
+import common.constants as constants
+from common.utils import wrap32, wrap64
+
+PAGE_SIZE = 64 * 1024
+
+# Memory is allocated lazily, starting with this many bytes. The default memory size of our
+# compilers is 100MB, allocating all of it upfront would dominate the runtime of small programs.
+_INITIAL_MEM_BYTES = 64 * 1024
+
+# Maximum number of pages of a 32-bit memory
+_MAX_PAGES = 65536
+
+_MASK32 = 0xFFFFFFFF
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+class WasmTrap(Exception):
+    """
+    Raised if execution traps, e.g. by executing unreachable or by an out of bounds memory access.
+    """
+    pass
+
+class WasmMemory:
+    """
+    Linear memory, growing up to maxPages with memory.grow. The bytes are allocated on
+    first access.
+    """
+    def __init__(self, pages: int, maxPages: Optional[int] = None):
+        self.size = pages * PAGE_SIZE
+        self.maxPages = maxPages if maxPages is not None else _MAX_PAGES
+        self.data = bytearray(min(self.size, _INITIAL_MEM_BYTES))
+
+    def grow(self, pages: int) -> int:
+        """
+        Grows the memory by the given number of pages. Returns the old size in pages, or -1
+        if the memory cannot grow that much.
+        """
+        old = self.size // PAGE_SIZE
+        if old + pages > self.maxPages:
+            return -1
+        self.size += pages * PAGE_SIZE
+        return old
+
+    def ensure(self, end: int):
+        """
+        Makes sure that all bytes below end are allocated. Traps if end is beyond the size
+        of the memory.
+        """
+        if end > self.size:
+            raise WasmTrap('out of bounds memory access')
+        have = len(self.data)
+        if end > have:
+            newLen = min(self.size, max(end, 2 * have))
+            self.data.extend(bytes(newLen - have))
+
+    def read(self, start: int, n: int) -> bytes:
+        self.ensure(start + n)
+        return bytes(self.data[start:start+n])
+
+    def write(self, start: int, b: bytes):
+        self.ensure(start + len(b))
+        self.data[start:start+len(b)] = b
+
+    def fill(self, start: int, b: int, n: int):
+        self.ensure(start + n)
+        self.data[start:start+n] = bytes([b]) * n
+
+    def copy(self, dest: int, src: int, n: int):
+        self.ensure(max(dest, src) + n)
+        self.data[dest:dest+n] = self.data[src:src+n]
+
+class WasmEnv:
+    """
+    The functions of the env module, with the same behavior as the native library
+    in wasm-support/native-lib.
+    """
+    def __init__(self, stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None,
+                 stderr: Optional[TextIO] = None):
+        self.stdin = stdin if stdin is not None else sys.stdin
+        self.stdout = stdout if stdout is not None else sys.stdout
+        self.stderr = stderr if stderr is not None else sys.stderr
+        self._pushback = ''
+
+    def print(self, mem: WasmMemory, start: int, n: int):
+        s = mem.read(start & _MASK32, n & _MASK32).decode('utf-8', errors='replace')
+        self.stdout.write(s + '\n')
+
+    def print_err(self, mem: WasmMemory, start: int, n: int):
+        s = mem.read(start & _MASK32, n & _MASK32).decode('utf-8', errors='replace')
+        self.stdout.flush()
+        self.stderr.write(f'ERROR: {s}\n')
+
+    def print_i32(self, x: int):
+        self.stdout.write(f'{x}\n')
+
+    def print_i64(self, x: int):
+        self.stdout.write(f'{x}\n')
+
+    def print_bool(self, x: int):
+        self.stdout.write('True\n' if x else 'False\n')
+
+    def _readChar(self) -> str:
+        if self._pushback:
+            c = self._pushback
+            self._pushback = ''
+            return c
+        return self.stdin.read(1)
+
+    def _readInt(self) -> int:
+        """
+        Reads an integer like scanf("%d") does: leading whitespace is skipped.
+        """
+        if self.stdout.isatty():
+            self.stdout.write('input int: ')
+            self.stdout.flush()
+        c = self._readChar()
+        while c and c.isspace():
+            c = self._readChar()
+        digits = ''
+        if c in ['-', '+']:
+            digits = c
+            c = self._readChar()
+        while c and c.isdigit():
+            digits += c
+            c = self._readChar()
+        self._pushback = c
+        try:
+            return int(digits)
+        except ValueError:
+            self.stderr.write('Invalid input\n')
+            raise WasmTrap('invalid input')
+
+    def input_i32(self) -> int:
+        return wrap32(self._readInt())
+
+    def input_i64(self) -> int:
+        return wrap64(self._readInt())
+
+type _Code = Callable[[list[int], list[int]], int]
+
+@dataclass
+class _Func:
+    params: list[WasmValtype]
+    result: Optional[WasmValtype]
+    invoke: Callable[[list[int]], Optional[int]]
+
+def _runSeq(code: list[_Code], stack: list[int], locals: list[int]) -> int:
+    for c in code:
+        d = c(stack, locals)
+        if d >= 0:
+            return d
+    return -1
+
+_I32 = struct.Struct('<i')
+_I64 = struct.Struct('<q')
+
+def binOpFun(ty: WasmValtype, op: str) -> Callable[[int, int], int]:
+    if ty == 'i32':
+        wrap = wrap32
+        bits = 32
+        mask = _MASK32
+    elif ty == 'i64':
+        wrap = wrap64
+        bits = 64
+        mask = _MASK64
+    else:
+        raise ValueError(f'Unsupported type for {op}: {ty}')
+    match op:
+        case 'add': return lambda a, b: wrap(a + b)
+        case 'sub': return lambda a, b: wrap(a - b)
+        case 'mul': return lambda a, b: wrap(a * b)
+        case 'xor': return lambda a, b: a ^ b
+        case 'and': return lambda a, b: a & b
+        case 'or': return lambda a, b: a | b
+        case 'shl': return lambda a, b: wrap(a << (b % bits))
+        case 'shr_u': return lambda a, b: wrap((a & mask) >> (b % bits))
+        case _:
+            raise ValueError(f'Unsupported operator: {ty}.{op}')
+
+def relOpFun(ty: Literal['i32', 'i64'], op: str) -> Callable[[int, int], bool]:
+    mask = _MASK32 if ty == 'i32' else _MASK64
+    match op:
+        case 'eq': return lambda a, b: a == b
+        case 'ne': return lambda a, b: a != b
+        case 'lt_s': return lambda a, b: a < b
+        case 'gt_s': return lambda a, b: a > b
+        case 'le_s': return lambda a, b: a <= b
+        case 'ge_s': return lambda a, b: a >= b
+        case 'lt_u': return lambda a, b: (a & mask) < (b & mask)
+        case 'gt_u': return lambda a, b: (a & mask) > (b & mask)
+        case 'le_u': return lambda a, b: (a & mask) <= (b & mask)
+        case 'ge_u': return lambda a, b: (a & mask) >= (b & mask)
+        case _:
+            raise ValueError(f'Unsupported operator: {ty}.{op}')
+
+def convOpFun(op: Literal['i32.wrap_i64', 'i64.extend_i32_u', 'i64.extend_i32_s']) \
+        -> Callable[[int], int]:
+    match op:
+        case 'i32.wrap_i64': return wrap32
+        case 'i64.extend_i32_u': return lambda x: x & _MASK32
+        case 'i64.extend_i32_s': return lambda x: x
+
+class WasmInstance:
+    """
+    An instantiated module: memory, globals and functions.
+    """
+    def __init__(self, m: WasmModule, env: WasmEnv):
+        self.env = env
+        self.memory = WasmMemory(0)
+        self.funcs: dict[str, _Func] = {}
+        for imp in m.imports:
+            match imp.desc:
+                case WasmImportMemory(min, max):
+                    self.memory = WasmMemory(min, max)
+                case WasmImportFunc(id, params, result):
+                    self.funcs[id.id] = _Func(params, result, self._importedFun(imp.module, imp.name))
+        self.globalIndex: dict[str, int] = {}
+        self.globals: list[int] = []
+        for g in m.globals:
+            self.globalIndex[g.id.id] = len(self.globals)
+            self.globals.append(self._constExpr(g.init))
+        self.data: dict[str, bytes] = {}
+        for d in m.data:
+            match d:
+                case WasmData(start, content):
+                    self.memory.write(start, content.encode('utf-8'))
+                case WasmDataPassive(id, content):
+                    self.data[id.id] = content
+        self.table = [e.id for e in m.funcTable.elems]
+        for f in m.funcs:
+            self.funcs[f.id.id] = _Func([t for (_, t) in f.params], f.result,
+                                        self._notCompiled(f.id.id))
+        for f in m.funcs:
+            self.funcs[f.id.id].invoke = _FuncCompiler(self, f).compile()
+        self.exports = {e.name: e.desc.id.id for e in m.exports}
+
+    def _notCompiled(self, name: str) -> Callable[[list[int]], Optional[int]]:
+        def f(_args: list[int]) -> Optional[int]:
+            raise WasmTrap(f'function {name} called during instantiation')
+        return f
+
+    def _importedFun(self, module: str, name: str) -> Callable[[list[int]], Optional[int]]:
+        if module != 'env':
+            raise ValueError(f'Unknown import module: {module}')
+        f = getattr(self.env, name, None)
+        if f is None:
+            raise ValueError(f'Unknown import: {module}.{name}')
+        if name in ['print', 'print_err']:
+            return lambda args: f(self.memory, *args)
+        return lambda args: f(*args)
+
+    def _constExpr(self, instrs: list[WasmInstr]) -> int:
+        match instrs:
+            case [WasmInstrConst(_, val)]:
+                return int(val)
+            case [WasmInstrVarGlobal('get', id)]:
+                return self.globals[self.globalIndex[id.id]]
+            case _:
+                raise ValueError(f'Unsupported constant expression: {instrs}')
+
+    def call(self, name: str, args: list[int] = []) -> Optional[int]:
+        """
+        Calls the exported function name.
+        """
+        f = self.funcs[self.exports[name]]
+        try:
+            return f.invoke(args)
+        except RecursionError:
+            raise WasmTrap('call stack exhausted')
+
+class _FuncCompiler:
+    """
+    Translates the body of a function into closures.
+    """
+    def __init__(self, inst: WasmInstance, f: WasmFunc):
+        self.inst = inst
+        self.func = f
+        self.localIndex: dict[str, int] = {}
+        for (id, _) in f.params + f.locals:
+            self.localIndex[id.id] = len(self.localIndex)
+        # label names of the enclosing blocks, innermost last. None for if blocks.
+        self.labels: list[Optional[str]] = []
+
+    def compile(self) -> Callable[[list[int]], Optional[int]]:
+        body = self.compileInstrs(self.func.instrs)
+        nLocals = len(self.func.locals)
+        hasResult = self.func.result is not None
+        def invoke(args: list[int]) -> Optional[int]:
+            stack: list[int] = []
+            locals = list(args) + [0] * nLocals
+            _runSeq(body, stack, locals)
+            return stack[-1] if hasResult else None
+        return invoke
+
+    def compileInstrs(self, instrs: list[WasmInstr]) -> list[_Code]:
+        res: list[_Code] = []
+        for i in instrs:
+            c = self.compileInstr(i)
+            if c is not None:
+                res.append(c)
+        return res
+
+    def labelDepth(self, label: WasmId) -> int:
+        for d, l in enumerate(reversed(self.labels)):
+            if l == label.id:
+                return d
+        raise ValueError(f'Unknown label {label.id} in function {self.func.id.id}')
+
+    def compileBlockBody(self, label: Optional[str], instrs: list[WasmInstr]) -> list[_Code]:
+        self.labels.append(label)
+        try:
+            return self.compileInstrs(instrs)
+        finally:
+            self.labels.pop()
+
+    def compileInstr(self, i: WasmInstr) -> Optional[_Code]:
+        inst = self.inst
+        match i:
+            case WasmInstrComment(_):
+                return None
+            case WasmInstrConst(_, val):
+                v = int(val)
+                def const(stack: list[int], _l: list[int]) -> int:
+                    stack.append(v)
+                    return -1
+                return const
+            case WasmInstrDrop():
+                def drop(stack: list[int], _l: list[int]) -> int:
+                    stack.pop()
+                    return -1
+                return drop
+            case WasmInstrNumBinOp(ty, op):
+                f = binOpFun(ty, op)
+                def binOp(stack: list[int], _l: list[int]) -> int:
+                    b = stack.pop()
+                    stack[-1] = f(stack[-1], b)
+                    return -1
+                return binOp
+            case WasmInstrIntRelOp(ty, op):
+                r = relOpFun(ty, op)
+                def relOp(stack: list[int], _l: list[int]) -> int:
+                    b = stack.pop()
+                    stack[-1] = 1 if r(stack[-1], b) else 0
+                    return -1
+                return relOp
+            case WasmInstrConvOp(op):
+                conv = convOpFun(op)
+                def convOp(stack: list[int], _l: list[int]) -> int:
+                    stack[-1] = conv(stack[-1])
+                    return -1
+                return convOp
+            case WasmInstrVarLocal(op, id):
+                k = self.localIndex[id.id]
+                match op:
+                    case 'get':
+                        def localGet(stack: list[int], locals: list[int]) -> int:
+                            stack.append(locals[k])
+                            return -1
+                        return localGet
+                    case 'set':
+                        def localSet(stack: list[int], locals: list[int]) -> int:
+                            locals[k] = stack.pop()
+                            return -1
+                        return localSet
+                    case 'tee':
+                        def localTee(stack: list[int], locals: list[int]) -> int:
+                            locals[k] = stack[-1]
+                            return -1
+                        return localTee
+            case WasmInstrVarGlobal(op, id):
+                k = inst.globalIndex[id.id]
+                globals = inst.globals
+                if op == 'get':
+                    def globalGet(stack: list[int], _l: list[int]) -> int:
+                        stack.append(globals[k])
+                        return -1
+                    return globalGet
+                else:
+                    def globalSet(stack: list[int], _l: list[int]) -> int:
+                        globals[k] = stack.pop()
+                        return -1
+                    return globalSet
+            case WasmInstrMem(ty, op):
+                return self.compileMem(ty, op)
+            case WasmInstrMemBulk(op):
+                return self.compileMemBulk(op)
+            case WasmInstrMemSize(op):
+                return self.compileMemSize(op)
+            case WasmInstrMemInit(data):
+                return self.compileMemInit(data.id)
+            case WasmInstrTrap():
+                def trap(_s: list[int], _l: list[int]) -> int:
+                    raise WasmTrap('unreachable')
+                return trap
+            case WasmInstrCall(id):
+                return self.compileCall(inst.funcs[id.id])
+            case WasmInstrCallIndirect(params, result):
+                return self.compileCallIndirect(params, result)
+            case WasmInstrBranch(target, conditional):
+                d = self.labelDepth(target)
+                if conditional:
+                    def brIf(stack: list[int], _l: list[int]) -> int:
+                        return d if stack.pop() else -1
+                    return brIf
+                else:
+                    def br(_s: list[int], _l: list[int]) -> int:
+                        return d
+                    return br
+            case WasmInstrBlock(label, result, body):
+                return self.compileBlock(self.compileBlockBody(label.id, body), result is not None)
+            case WasmInstrLoop(label, body):
+                return self.compileLoop(self.compileBlockBody(label.id, body))
+            case WasmInstrIf(result, thenInstrs, elseInstrs):
+                thenCode = self.compileBlockBody(None, thenInstrs)
+                elseCode = self.compileBlockBody(None, elseInstrs)
+                return self.compileIf(thenCode, elseCode, result is not None)
+
+    def compileMem(self, ty: WasmValtype, op: Literal['load', 'store']) -> _Code:
+        mem = self.inst.memory
+        match ty:
+            case 'i32': s = _I32
+            case 'i64': s = _I64
+            case _: raise ValueError(f'Unsupported memory access: {ty}.{op}')
+        n = s.size
+        unpack = s.unpack_from
+        pack = s.pack_into
+        if op == 'load':
+            def load(stack: list[int], _l: list[int]) -> int:
+                a = stack[-1] & _MASK32
+                try:
+                    stack[-1] = unpack(mem.data, a)[0]
+                except struct.error:
+                    mem.ensure(a + n)
+                    stack[-1] = unpack(mem.data, a)[0]
+                return -1
+            return load
+        else:
+            def store(stack: list[int], _l: list[int]) -> int:
+                v = stack.pop()
+                a = stack.pop() & _MASK32
+                try:
+                    pack(mem.data, a, v)
+                except struct.error:
+                    mem.ensure(a + n)
+                    pack(mem.data, a, v)
+                return -1
+            return store
+
+    def compileMemSize(self, op: Literal['size', 'grow']) -> _Code:
+        mem = self.inst.memory
+        if op == 'size':
+            def size(stack: list[int], _l: list[int]) -> int:
+                stack.append(mem.size // PAGE_SIZE)
+                return -1
+            return size
+        else:
+            def grow(stack: list[int], _l: list[int]) -> int:
+                stack[-1] = mem.grow(stack[-1] & _MASK32)
+                return -1
+            return grow
+
+    def compileMemBulk(self, op: Literal['fill', 'copy']) -> _Code:
+        mem = self.inst.memory
+        if op == 'fill':
+            def fill(stack: list[int], _l: list[int]) -> int:
+                n = stack.pop() & _MASK32
+                b = stack.pop() & 0xFF
+                d = stack.pop() & _MASK32
+                mem.fill(d, b, n)
+                return -1
+            return fill
+        else:
+            def copy(stack: list[int], _l: list[int]) -> int:
+                n = stack.pop() & _MASK32
+                s = stack.pop() & _MASK32
+                d = stack.pop() & _MASK32
+                mem.copy(d, s, n)
+                return -1
+            return copy
+
+    def compileMemInit(self, data: str) -> _Code:
+        mem = self.inst.memory
+        content = self.inst.data[data]
+        def init(stack: list[int], _l: list[int]) -> int:
+            n = stack.pop() & _MASK32
+            s = stack.pop() & _MASK32
+            d = stack.pop() & _MASK32
+            if s + n > len(content):
+                raise WasmTrap('out of bounds memory access')
+            mem.write(d, content[s:s+n])
+            return -1
+        return init
+
+    def compileCall(self, f: _Func) -> _Code:
+        n = len(f.params)
+        hasResult = f.result is not None
+        def call(stack: list[int], _l: list[int]) -> int:
+            if n:
+                args = stack[-n:]
+                del stack[-n:]
+            else:
+                args = []
+            r = f.invoke(args)
+            if hasResult:
+                stack.append(cast(int, r))
+            return -1
+        return call
+
+    def compileCallIndirect(self, params: list[WasmValtype], result: Optional[WasmValtype]) -> _Code:
+        funcs = self.inst.funcs
+        table = self.inst.table
+        n = len(params)
+        def callIndirect(stack: list[int], _l: list[int]) -> int:
+            k = stack.pop() & _MASK32
+            if k >= len(table):
+                raise WasmTrap('undefined element')
+            f = funcs[table[k]]
+            if f.params != params or f.result != result:
+                raise WasmTrap('indirect call type mismatch')
+            if n:
+                args = stack[-n:]
+                del stack[-n:]
+            else:
+                args = []
+            r = f.invoke(args)
+            if result is not None:
+                stack.append(cast(int, r))
+            return -1
+        return callIndirect
+
+    def compileBlock(self, body: list[_Code], hasResult: bool) -> _Code:
+        def block(stack: list[int], locals: list[int]) -> int:
+            h = len(stack)
+            d = _runSeq(body, stack, locals)
+            if d < 0:
+                return -1
+            if d == 0:
+                _unwind(stack, h, hasResult)
+                return -1
+            return d - 1
+        return block
+
+    def compileLoop(self, body: list[_Code]) -> _Code:
+        def loop(stack: list[int], locals: list[int]) -> int:
+            h = len(stack)
+            while True:
+                d = _runSeq(body, stack, locals)
+                if d < 0:
+                    return -1
+                if d > 0:
+                    return d - 1
+                del stack[h:]
+        return loop
+
+    def compileIf(self, thenCode: list[_Code], elseCode: list[_Code], hasResult: bool) -> _Code:
+        def if_(stack: list[int], locals: list[int]) -> int:
+            c = stack.pop()
+            h = len(stack)
+            d = _runSeq(thenCode if c else elseCode, stack, locals)
+            if d < 0:
+                return -1
+            if d == 0:
+                _unwind(stack, h, hasResult)
+                return -1
+            return d - 1
+        return if_
+
+def _unwind(stack: list[int], height: int, keepTop: bool):
+    if keepTop:
+        v = stack[-1]
+        del stack[height:]
+        stack.append(v)
+    else:
+        del stack[height:]
+
+def instantiate(m: WasmModule, env: Optional[WasmEnv] = None) -> WasmInstance:
+    return WasmInstance(m, env or WasmEnv())
+
+def runModule(m: WasmModule, env: Optional[WasmEnv] = None, entry: str = 'main') -> int:
+    """
+    Runs the exported function entry of m. Returns the exit code: 0 on success,
+    RUN_ERROR_EXIT_CODE if execution traps. The reason of a trap is written to stderr.
+    """
+    env = env or WasmEnv()
+    try:
+        inst = instantiate(m, env)
+        inst.call(entry)
+        env.stdout.flush()
+        return 0
+    except WasmTrap as e:
+        env.stdout.flush()
+        env.stderr.write(f'Exception: {e}\n')
+        return constants.RUN_ERROR_EXIT_CODE
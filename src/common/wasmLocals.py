@@ -0,0 +1,164 @@
+"""
+Optimizes the locals of wasm functions:
+
+- Locals that are never read are removed. local.set of such a local becomes drop,
+  local.tee disappears.
+- Locals whose live ranges do not overlap share one slot (separately for each type).
+
+Liveness is computed backwards over the structured instructions. A branch continues with
+the live locals of its target: for a block, these are the locals live after the block;
+for a loop, the locals live at the start of the loop (computed as a fixpoint).
+
+Two locals interfere if one of them is written while the other one is live. Params and locals
+live at the start of the function (which read the implicit initial value 0) are never merged
+with other locals.
+"""
+from __future__ import annotations
+from typing import *
+from dataclasses import replace
+from common.wasm import *
+
+def optimizeModule(m: WasmModule) -> WasmModule:
+    return replace(m, funcs=[optimizeFunc(f) for f in m.funcs])
+
+def optimizeFunc(f: WasmFunc) -> WasmFunc:
+    read = _readLocals(f.instrs)
+    unused = set(x.id for (x, _) in f.locals if x.id not in read)
+    instrs = _removeWrites(f.instrs, unused)
+    locals: list[tuple[WasmId, WasmValtype]] = [(x, t) for (x, t) in f.locals if x.id not in unused]
+    slots = _assignSlots(f.params, locals, instrs)
+    if slots:
+        instrs = _rename(instrs, slots)
+        locals = [(x, t) for (x, t) in locals if x.id not in slots]
+    return replace(f, locals=locals, instrs=instrs)
+
+def _readLocals(instrs: list[WasmInstr]) -> set[str]:
+    res: set[str] = set()
+    def go(instrs: list[WasmInstr]):
+        for i in instrs:
+            match i:
+                case WasmInstrVarLocal('get', x):
+                    res.add(x.id)
+                case WasmInstrBlock(_, _, body) | WasmInstrLoop(_, body):
+                    go(body)
+                case WasmInstrIf(_, thenInstrs, elseInstrs):
+                    go(thenInstrs)
+                    go(elseInstrs)
+                case _:
+                    pass
+    go(instrs)
+    return res
+
+def _mapNested(i: WasmInstr, f: Callable[[list[WasmInstr]], list[WasmInstr]]) -> WasmInstr:
+    match i:
+        case WasmInstrBlock(label, result, body):
+            return WasmInstrBlock(label, result, f(body))
+        case WasmInstrLoop(label, body):
+            return WasmInstrLoop(label, f(body))
+        case WasmInstrIf(result, thenInstrs, elseInstrs):
+            return WasmInstrIf(result, f(thenInstrs), f(elseInstrs))
+        case _:
+            return i
+
+def _removeWrites(instrs: list[WasmInstr], unused: set[str]) -> list[WasmInstr]:
+    if not unused:
+        return instrs
+    res: list[WasmInstr] = []
+    for i in instrs:
+        match i:
+            case WasmInstrVarLocal('set', x) if x.id in unused:
+                res.append(WasmInstrDrop())
+            case WasmInstrVarLocal('tee', x) if x.id in unused:
+                pass
+            case _:
+                res.append(_mapNested(i, lambda l: _removeWrites(l, unused)))
+    return res
+
+def _rename(instrs: list[WasmInstr], slots: dict[str, WasmId]) -> list[WasmInstr]:
+    res: list[WasmInstr] = []
+    for i in instrs:
+        match i:
+            case WasmInstrVarLocal(op, x) if x.id in slots:
+                res.append(WasmInstrVarLocal(op, slots[x.id]))
+            case _:
+                res.append(_mapNested(i, lambda l: _rename(l, slots)))
+    return res
+
+class _Liveness:
+    def __init__(self):
+        self.labels: dict[str, frozenset[str]] = {}
+        self.interference: dict[str, set[str]] = {}
+
+    def written(self, x: str, liveAfter: frozenset[str]):
+        s = self.interference.setdefault(x, set())
+        for y in liveAfter:
+            if y != x:
+                s.add(y)
+                self.interference.setdefault(y, set()).add(x)
+
+    def liveIn(self, instrs: list[WasmInstr], liveOut: frozenset[str]) -> frozenset[str]:
+        live: frozenset[str] = liveOut
+        for i in reversed(instrs):
+            match i:
+                case WasmInstrVarLocal('get', x):
+                    live = live | frozenset([x.id])
+                case WasmInstrVarLocal(_, x):
+                    self.written(x.id, live)
+                    live = live - frozenset([x.id])
+                case WasmInstrBranch(target, conditional):
+                    targetLive = self.labels.get(target.id, frozenset[str]())
+                    live = live | targetLive if conditional else targetLive
+                case WasmInstrTrap():
+                    live = frozenset[str]()
+                case WasmInstrBlock(label, _, body):
+                    old = self.labels.get(label.id)
+                    self.labels[label.id] = live
+                    live = self.liveIn(body, live)
+                    self._restore(label.id, old)
+                case WasmInstrLoop(label, body):
+                    old = self.labels.get(label.id)
+                    start: frozenset[str] = frozenset()
+                    while True:
+                        self.labels[label.id] = start
+                        newStart = self.liveIn(body, live)
+                        if newStart == start:
+                            break
+                        start = newStart
+                    live = start
+                    self._restore(label.id, old)
+                case WasmInstrIf(_, thenInstrs, elseInstrs):
+                    live = self.liveIn(thenInstrs, live) | self.liveIn(elseInstrs, live)
+                case _:
+                    pass
+        return live
+
+    def _restore(self, label: str, old: Optional[frozenset[str]]):
+        if old is None:
+            del self.labels[label]
+        else:
+            self.labels[label] = old
+
+def _assignSlots(params: list[tuple[WasmId, WasmValtype]], locals: list[tuple[WasmId, WasmValtype]],
+                 instrs: list[WasmInstr]) -> dict[str, WasmId]:
+    """
+    Returns a mapping from locals to the locals whose slot they use instead of their own.
+    """
+    l = _Liveness()
+    liveAtStart = l.liveIn(instrs, frozenset())
+    fixed = set(x.id for (x, _) in params) | liveAtStart
+    slots: dict[str, WasmId] = {}
+    # for each type: the slots so far, each with the locals assigned to it
+    available: dict[WasmValtype, list[tuple[WasmId, set[str]]]] = {}
+    for (x, t) in locals:
+        if x.id in fixed:
+            continue
+        conflicts = l.interference.get(x.id, set())
+        candidates = available.setdefault(t, [])
+        for (slot, members) in candidates:
+            if not (members & conflicts):
+                members.add(x.id)
+                slots[x.id] = slot
+                break
+        else:
+            candidates.append((x, {x.id}))
+    return slots
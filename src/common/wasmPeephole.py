@@ -0,0 +1,85 @@
+"""
+A peephole optimizer for the instructions of a WasmModule. It runs after compileModule and
+before the module is rendered or encoded.
+
+The instructions of a function are processed from left to right and appended to an output list.
+Before appending an instruction, it is combined with the instructions at the end of the output
+list if possible. This way, rewrites cascade: folding two constants might enable folding the
+result with another constant.
+"""
+from __future__ import annotations
+from typing import *
+from dataclasses import replace
+from common.wasm import *
+import common.wasmInterp as wasmInterp
+
+def optimizeModule(m: WasmModule) -> WasmModule:
+    return replace(m, funcs=[replace(f, instrs=optimizeInstrs(f.instrs)) for f in m.funcs])
+
+def optimizeInstrs(instrs: list[WasmInstr]) -> list[WasmInstr]:
+    out: list[WasmInstr] = []
+    for i in instrs:
+        _append(out, _optimizeNested(i))
+    return out
+
+def _optimizeNested(i: WasmInstr) -> WasmInstr:
+    match i:
+        case WasmInstrBlock(label, result, body):
+            return WasmInstrBlock(label, result, optimizeInstrs(body))
+        case WasmInstrLoop(label, body):
+            return WasmInstrLoop(label, optimizeInstrs(body))
+        case WasmInstrIf(result, thenInstrs, elseInstrs):
+            return WasmInstrIf(result, optimizeInstrs(thenInstrs), optimizeInstrs(elseInstrs))
+        case _:
+            return i
+
+def _intConst(i: WasmInstr) -> Optional[int]:
+    match i:
+        case WasmInstrConst('i32' | 'i64', int(v)):
+            return v
+        case _:
+            return None
+
+def _isPure(i: WasmInstr) -> bool:
+    """
+    True if i only pushes a value on the stack, without any other effect.
+    """
+    match i:
+        case WasmInstrConst() | WasmInstrVarLocal('get', _) | WasmInstrVarGlobal('get', _):
+            return True
+        case _:
+            return False
+
+def _append(out: list[WasmInstr], i: WasmInstr):
+    last = out[-1] if out else None
+    match (last, i):
+        case (WasmInstrVarLocal('set', x), WasmInstrVarLocal('get', y)) if x == y:
+            out[-1] = WasmInstrVarLocal('tee', x)
+        case (WasmInstrVarLocal('tee', x), WasmInstrDrop()):
+            out[-1] = WasmInstrVarLocal('set', x)
+        case (_, WasmInstrDrop()) if last is not None and _isPure(last):
+            out.pop()
+        case (WasmInstrConst(), WasmInstrNumBinOp(ty, op)) if len(out) >= 2 and \
+                _intConst(out[-2]) is not None and _intConst(last) is not None:
+            b = cast(int, _intConst(out.pop()))
+            a = cast(int, _intConst(out.pop()))
+            _append(out, WasmInstrConst(ty, wasmInterp.binOpFun(ty, op)(a, b)))
+        case (WasmInstrConst(), WasmInstrIntRelOp(ty, op)) if len(out) >= 2 and \
+                _intConst(out[-2]) is not None and _intConst(last) is not None:
+            b = cast(int, _intConst(out.pop()))
+            a = cast(int, _intConst(out.pop()))
+            _append(out, WasmInstrConst('i32', 1 if wasmInterp.relOpFun(ty, op)(a, b) else 0))
+        case (WasmInstrConst(), WasmInstrConvOp(op)) if _intConst(last) is not None:
+            out.pop()
+            ty = 'i32' if op == 'i32.wrap_i64' else 'i64'
+            _append(out, WasmInstrConst(ty, wasmInterp.convOpFun(op)(cast(int, _intConst(last)))))
+        case (WasmInstrConst(), WasmInstrIf(_, thenInstrs, elseInstrs)) \
+                if _intConst(last) is not None:
+            # The if has no label, so branches inside refer to enclosing blocks only
+            out.pop()
+            for j in (thenInstrs if _intConst(last) else elseInstrs):
+                _append(out, j)
+        case (_, WasmInstrIf(None, [], [])):
+            _append(out, WasmInstrDrop())
+        case _:
+            out.append(i)
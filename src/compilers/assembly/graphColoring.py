@@ -1,7 +1,7 @@
 from assembly.common import *
 import assembly.tac_ast as tac
 import common.log as log
-from common.prioQueue import PrioQueue
+from common.prioQueue import PrioQueue, BucketPrioQueue, PrioQueueKind
 
 def chooseColor(x: tac.ident, forbidden: dict[tac.ident, set[int]]) -> int:
     """
@@ -16,23 +16,16 @@ def chooseColor(x: tac.ident, forbidden: dict[tac.ident, set[int]]) -> int:
 
 
 
-def getAdjacent(u: tac.ident, g: InterfGraph) -> set[tac.ident]:
+def getAdjacent(u: tac.ident, g: InterfGraph) -> list[tac.ident]:
     """
-    Returns the vertices that have an edge in common with u
+    Returns the vertices that have an edge in common with u. The graph stores
+    the neighbours of every vertex, so this runs in O(deg(u)) instead of scanning
+    all edges.
     """
-    adjacentVertices: set[tac.ident] = set()
-    for e in g.edges:
-        # check if the vertex u appears in the edge
-        if u in e:
-            # add the other vertex from the edge as an adjacent vertex
-            if u == e[0]:
-                adjacentVertices.add(e[1])
-            elif u == e[1]:
-                adjacentVertices.add(e[0])
-    return adjacentVertices
+    return g.succs(u)
 
 def colorInterfGraph(g: InterfGraph, secondaryOrder: dict[tac.ident, int]={},
-                     maxRegs: int=MAX_REGISTERS) -> RegisterMap:
+                     maxRegs: int=MAX_REGISTERS, queue: PrioQueueKind='bucket') -> RegisterMap:
     """
     Given an interference graph, computes a register map mapping a TAC variable
     to a TACspill variable. You have to implement the "simple graph coloring algorithm"
@@ -41,11 +34,15 @@ def colorInterfGraph(g: InterfGraph, secondaryOrder: dict[tac.ident, int]={},
     - Parameter maxRegs is the maximum number of registers we are allowed to use.
     - Parameter secondaryOrder is used by the tests to get deterministic results even
       if two variables have the same number of forbidden colors.
+    - Parameter queue selects the priority queue: a binary heap or a bucket queue.
+      The bucket queue increments priorities and pops the maximum in (amortized)
+      constant time.
     """
-    log.debug(f"Coloring interference graph with maxRegs={maxRegs}")
+    log.debug(f"Coloring interference graph with maxRegs={maxRegs}, " \
+        f"{sum(g.degree(v) for v in g.vertices) // 2} edges")
     colors: dict[tac.ident, int] = {}
     forbidden: dict[tac.ident, set[int]] = {}
-    q = PrioQueue(secondaryOrder)
+    q = BucketPrioQueue(secondaryOrder) if queue == 'bucket' else PrioQueue(secondaryOrder)
 
     for v in g.vertices:
         # intialize the priority queue with each vertex having priority 0
@@ -1,3 +1,4 @@
+import heapq
 from assembly.common import *
 from assembly.graph import Graph
 import assembly.tac_ast as tac
@@ -73,6 +74,30 @@ def getPrimIdent(p: tac.prim) -> tac.ident:
 # (index of basic block, index of instruction inside the basic block)
 type InstrId = tuple[int, int]
 
+def _postorder(g: ControlFlowGraph) -> list[int]:
+    """
+    Returns the vertices of g in postorder of a depth-first search starting at block 0.
+    Unreachable blocks come last.
+    """
+    res: list[int] = []
+    visited: set[int] = set()
+    for root in sorted(g.vertices):
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(sorted(g.succs(root))))]
+        while stack:
+            (v, succs) = stack[-1]
+            for w in succs:
+                if w not in visited:
+                    visited.add(w)
+                    stack.append((w, iter(sorted(g.succs(w)))))
+                    break
+            else:
+                stack.pop()
+                res.append(v)
+    return res
+
 class InterfGraphBuilder:
     def __init__(self):
         # self.before holds, for each instruction I, to set of variables live before I.
@@ -113,24 +138,81 @@ class InterfGraphBuilder:
         This method computes liveness information and fills the sets self.before and
         self.after.
 
-        You have to implement the algorithm for computing liveness in a CFG from
-        slide 46 here.
+        The variables are numbered densely, so that live sets are ints used as bitsets.
+        Each block is summarized by the variables it uses before defining them (gen)
+        and the variables it defines (kill), so that live_start = gen | (live_end & ~kill).
+        Blocks are processed from a worklist in reverse postorder of the reversed CFG
+        (successors before predecessors, as liveness is a backward analysis); a block
+        is only revisited if the live set at the start of one of its successors changed.
+        The sets for the individual instructions are computed once at the end.
         """
-        # Initialize IN[B] = ∅ for all vertices B of the CFG
-        insets: dict[int, set[tac.ident]] = {v: set() for v in g.vertices}
-
-        changes: bool = True
-        while changes == True:
-            changes = False
-            for v in g.vertices:
-                out: set[tac.ident] = set()
-                for w in g.succs(v):
-                    out = out.union(insets[w])
-                x = self.liveStart(g.getData(v), out)
-                if x != insets[v]:
-                    changes = True
-                insets[v] = x
+        varIdx: dict[tac.ident, int] = {}
+        allVars: list[tac.ident] = []
+        def toBits(s: set[tac.ident]) -> int:
+            bits = 0
+            for x in s:
+                i = varIdx.get(x)
+                if i is None:
+                    i = len(allVars)
+                    varIdx[x] = i
+                    allVars.append(x)
+                bits |= 1 << i
+            return bits
+        def fromBits(bits: int) -> set[tac.ident]:
+            s: set[tac.ident] = set()
+            while bits:
+                low = bits & -bits
+                s.add(allVars[low.bit_length() - 1])
+                bits ^= low
+            return s
+
+        # use and def bitsets of every instruction, gen and kill bitsets of every block
+        useDef: dict[int, list[tuple[int, int]]] = {}
+        gen: dict[int, int] = {}
+        kill: dict[int, int] = {}
+        preds: dict[int, list[int]] = {v: [] for v in g.vertices}
+        for v in g.vertices:
+            l = [(toBits(instrUse(instr)), toBits(instrDef(instr))) for instr in g.getData(v).instrs]
+            useDef[v] = l
+            genV = 0
+            killV = 0
+            for (u, d) in reversed(l):
+                genV = u | (genV & ~d)
+                killV |= d
+            gen[v] = genV
+            kill[v] = killV
+            for w in g.succs(v):
+                preds[w].append(v)
+
+        order = _postorder(g)
+        position = {v: i for (i, v) in enumerate(order)}
+        insets: dict[int, int] = {v: 0 for v in g.vertices}
+        worklist = list(range(len(order)))
+        queued = set(order)
+        while worklist:
+            v = order[heapq.heappop(worklist)]
+            queued.remove(v)
+            out = 0
+            for w in g.succs(v):
+                out |= insets[w]
+            new = gen[v] | (out & ~kill[v])
+            if new != insets[v]:
+                insets[v] = new
+                for p in preds[v]:
+                    if p not in queued:
+                        queued.add(p)
+                        heapq.heappush(worklist, position[p])
 
+        for v in g.vertices:
+            live = 0
+            for w in g.succs(v):
+                live |= insets[w]
+            l = useDef[v]
+            for i in range(len(l) - 1, -1, -1):
+                (u, d) = l[i]
+                self.after[(v, i)] = fromBits(live)
+                live = u | (live & ~d)
+                self.before[(v, i)] = fromBits(live)
 
     def __addEdgesForInstr(self, instrId: InstrId, instr: tac.instr, interfG: InterfGraph):
         """
@@ -3,36 +3,65 @@ from lang_array.array_astAtom import *
 import lang_array.array_ast as plainAst
 import lang_array.array_tychecker as array_tychecker
 import lang_array.array_transform as array_transform
+import lang_array.array_optimize as array_optimize
+import lang_array.array_boundsCheck as array_boundsCheck
+import lang_array.array_licm as array_licm
 from lang_array.array_compilerSupport import *
 from common.compilerSupport import *
+import common.timings as timings
 
 
 cfg_global: CompilerConfig;
 loop_counter_global: dict[str, int];
+safe_subscripts_global: set[int]; # ids of Subscript and SubscriptAssign nodes without bounds check
+gc_roots_global: list[WasmId]; # array-typed locals, copied to the root globals before each allocation (with --gc)
+data_segments_global: dict[bytes, WasmId]; # passive data segments holding the elements of constant arrays
 
 def compileModule(m: plainAst.mod, cfg: CompilerConfig) -> WasmModule:
     """
     Compiles the given module.
     """
-    vars = array_tychecker.tycheckModule(m)
+    with timings.phase('type check'):
+        vars = array_tychecker.tycheckModule(m)
+    if cfg.optLevel >= 1:
+        with timings.phase('optimize AST'):
+            m = array_optimize.optimizeModule(m)
     ctx = array_transform.Ctx()
     global cfg_global
     cfg_global = cfg
     global loop_counter_global 
     loop_counter_global = {} # initialize storage variable for loop counter
-    stmtsAtom = array_transform.transStmts(m.stmts, ctx)
-    instrs = compileStmts(stmtsAtom)
+    with timings.phase('ANF transform'):
+        stmtsAtom = array_transform.transStmts(m.stmts, ctx)
+    if cfg.optLevel >= 1:
+        with timings.phase('loop-invariant code motion'):
+            stmtsAtom = array_licm.hoistStmts(stmtsAtom, ctx)
+    global safe_subscripts_global
+    safe_subscripts_global = set()
+    if cfg.optLevel >= 1:
+        with timings.phase('bounds check elimination'):
+            safe_subscripts_global = array_boundsCheck.safeSubscripts(stmtsAtom)
+    global data_segments_global
+    data_segments_global = {}
+    global gc_roots_global
+    gc_roots_global = [identToWasmId(id) for id,ty in list(vars.types()) + list(ctx.freshVars.items()) if type(ty) == Array]
+    with timings.phase('codegen'):
+        instrs = compileStmts(stmtsAtom)
     idMain = WasmId('$main')
     locals: list[tuple[WasmId, WasmValtype]] = [(identToWasmId(id), "i64" if type(ty) == Int else "i32") for id,ty in vars.types()]
     freshLocals: list[tuple[WasmId, WasmValtype]] = [(identToWasmId(id), "i64" if type(ty) == Int else "i32") for id,ty in ctx.freshVars.items()]
     locals.extend(freshLocals)
     locals.extend(Locals.decls())
+    funcs: list[WasmFunc] = [Memory.ensureFunc(cfg.gc)]
+    if cfg.gc:
+        instrs = Gc.prologue(cfg.maxMemSize) + instrs
+        funcs.extend(Gc.funcs(len(gc_roots_global), cfg.maxMemSize))
     return WasmModule(imports=wasmImports(cfg.maxMemSize),
         exports=[WasmExport("main", WasmExportFunc(idMain))],
-        globals=Globals.decls(),
-        data=Errors.data(),
+        globals=Globals.decls(cfg.gc, len(gc_roots_global), cfg.maxMemSize),
+        data=Errors.data() + [WasmDataPassive(id, content) for content,id in data_segments_global.items()],
         funcTable=WasmFuncTable([]),
-        funcs=[WasmFunc(idMain, [], None, locals, instrs)])
+        funcs=funcs + [WasmFunc(idMain, [], None, locals, instrs)])
 
 
 
@@ -58,7 +87,7 @@ def matchType(s: stmt) -> list[WasmInstr]:
         case SubscriptAssign(left, index, right):
             # check if index in bounds using arrayLenInstrs()
             # recieve address of element at index i on top of stack:
-            wasmInstructs.extend(arrayOffsetInstrs(left, index))
+            wasmInstructs.extend(arrayOffsetInstrs(left, index, id(s) not in safe_subscripts_global))
             wasmInstructs.extend(compileExp(right)) # compile expression that will be assigned at given index
             # store result at index:
             match right.ty:
@@ -93,15 +122,26 @@ def compileExp(exp: exp) -> list[WasmInstr]:
             wasmInstructs.extend(compileInitArray(IntConst(len(elemInit)), asTy(elemInit[0].ty), cfg_global)) # Initialize the array -> address of the array is on top of stack
             elemsize: int = 8 if asTy(elemInit[0].ty) == Int() else 4
             dType: WasmValtype = "i64" if asTy(elemInit[0].ty) == Int() else "i32"
-            # set each element individually:
-            for index, elem in enumerate(elemInit): # loop over values that should be used for assignement
-                wasmInstructs.append(WasmInstrVarLocal('tee', Locals.tmp_i32)) # set $@tmp_i32 to array address, leave it on top of stack
+            content = constArrayContent(elemInit, elemsize)
+            if cfg_global.optLevel >= 1 and content is not None:
+                # copy all elements at once from a data segment
+                wasmInstructs.append(WasmInstrVarLocal('tee', Locals.tmp_i32))
+                wasmInstructs.append(WasmInstrConst('i32', 4))
+                wasmInstructs.append(WasmInstrNumBinOp('i32', 'add')) # destination: first element
+                wasmInstructs.append(WasmInstrConst('i32', 0)) # offset in the segment
+                wasmInstructs.append(WasmInstrConst('i32', len(content)))
+                wasmInstructs.append(WasmInstrMemInit(dataSegment(content)))
                 wasmInstructs.append(WasmInstrVarLocal('get', Locals.tmp_i32))
-                offset: int = 4 + elemsize * index
-                wasmInstructs.append(WasmInstrConst('i32', offset)) 
-                wasmInstructs.append(WasmInstrNumBinOp('i32', 'add')) # move by offset at given index
-                wasmInstructs.extend(compileAtomExp(elem)) # compile value of elem
-                wasmInstructs.append(WasmInstrMem(dType, 'store')) # initialize element at given index with value of elem -> address of current index on top of stack
+            else:
+                # set each element individually:
+                for index, elem in enumerate(elemInit): # loop over values that should be used for assignement
+                    wasmInstructs.append(WasmInstrVarLocal('tee', Locals.tmp_i32)) # set $@tmp_i32 to array address, leave it on top of stack
+                    wasmInstructs.append(WasmInstrVarLocal('get', Locals.tmp_i32))
+                    offset: int = 4 + elemsize * index
+                    wasmInstructs.append(WasmInstrConst('i32', offset)) 
+                    wasmInstructs.append(WasmInstrNumBinOp('i32', 'add')) # move by offset at given index
+                    wasmInstructs.extend(compileAtomExp(elem)) # compile value of elem
+                    wasmInstructs.append(WasmInstrMem(dType, 'store')) # initialize element at given index with value of elem -> address of current index on top of stack
 
         case ArrayInitDyn(length, elemInit):
             wasmInstructs.extend(compileInitArray(length, asTy(elemInit.ty), cfg_global)) # Initialize the array -> address of the array is on top of stack
@@ -113,26 +153,39 @@ def compileExp(exp: exp) -> list[WasmInstr]:
             wasmInstructs.append(WasmInstrConst('i32', 4))
             wasmInstructs.append(WasmInstrNumBinOp('i32', 'add')) 
             wasmInstructs.append(WasmInstrVarLocal('set', Locals.tmp_i32)) # set $@tmp_i32 to the first array element
-            # set up while loop for initialization:
-            loopCond: list[WasmInstr] = []
-            loopCond.append(WasmInstrVarLocal('get', Locals.tmp_i32))
-            loopCond.append(WasmInstrVarGlobal('get', Globals.freePtr))
-            loopCond.append(WasmInstrIntRelOp('i32', 'lt_u')) # compare against end of array
-            bodyInstr: list[WasmInstr] = []
-            bodyInstr.append(WasmInstrVarLocal('get', Locals.tmp_i32))
-            bodyInstr.extend(compileAtomExp(elemInit)) # compile expression for the initial value
-            bodyInstr.append(WasmInstrMem(dType, 'store')) # initialize array element
-            bodyInstr.append(WasmInstrVarLocal('get', Locals.tmp_i32))
-            bodyInstr.append(WasmInstrConst('i32', elementSize)) # 4 bytes for Bools or Arrays
-            bodyInstr.append(WasmInstrNumBinOp('i32', 'add')) # add size of array element
-            bodyInstr.append(WasmInstrVarLocal('set', Locals.tmp_i32)) # set $@tmp_i32 to next array element
-            # wrap in while loop:
-            wasmInstructs.extend(compileWhileStmt(loopCond, bodyInstr)) 
+            end: WasmInstr = WasmInstrVarGlobal('get', Globals.freePtr) # end of the array
+            if cfg_global.gc:
+                # the array is not necessarily at the end of the heap
+                wasmInstructs.append(WasmInstrVarLocal('get', Locals.tmp_i32))
+                wasmInstructs.extend(compileLenOfArray(length))
+                wasmInstructs.append(WasmInstrConst('i32', elementSize))
+                wasmInstructs.append(WasmInstrNumBinOp('i32', 'mul'))
+                wasmInstructs.append(WasmInstrNumBinOp('i32', 'add'))
+                wasmInstructs.append(WasmInstrVarLocal('set', Locals.tmp3_i32))
+                end = WasmInstrVarLocal('get', Locals.tmp3_i32)
+            if cfg_global.optLevel >= 1:
+                wasmInstructs.extend(compileFillArray(elemInit, elementSize, dType, end))
+            else:
+                # set up while loop for initialization:
+                loopCond: list[WasmInstr] = []
+                loopCond.append(WasmInstrVarLocal('get', Locals.tmp_i32))
+                loopCond.append(end)
+                loopCond.append(WasmInstrIntRelOp('i32', 'lt_u')) # compare against end of array
+                bodyInstr: list[WasmInstr] = []
+                bodyInstr.append(WasmInstrVarLocal('get', Locals.tmp_i32))
+                bodyInstr.extend(compileAtomExp(elemInit)) # compile expression for the initial value
+                bodyInstr.append(WasmInstrMem(dType, 'store')) # initialize array element
+                bodyInstr.append(WasmInstrVarLocal('get', Locals.tmp_i32))
+                bodyInstr.append(WasmInstrConst('i32', elementSize)) # 4 bytes for Bools or Arrays
+                bodyInstr.append(WasmInstrNumBinOp('i32', 'add')) # add size of array element
+                bodyInstr.append(WasmInstrVarLocal('set', Locals.tmp_i32)) # set $@tmp_i32 to next array element
+                # wrap in while loop:
+                wasmInstructs.extend(compileWhileStmt(loopCond, bodyInstr)) 
 
         case Subscript(array, index):
             # check if index in bounds using arrayLenInstrs()
             # recieve address of element at index i on top of stack:
-            wasmInstructs.extend(arrayOffsetInstrs(array, index))
+            wasmInstructs.extend(arrayOffsetInstrs(array, index, id(exp) not in safe_subscripts_global))
             # Read from memory:
             match array.ty:
                 case Array(elemTy): 
@@ -208,30 +261,119 @@ def compileInitArray(lenExp: atomExp, elemTy: ty, cfg: CompilerConfig) -> list[W
     wasmInstructs.append(WasmInstrIntRelOp('i32', 'gt_s'))
     wasmInstructs.append(WasmInstrIf(None, Errors.outputError(Errors.arraySize) + [WasmInstrTrap()], []))
     
-    # Compute header: 
-    wasmInstructs.append(WasmInstrVarGlobal("get", Globals.freePtr)) # save old value $@free_ptr (address of the array on top of stack)
-    wasmInstructs.extend(compileLenOfArray(lenExp))
     if elemTy == Int() or elemTy == Bool():
         m: Literal[3, 1] = 1
     else:
         m: Literal[3, 1] = 3
-    wasmInstructs.extend(computeHeader(m, False)) 
-    wasmInstructs.append(WasmInstrMem('i32', 'store')) # store header in memory
 
-    # Move free_ptr and return array address
-    wasmInstructs.append(WasmInstrVarGlobal("get", Globals.freePtr)) # move free_ptr
+    if cfg.gc:
+        # Allocate with the collector, the array locals are the roots
+        wasmInstructs.extend(Gc.spillRoots(gc_roots_global))
+        wasmInstructs.extend(compileLenOfArray(lenExp))
+        wasmInstructs.append(WasmInstrConst('i32', elementSize))
+        wasmInstructs.append(WasmInstrNumBinOp('i32', 'mul'))
+        wasmInstructs.append(WasmInstrConst('i32', 4)) # add 4 bytes for header
+        wasmInstructs.append(WasmInstrNumBinOp('i32', 'add'))
+        wasmInstructs.append(WasmInstrCall(Gc.alloc))
+        wasmInstructs.append(WasmInstrVarLocal('tee', Locals.tmp_i32)) # address of the array
+        wasmInstructs.extend(compileLenOfArray(lenExp))
+        wasmInstructs.extend(computeHeader(m, False))
+        wasmInstructs.append(WasmInstrMem('i32', 'store')) # store header in memory
+        wasmInstructs.append(WasmInstrVarLocal('get', Locals.tmp_i32))
+        return wasmInstructs
+
+    # Move free_ptr and grow the memory if necessary, before anything is stored
+    wasmInstructs.append(WasmInstrVarGlobal("get", Globals.freePtr)) # save old value $@free_ptr (address of the array)
+    wasmInstructs.append(WasmInstrVarLocal('tee', Locals.tmp_i32))
     wasmInstructs.extend(compileLenOfArray(lenExp))
     wasmInstructs.append(WasmInstrConst('i32', elementSize))
     wasmInstructs.append(WasmInstrNumBinOp('i32', 'mul')) # multiply length by size of element type
     wasmInstructs.append(WasmInstrConst('i32', 4)) # add 4 bytes for header
-    wasmInstructs.append(WasmInstrNumBinOp('i32', 'add')) # add length to free_ptr
-    wasmInstructs.append(WasmInstrVarGlobal("get", Globals.freePtr)) # get address of the array
+    wasmInstructs.append(WasmInstrNumBinOp('i32', 'add'))
     wasmInstructs.append(WasmInstrNumBinOp('i32', 'add')) # add the space required by the array to $@free_ptr
-    wasmInstructs.append(WasmInstrVarGlobal("set", Globals.freePtr)) # save new $@free_pt
+    wasmInstructs.append(WasmInstrVarGlobal("set", Globals.freePtr)) # save new $@free_ptr
+    wasmInstructs.append(WasmInstrVarGlobal("get", Globals.freePtr))
+    wasmInstructs.append(WasmInstrCall(Memory.ensure)) # grow the memory if necessary
+
+    # Compute header:
+    wasmInstructs.append(WasmInstrVarLocal('get', Locals.tmp_i32))
+    wasmInstructs.extend(compileLenOfArray(lenExp))
+    wasmInstructs.extend(computeHeader(m, False))
+    wasmInstructs.append(WasmInstrMem('i32', 'store')) # store header in memory
+    wasmInstructs.append(WasmInstrVarLocal('get', Locals.tmp_i32))
     # -> now the old value of $@free_ptr (the array address) is on top of stack.
 
     return wasmInstructs
 
+def constArrayContent(elems: list[atomExp], elementSize: int) -> Optional[bytes]:
+    """
+    Returns the bytes of the elements of an array literal if all elements are constants,
+    None otherwise.
+    """
+    content = bytearray()
+    for e in elems:
+        match e:
+            case IntConst(val) | BoolConst(val):
+                content += (int(val) & ((1 << 8 * elementSize) - 1)).to_bytes(elementSize, 'little')
+            case _:
+                return None
+    return bytes(content)
+
+def dataSegment(content: bytes) -> WasmId:
+    """
+    Returns the passive data segment with the given content, array literals with the same
+    elements share a segment.
+    """
+    if content not in data_segments_global:
+        data_segments_global[content] = WasmId(f'$@array_data_{len(data_segments_global)}')
+    return data_segments_global[content]
+
+def fillByte(elemInit: atomExp, elementSize: int) -> Optional[int]:
+    """
+    Returns the byte b if all bytes of the value of elemInit are b, so that the array can be
+    initialized with memory.fill. Returns None otherwise.
+    """
+    match elemInit:
+        case IntConst(val) | BoolConst(val):
+            b = (int(val) & ((1 << 8 * elementSize) - 1)).to_bytes(elementSize, 'little')
+            return b[0] if len(set(b)) == 1 else None
+        case _:
+            return None
+
+def compileFillArray(elemInit: atomExp, elementSize: int, dType: WasmValtype, end: WasmInstr) -> list[WasmInstr]:
+    """
+    Generates code that sets all elements from $@tmp_i32 up to the address pushed by end to
+    elemInit, using bulk memory instructions.
+
+    If the value is not a repeated byte, the first element is stored and then the initialized
+    part is copied to the uninitialized part, doubling the initialized part in each step.
+    """
+    wasmInstructs: list[WasmInstr] = []
+    start = WasmInstrVarLocal('get', Locals.tmp_i32)
+    filledEnd = WasmInstrVarLocal('get', Locals.tmp2_i32)
+    sub = WasmInstrNumBinOp('i32', 'sub')
+    b = fillByte(elemInit, elementSize)
+    if b is not None:
+        wasmInstructs.extend([start, WasmInstrConst('i32', b), end, start, sub, WasmInstrMemBulk('fill')])
+        return wasmInstructs
+    initInstrs: list[WasmInstr] = [start]
+    initInstrs.extend(compileAtomExp(elemInit))
+    initInstrs.append(WasmInstrMem(dType, 'store')) # initialize first element
+    initInstrs.extend([start, WasmInstrConst('i32', elementSize), WasmInstrNumBinOp('i32', 'add'),
+                       WasmInstrVarLocal('set', Locals.tmp2_i32)]) # $@tmp2_i32: end of the initialized part
+    # double the initialized part as long as it fits into the array
+    loopCond: list[WasmInstr] = [filledEnd, start, sub, end, filledEnd, sub, WasmInstrIntRelOp('i32', 'le_u')]
+    bodyInstr: list[WasmInstr] = [filledEnd, start, filledEnd, start, sub, WasmInstrMemBulk('copy'),
+                                  filledEnd, filledEnd, start, sub, WasmInstrNumBinOp('i32', 'add'),
+                                  WasmInstrVarLocal('set', Locals.tmp2_i32)]
+    initInstrs.extend(compileWhileStmt(loopCond, bodyInstr))
+    # copy the rest
+    initInstrs.extend([filledEnd, start, end, filledEnd, sub, WasmInstrMemBulk('copy')])
+    # arrays of length 0 have no elements to initialize
+    wasmInstructs.extend([start, end, WasmInstrIntRelOp('i32', 'lt_u')])
+    wasmInstructs.append(WasmInstrIf(None, initInstrs, []))
+    return wasmInstructs
+
 def arrayLenInstrs() -> list[WasmInstr]:
     """
     Generates code that expects the array address on top of stack and puts the length as an i64 value on top of stack
@@ -243,8 +385,9 @@ def arrayLenInstrs() -> list[WasmInstr]:
     wasmInstructs.append(WasmInstrConvOp('i64.extend_i32_u')) # convert to i64
     return wasmInstructs
 
-def arrayOffsetInstrs(arrayExp: atomExp, indexExp: atomExp) -> list[WasmInstr]:
+def arrayOffsetInstrs(arrayExp: atomExp, indexExp: atomExp, checked: bool = True) -> list[WasmInstr]:
     #Returns instructions that places the memory offset for a certain array element on top of stack.
+    #The bounds check is omitted if checked is False (index is known to be in bounds).
     wasmInstructs: list[WasmInstr] = []
 
     elementSize = 8
@@ -254,18 +397,19 @@ def arrayOffsetInstrs(arrayExp: atomExp, indexExp: atomExp) -> list[WasmInstr]:
         case _:
             raise ValueError
         
-    # check index > 0
-    wasmInstructs.extend(compileAtomExp(indexExp))
-    wasmInstructs.append(WasmInstrConst('i64', 0))
-    wasmInstructs.append(WasmInstrIntRelOp('i64', 'lt_s'))
-    wasmInstructs.append(WasmInstrIf(None, Errors.outputError(Errors.arrayIndexOutOfBounds) + [WasmInstrTrap()], []))
-
-    # check index <= arrayLength
-    wasmInstructs.extend(compileAtomExp(arrayExp)) # put array addr on to of stack
-    wasmInstructs.extend(arrayLenInstrs())
-    wasmInstructs.extend(compileAtomExp(indexExp))
-    wasmInstructs.append(WasmInstrIntRelOp('i64', 'le_s'))
-    wasmInstructs.append(WasmInstrIf(None, Errors.outputError(Errors.arrayIndexOutOfBounds) + [WasmInstrTrap()], []))
+    if checked:
+        # check index > 0
+        wasmInstructs.extend(compileAtomExp(indexExp))
+        wasmInstructs.append(WasmInstrConst('i64', 0))
+        wasmInstructs.append(WasmInstrIntRelOp('i64', 'lt_s'))
+        wasmInstructs.append(WasmInstrIf(None, Errors.outputError(Errors.arrayIndexOutOfBounds) + [WasmInstrTrap()], []))
+
+        # check index <= arrayLength
+        wasmInstructs.extend(compileAtomExp(arrayExp)) # put array addr on to of stack
+        wasmInstructs.extend(arrayLenInstrs())
+        wasmInstructs.extend(compileAtomExp(indexExp))
+        wasmInstructs.append(WasmInstrIntRelOp('i64', 'le_s'))
+        wasmInstructs.append(WasmInstrIf(None, Errors.outputError(Errors.arrayIndexOutOfBounds) + [WasmInstrTrap()], []))
 
     wasmInstructs.extend(compileAtomExp(arrayExp)) # get the array addr
     # compute offset-----
@@ -2,7 +2,10 @@ from lang_loop.loop_ast import *
 from lang_loop.loop_interp import *
 from common.wasm import *
 from lang_loop.loop_tychecker import *
+import lang_loop.loop_optimize as loop_optimize
+import lang_loop.loop_licm as loop_licm
 from common.compilerSupport import *
+import common.timings as timings
 #import common.utils as utils
 
 
@@ -10,10 +13,19 @@ def compileModule(m: mod, cfg: CompilerConfig) -> WasmModule:
     """
     Compiles the given module.
     """
-    vars: Symtab = tycheckModule(m)
-    instrs = compileStmts(m.stmts)
+    with timings.phase('type check'):
+        vars: Symtab = tycheckModule(m)
+    licmCtx = loop_licm.Ctx()
+    if cfg.optLevel >= 1:
+        with timings.phase('optimize AST'):
+            m = loop_optimize.optimizeModule(m)
+        with timings.phase('loop-invariant code motion'):
+            m = loop_licm.hoistModule(m, licmCtx)
+    with timings.phase('codegen'):
+        instrs = compileStmts(m.stmts)
     idMain = WasmId('$main')
     locals: list[tuple[WasmId, WasmValtype]] = [(identToWasmId(x), mapVarType(i.ty)) for x,i in vars.items()]
+    locals.extend((identToWasmId(x), mapVarType(t)) for x,t in licmCtx.freshVars.items())
     return WasmModule(imports=wasmImports(cfg.maxMemSize),
         exports=[WasmExport("main", WasmExportFunc(idMain))],
         globals=[],
@@ -23,9 +35,10 @@ def compileModule(m: mod, cfg: CompilerConfig) -> WasmModule:
 
 
 
-def compileStmts(stmts: list[stmt]) -> list[WasmInstr]:
+def compileStmts(stmts: list[stmt], loop_counter: Optional[dict[str, int]] = None) -> list[WasmInstr]:
     wasmInstructs: list[WasmInstr] = []
-    loop_counter: dict[str, int] = {}
+    if loop_counter is None:
+        loop_counter = {} # shared with nested statements, so that all labels are unique
     for s in stmts:
          a = matchType(s, loop_counter)
          wasmInstructs.extend(a)
@@ -39,8 +52,8 @@ def matchType(s: stmt, loop_counter: dict[str, int]) -> list[WasmInstr]:
             wasmInstructs.extend(compileExp(e))
         case IfStmt(cond, thenBody, elseBody):
             wasmInstructs.extend(compileExp(cond))
-            thenBodyInstr: list[WasmInstr] = compileStmts(thenBody)
-            elseBodyInstr: list[WasmInstr] = compileStmts(elseBody)
+            thenBodyInstr: list[WasmInstr] = compileStmts(thenBody, loop_counter)
+            elseBodyInstr: list[WasmInstr] = compileStmts(elseBody, loop_counter)
             wasmInstructs.append(WasmInstrIf(None, thenBodyInstr, elseBodyInstr))
         case WhileStmt(cond, body):
             loop_start_label: str = generateUniqueLabel('$loop_start', loop_counter)
@@ -52,7 +65,7 @@ def matchType(s: stmt, loop_counter: dict[str, int]) -> list[WasmInstr]:
             loopBodyInstr.extend(compileExp(cond))
 
             # Compile the body of the loop
-            ifBodyInstr: list[WasmInstr] = compileStmts(body)
+            ifBodyInstr: list[WasmInstr] = compileStmts(body, loop_counter)
             ifBodyInstr.append(WasmInstrBranch(WasmId(loop_start_label), False))
 
             # Handle the else body (exit the loop)
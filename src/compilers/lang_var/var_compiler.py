@@ -1,15 +1,22 @@
 from lang_var.var_ast import *
 from common.wasm import *
 import lang_var.var_tychecker as var_tychecker
+import lang_var.var_optimize as var_optimize
 from common.compilerSupport import *
+import common.timings as timings
 #import common.utils as utils
 
 def compileModule(m: mod, cfg: CompilerConfig) -> WasmModule:
     """
     Compiles the given module.
     """
-    vars = var_tychecker.tycheckModule(m)
-    instrs = compileStmts(m.stmts)
+    with timings.phase('type check'):
+        vars = var_tychecker.tycheckModule(m)
+    if cfg.optLevel >= 1:
+        with timings.phase('optimize AST'):
+            m = var_optimize.optimizeModule(m)
+    with timings.phase('codegen'):
+        instrs = compileStmts(m.stmts)
     idMain = WasmId('$main')
     locals: list[tuple[WasmId, WasmValtype]] = [(identToWasmId(x), 'i64') for x in vars]
     return WasmModule(imports=wasmImports(cfg.maxMemSize),
@@ -0,0 +1,190 @@
+"""
+Range analysis on the atomized AST, finding array subscripts that are always in bounds.
+
+The analysis handles the common pattern of an induction variable i counting upwards while
+it is smaller than the length of some array a:
+
+    i = 0
+    while i < len(a):
+        ... a[i] ...
+        i = i + 1
+
+The bound might also be a variable holding the length of a (for example, after loop-invariant
+code motion hoisted len(a) out of the loop), if neither a nor the variable change in the loop.
+
+A subscript a[i] inside the loop body is safe if
+
+- i is known to be non-negative when the loop starts,
+- the loop body changes i only by adding small non-negative constants (outside of
+  nested statements),
+- the loop body never assigns to a, and
+- the subscript comes before the first statement of the loop body assigning to i.
+
+The compiler skips the bounds check for such subscripts. All other subscripts are still checked.
+"""
+from __future__ import annotations
+from typing import *
+from lang_array.array_astAtom import *
+
+_MAX_INCREMENT = 2**32
+
+def safeSubscripts(stmts: list[stmt]) -> set[int]:
+    """
+    Returns the ids (as given by the builtin function id) of all Subscript and SubscriptAssign
+    nodes in stmts whose index is always in bounds.
+    """
+    res: set[int] = set()
+    _analyzeStmts(stmts, set(), {}, res)
+    return res
+
+def _analyzeStmts(stmts: list[stmt], nonNeg: set[Ident], lengths: dict[Ident, Ident],
+                  res: set[int]):
+    """
+    nonNeg contains the variables known to be non-negative before stmts, lengths maps
+    variables to the array whose length they hold. Both are updated to reflect the state
+    after stmts.
+    """
+    for s in stmts:
+        match s:
+            case Assign(x, AtomExp(IntConst(c))) if c >= 0:
+                _forget(x, nonNeg, lengths)
+                nonNeg.add(x)
+            case Assign(x, Call(Ident('len'), [AtomExp(Name(a))])) if x != a:
+                _forget(x, nonNeg, lengths)
+                nonNeg.add(x)
+                lengths[x] = a
+            case Assign(x, _):
+                _forget(x, nonNeg, lengths)
+            case IfStmt(_, thenBody, elseBody):
+                for body in [thenBody, elseBody]:
+                    _analyzeStmts(body, set(nonNeg), dict(lengths), res)
+                for x in _assigned([s]):
+                    _forget(x, nonNeg, lengths)
+            case WhileStmt(cond, body):
+                i = _analyzeLoop(cond, body, nonNeg, lengths, res)
+                for x in _assigned(body):
+                    _forget(x, nonNeg, lengths)
+                if i is not None:
+                    nonNeg.add(i)
+                _analyzeStmts(body, set(nonNeg), dict(lengths), res)
+            case StmtExp() | SubscriptAssign():
+                pass
+
+def _forget(x: Ident, nonNeg: set[Ident], lengths: dict[Ident, Ident]):
+    """
+    Removes all facts about x, as x is assigned.
+    """
+    nonNeg.discard(x)
+    lengths.pop(x, None)
+    for (n, a) in list(lengths.items()):
+        if a == x:
+            del lengths[n]
+
+def _loopBound(cond: exp, lengths: dict[Ident, Ident]) -> Optional[tuple[Ident, Ident, Optional[Ident]]]:
+    """
+    Matches the condition of a loop against i < len(a) or i < n, where n holds the length of
+    a. Returns (i, a, n) with n = None for the first form.
+    """
+    match cond:
+        case BinOp(AtomExp(Name(i)), Less(), Call(Ident('len'), [AtomExp(Name(a))])) | \
+             BinOp(Call(Ident('len'), [AtomExp(Name(a))]), Greater(), AtomExp(Name(i))):
+            return (i, a, None)
+        case BinOp(AtomExp(Name(i)), Less(), AtomExp(Name(n))) | \
+             BinOp(AtomExp(Name(n)), Greater(), AtomExp(Name(i))) if n in lengths:
+            return (i, lengths[n], n)
+        case _:
+            return None
+
+def _analyzeLoop(cond: exp, body: list[stmt], nonNeg: set[Ident], lengths: dict[Ident, Ident],
+                 res: set[int]) -> Optional[Ident]:
+    """
+    Marks the safe subscripts of the loop with the given condition and body. Returns the
+    induction variable of the loop if the loop matches the pattern described above. This
+    variable stays non-negative during and after the loop.
+    """
+    bound = _loopBound(cond, lengths)
+    if bound is None:
+        return None
+    (i, a, n) = bound
+    assigned = _assigned(body)
+    if i not in nonNeg or a in assigned or (n is not None and n in assigned):
+        return None
+    # i must only be incremented by small constants at the top level of the body. Thus, i
+    # increases by a bounded amount per iteration and cannot overflow.
+    for s in body:
+        match s:
+            case Assign(x, e) if x == i and not _isIncrement(i, e):
+                return None
+            case IfStmt() | WhileStmt() if i in _assigned([s]):
+                return None
+            case _:
+                pass
+    for s in body:
+        if i in _assigned([s]):
+            break
+        _markStmt(s, i, a, res)
+    return i
+
+def _isIncrement(x: Ident, e: exp) -> bool:
+    match e:
+        case BinOp(AtomExp(Name(y)), Add(), AtomExp(IntConst(c))) | \
+             BinOp(AtomExp(IntConst(c)), Add(), AtomExp(Name(y))):
+            return y == x and 0 <= c <= _MAX_INCREMENT
+        case _:
+            return False
+
+def _assignments(stmts: list[stmt]) -> Iterator[Assign]:
+    for s in stmts:
+        match s:
+            case Assign():
+                yield s
+            case IfStmt(_, thenBody, elseBody):
+                yield from _assignments(thenBody)
+                yield from _assignments(elseBody)
+            case WhileStmt(_, body):
+                yield from _assignments(body)
+            case StmtExp() | SubscriptAssign():
+                pass
+
+def _assigned(stmts: list[stmt]) -> set[Ident]:
+    return set(s.var for s in _assignments(stmts))
+
+def _isSafe(array: atomExp, index: atomExp, i: Ident, a: Ident) -> bool:
+    match (array, index):
+        case (Name(x), Name(y)):
+            return x == a and y == i
+        case _:
+            return False
+
+def _markStmt(s: stmt, i: Ident, a: Ident, res: set[int]):
+    match s:
+        case StmtExp(e) | Assign(_, e):
+            _markExp(e, i, a, res)
+        case IfStmt(cond, thenBody, elseBody):
+            _markExp(cond, i, a, res)
+            for t in thenBody + elseBody:
+                _markStmt(t, i, a, res)
+        case WhileStmt(cond, body):
+            _markExp(cond, i, a, res)
+            for t in body:
+                _markStmt(t, i, a, res)
+        case SubscriptAssign(array, index, right):
+            if _isSafe(array, index, i, a):
+                res.add(id(s))
+            _markExp(right, i, a, res)
+
+def _markExp(e: exp, i: Ident, a: Ident, res: set[int]):
+    match e:
+        case Subscript(array, index):
+            if _isSafe(array, index, i, a):
+                res.add(id(e))
+        case Call(_, args):
+            for x in args:
+                _markExp(x, i, a, res)
+        case UnOp(_, arg):
+            _markExp(arg, i, a, res)
+        case BinOp(left, _, right):
+            _markExp(left, i, a, res)
+            _markExp(right, i, a, res)
+        case AtomExp() | ArrayInitDyn() | ArrayInitStatic():
+            pass
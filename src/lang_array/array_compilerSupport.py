@@ -8,7 +8,14 @@ class Errors:
     """
     arraySize = 'ArraySizeError'
     arrayIndexOutOfBounds = 'IndexError'
-    allErrors = [arraySize, arrayIndexOutOfBounds]
+    outOfMemory = 'MemoryError'
+    allErrors = [arraySize, arrayIndexOutOfBounds, outOfMemory]
+    @staticmethod
+    def size() -> int:
+        """
+        Returns the number of bytes taken by the error messages.
+        """
+        return sum(len(e) for e in Errors.allErrors)
     @staticmethod
     def data() -> list[WasmData]:
         """
@@ -44,23 +51,28 @@ class Globals:
     """
     freePtr = WasmId('$@free_ptr')
     @staticmethod
-    def decls() -> list[WasmGlobal]:
+    def decls(gc: bool = False, numRoots: int = 0,
+              maxMemSize: int = CompilerConfig.defaultMaxMemSize) -> list[WasmGlobal]:
         """
-        Returns a list of Wasm global declarations.
+        Returns a list of Wasm global declarations. With gc, the heap starts after the
+        data of the collector (see Gc), and there are numRoots globals for the roots.
         """
-        errsLen = 0
-        for e in Errors.allErrors:
-            errsLen += len(e)
+        errsLen = Errors.size()
         offset = 100 # must be 4-byte aligned
         if errsLen > offset:
             utils.abort(f'Offset for free_ptr is {offset}, but error messages take {errsLen} bytes')
-        return [WasmGlobal(Globals.freePtr, 'i32', True, [WasmInstrConst('i32', 100)])]
+        if not gc:
+            return [WasmGlobal(Globals.freePtr, 'i32', True, [WasmInstrConst('i32', 100)])]
+        return [WasmGlobal(Globals.freePtr, 'i32', True, [WasmInstrConst('i32', Gc.heapStart(maxMemSize))])] + \
+            [WasmGlobal(Gc.root(k), 'i32', True, [WasmInstrConst('i32', 0)]) for k in range(numRoots)]
 
 class Locals:
     """
     Class giving access to the names of temporary local variables.
     """
     tmp_i32 = WasmId('$@tmp_i32')
+    tmp2_i32 = WasmId('$@tmp2_i32')
+    tmp3_i32 = WasmId('$@tmp3_i32')
     tmp_i64 = WasmId('$@tmp_i64')
     @staticmethod
     def decls() -> list[tuple[WasmId, WasmValtype]]:
@@ -68,4 +80,257 @@ class Locals:
         Returns a list of local variable declarations to be used in a function definition.
         """
         return [(Locals.tmp_i32, 'i32'),
+                (Locals.tmp2_i32, 'i32'),
+                (Locals.tmp3_i32, 'i32'),
                 (Locals.tmp_i64, 'i64')]
+
+class Memory:
+    """
+    Growing the memory on demand. The memory starts with one page and grows up to the
+    maximum size given by --max-mem-size (see common.compilerSupport.wasmImports).
+    """
+    ensure = WasmId('$@ensure_mem')
+    @staticmethod
+    def ensureFunc(double: bool) -> WasmFunc:
+        """
+        $@ensure_mem(end) grows the memory such that all addresses below end are valid, or
+        stops with a MemoryError if this exceeds the maximum size. With double, the memory
+        grows at least by its current size if possible.
+        """
+        end, need, cur = _ids('end', 'need', 'cur')
+        grow = WasmInstrMemSize('grow')
+        instrs: list[WasmInstr] = [
+            WasmInstrMemSize('size'), _set(cur),
+            _get(end), _i32(1), _sub, _i32(16), WasmInstrNumBinOp('i32', 'shr_u'), _i32(1), _add,
+            _set(need)] # number of pages needed
+        if double:
+            grown: list[WasmInstr] = [
+                _get(cur), _get(need), _get(cur), _sub, _rel('gt_u'),
+                WasmInstrIf('i32', [_get(cur), grow, _i32(-1), _rel('ne')], [_i32(0)])]
+        else:
+            grown = [_i32(0)]
+        growExact: list[WasmInstr] = [
+            _get(need), _get(cur), _sub, grow, _i32(-1), _rel('eq'),
+            WasmInstrIf(None, Errors.outputError(Errors.outOfMemory) + [WasmInstrTrap()], [])]
+        instrs.extend([_get(need), _get(cur), _rel('gt_u'), WasmInstrIf(None,
+            grown + [_i32(0), _rel('eq'), WasmInstrIf(None, growExact, [])], [])])
+        return WasmFunc(Memory.ensure, [(end, 'i32')], None, [(need, 'i32'), (cur, 'i32')], instrs)
+
+class Gc:
+    """
+    Runtime support for reclaiming arrays, enabled with --gc.
+
+    Memory layout: the error messages (see Errors) are followed by the heads of the free
+    lists, one for each size class, and the heap. The number of size classes depends on the
+    maximum memory size, so that for small memories the heads fit before address 100, where the
+    heap starts without --gc. Each block of the heap starts with a word, its lowest bit is set
+    for free blocks. For a block of size class c (the block has 16 << c bytes), the word is
+    c shifted left by two. A block of exact size has bit 1 set, the remaining bits hold its
+    size. The array follows, starting with its header. Free blocks store the next block of
+    their free list instead of the header.
+
+    Allocation takes a block from the free list of its size class, or from the end of the heap.
+    If the block does not fit into the current memory, the collector marks all arrays reachable
+    from the roots (bit 2 of the header) and adds all unmarked blocks to their free lists. If
+    this does not free a block of the right size class, the memory grows (by at least its
+    current size if possible). If the block of the size class would exceed the maximum memory
+    size, a block of exact size is taken from the end of the heap instead. Free blocks of exact
+    size go to the free list of the largest size class fitting into them.
+
+    The roots are the array-typed locals of main. The compiled code copies them to globals
+    before each allocation.
+    """
+    alloc = WasmId('$@gc_alloc')
+    collect = WasmId('$@gc_collect')
+    mark = WasmId('$@gc_mark')
+    @staticmethod
+    def root(k: int) -> WasmId:
+        return WasmId(f'$@gc_root_{k}')
+    @staticmethod
+    def numClasses(maxMemSize: int) -> int:
+        """
+        Returns the number of size classes, such that the largest class covers the whole
+        memory of maxMemSize pages.
+        """
+        n = 1
+        while 16 << (n - 1) < maxMemSize * 65536:
+            n += 1
+        return n
+    @staticmethod
+    def freeLists(maxMemSize: int) -> int:
+        start = (Errors.size() + 3) // 4 * 4
+        if start + 4 * Gc.numClasses(maxMemSize) <= 100:
+            return start
+        return 100
+    @staticmethod
+    def heapStart(maxMemSize: int) -> int:
+        return Gc.freeLists(maxMemSize) + 4 * Gc.numClasses(maxMemSize)
+    @staticmethod
+    def prologue(maxMemSize: int) -> list[WasmInstr]:
+        """
+        Returns instructions making room for the data of the collector.
+        """
+        return [_i32(Gc.heapStart(maxMemSize)), WasmInstrCall(Memory.ensure)]
+    @staticmethod
+    def spillRoots(roots: list[WasmId]) -> list[WasmInstr]:
+        """
+        Returns instructions writing the current values of roots to their globals.
+        """
+        res: list[WasmInstr] = []
+        for k, x in enumerate(roots):
+            res.extend([WasmInstrVarLocal('get', x), WasmInstrVarGlobal('set', Gc.root(k))])
+        return res
+    @staticmethod
+    def funcs(numRoots: int, maxMemSize: int) -> list[WasmFunc]:
+        """
+        Returns the functions of the allocator and the collector.
+        """
+        return [Gc._allocFunc(maxMemSize), Gc._collectFunc(numRoots, maxMemSize),
+                Gc._markFunc(Gc.heapStart(maxMemSize))]
+    @staticmethod
+    def _allocFunc(maxMemSize: int) -> WasmFunc:
+        """
+        $@gc_alloc(size) returns the address of a new array with size bytes (including the header).
+        """
+        size, cls, bsize, p, head, w, prev, q = _ids('size', 'cls', 'bsize', 'p', 'head', 'w', 'prev', 'q')
+        n = Gc.numClasses(maxMemSize)
+        lists = Gc.freeLists(maxMemSize)
+        freePtr = WasmInstrVarGlobal('get', Globals.freePtr)
+        instrs: list[WasmInstr] = [_i32(16), _set(bsize)]
+        instrs.append(_while('$@class', [_get(bsize), _get(size), _i32(4), _add, _rel('lt_u')],
+                             [_get(bsize), _i32(1), _shl, _set(bsize),
+                              _get(cls), _i32(1), _add, _set(cls)]))
+        # take the first block of the free list, collect if the free list is empty and the
+        # block does not fit into the current memory
+        fromList: list[WasmInstr] = [
+            _i32(lists), _get(cls), _i32(2), _shl, _add, _set(head),
+            _get(head), _load, _set(p),
+            _get(p), _i32(0), _rel('eq'), WasmInstrIf(None, [
+                freePtr, _get(bsize), _add, _i32(1), _sub, _i32(16), WasmInstrNumBinOp('i32', 'shr_u'),
+                WasmInstrMemSize('size'), _rel('ge_u'), WasmInstrIf(None, [
+                    WasmInstrCall(Gc.collect), _get(head), _load, _set(p)], [])], []),
+            _get(p), WasmInstrIf(None, [_get(head), _get(p), _i32(4), _add, _load, _store], [])]
+        instrs.extend([_get(cls), _i32(n), _rel('lt_u'), WasmInstrIf(None, fromList, [])])
+        # the block of the size class does not fit into the maximum memory: the block gets the
+        # exact size, take the first large enough block from the free list of the class below
+        firstFit: list[WasmInstr] = [
+            _i32(lists), _get(cls), _i32(1), _sub, _i32(2), _shl, _add, _set(prev),
+            _while('$@first_fit', [_get(p), _i32(0), _rel('eq'), _get(prev), _load, _i32(0), _rel('ne'), _and], [
+                _get(prev), _load, _set(q),
+                *_blockSize([_get(q), _load]), _get(bsize), _rel('ge_u'), WasmInstrIf(None, [
+                    _get(prev), _get(q), _i32(4), _add, _load, _store,
+                    _get(q), _set(p)
+                ], [
+                    _get(q), _i32(4), _add, _set(prev)
+                ])])]
+        exact: list[WasmInstr] = [
+            _get(size), _i32(7), _add, _i32(-4), _and, _set(bsize),
+            _get(bsize), _i32(2), WasmInstrNumBinOp('i32', 'or'), _set(w),
+            _get(cls), _i32(1), _sub, _i32(n), _rel('lt_u'), WasmInstrIf(None, firstFit, [])]
+        bump: list[WasmInstr] = [
+            freePtr, _set(p),
+            freePtr, _get(bsize), _add, WasmInstrVarGlobal('set', Globals.freePtr),
+            freePtr, WasmInstrCall(Memory.ensure),
+            _get(p), _get(w), _store]
+        # a block from a free list keeps its size, only the free bit is cleared
+        reuse: list[WasmInstr] = [_get(p), _get(p), _load, _i32(1), WasmInstrNumBinOp('i32', 'xor'), _store]
+        instrs.extend([_get(p), _i32(0), _rel('eq'), WasmInstrIf(None, [
+            freePtr, _get(bsize), _add, _u32(maxMemSize * 65536), _rel('gt_u'),
+            WasmInstrIf(None, exact, [_get(cls), _i32(2), _shl, _set(w)]),
+            _get(p), _i32(0), _rel('eq'), WasmInstrIf(None, bump, reuse)
+        ], reuse)])
+        instrs.extend([_get(p), _i32(4), _add])
+        return WasmFunc(Gc.alloc, [(size, 'i32')], 'i32',
+                        [(cls, 'i32'), (bsize, 'i32'), (p, 'i32'), (head, 'i32'), (w, 'i32'),
+                         (prev, 'i32'), (q, 'i32')], instrs)
+    @staticmethod
+    def _collectFunc(numRoots: int, maxMemSize: int) -> WasmFunc:
+        p, w, s, h, c, head = _ids('p', 'w', 's', 'h', 'c', 'head')
+        instrs: list[WasmInstr] = []
+        for k in range(numRoots):
+            instrs.extend([WasmInstrVarGlobal('get', Gc.root(k)), WasmInstrCall(Gc.mark)])
+        instrs.extend([_i32(Gc.heapStart(maxMemSize)), _set(p)])
+        free: list[WasmInstr] = [
+            _get(p), _get(w), _i32(1), WasmInstrNumBinOp('i32', 'or'), _store,
+            _get(w), _i32(2), _and, WasmInstrIf(None, [
+                _i32(0), _set(c),
+                _while('$@exact_class', [_i32(32), _get(c), _shl, _get(s), _rel('le_u')],
+                       [_get(c), _i32(1), _add, _set(c)])
+            ], [
+                _get(w), _i32(2), WasmInstrNumBinOp('i32', 'shr_u'), _set(c)
+            ]),
+            _i32(Gc.freeLists(maxMemSize)), _get(c), _i32(2), _shl, _add, _set(head),
+            _get(p), _i32(4), _add, _get(head), _load, _store,
+            _get(head), _get(p), _store]
+        sweep: list[WasmInstr] = [
+            _get(p), _i32(4), _add, _load, _set(h),
+            _get(h), _i32(4), _and, WasmInstrIf(None, [
+                _get(p), _i32(4), _add, _get(h), _i32(4), WasmInstrNumBinOp('i32', 'xor'), _store
+            ], free)]
+        instrs.append(_while('$@sweep', [_get(p), WasmInstrVarGlobal('get', Globals.freePtr), _rel('lt_u')], [
+            _get(p), _load, _set(w),
+            *_blockSize([_get(w)]), _set(s),
+            _get(w), _i32(1), _and, _i32(0), _rel('eq'), WasmInstrIf(None, sweep, []),
+            _get(p), _get(s), _add, _set(p)]))
+        return WasmFunc(Gc.collect, [], None,
+                        [(p, 'i32'), (w, 'i32'), (s, 'i32'), (h, 'i32'), (c, 'i32'), (head, 'i32')], instrs)
+    @staticmethod
+    def _markFunc(heapStart: int) -> WasmFunc:
+        a, h, i, end = _ids('a', 'h', 'i', 'end')
+        markElems: list[WasmInstr] = [
+            _get(a), _i32(4), _add, _set(i),
+            _get(i), _get(h), _i32(4), WasmInstrNumBinOp('i32', 'shr_u'), _i32(2), _shl, _add, _set(end),
+            _while('$@elems', [_get(i), _get(end), _rel('lt_u')],
+                   [_get(i), _load, WasmInstrCall(Gc.mark), _get(i), _i32(4), _add, _set(i)])]
+        mark: list[WasmInstr] = [
+            _get(a), _get(h), _i32(4), WasmInstrNumBinOp('i32', 'or'), _store,
+            _get(h), _i32(2), _and, WasmInstrIf(None, markElems, [])]
+        instrs: list[WasmInstr] = [
+            _get(a), _i32(heapStart), _rel('ge_u'), WasmInstrIf(None, [
+                _get(a), _load, _set(h),
+                _get(h), _i32(4), _and, _i32(0), _rel('eq'), WasmInstrIf(None, mark, [])], [])]
+        return WasmFunc(Gc.mark, [(a, 'i32')], None, [(h, 'i32'), (i, 'i32'), (end, 'i32')], instrs)
+
+_add = WasmInstrNumBinOp('i32', 'add')
+_sub = WasmInstrNumBinOp('i32', 'sub')
+_shl = WasmInstrNumBinOp('i32', 'shl')
+_and = WasmInstrNumBinOp('i32', 'and')
+_load = WasmInstrMem('i32', 'load')
+_store = WasmInstrMem('i32', 'store')
+
+def _i32(n: int) -> WasmInstr:
+    return WasmInstrConst('i32', n)
+
+def _blockSize(word: list[WasmInstr]) -> list[WasmInstr]:
+    """
+    Returns instructions computing the size of a block from its first word (see Gc).
+    The instructions in word are evaluated several times.
+    """
+    return word + [_i32(2), _and, WasmInstrIf('i32', word + [_i32(-4), _and],
+                                            [_i32(16)] + word + [_i32(2), WasmInstrNumBinOp('i32', 'shr_u'), _shl])]
+
+def _u32(n: int) -> WasmInstr:
+    """
+    Constant for an unsigned comparison, values not fitting into 32 bits are clamped.
+    """
+    n = min(n, 0xFFFFFFFF)
+    return WasmInstrConst('i32', n - (1 << 32) if n >= 1 << 31 else n)
+
+def _ids(*names: str) -> list[WasmId]:
+    return [WasmId('$' + n) for n in names]
+
+def _get(x: WasmId) -> WasmInstr:
+    return WasmInstrVarLocal('get', x)
+
+def _set(x: WasmId) -> WasmInstr:
+    return WasmInstrVarLocal('set', x)
+
+def _rel(op: Literal['eq', 'ne', 'lt_u', 'le_u', 'gt_u', 'ge_u']) -> WasmInstr:
+    return WasmInstrIntRelOp('i32', op)
+
+def _while(label: str, cond: list[WasmInstr], body: list[WasmInstr]) -> WasmInstr:
+    start = WasmId(label)
+    exit = WasmId(label + '_exit')
+    loop = WasmInstrLoop(start, cond + [WasmInstrIf(None, body + [WasmInstrBranch(start, False)],
+                                                    [WasmInstrBranch(exit, False)])])
+    return WasmInstrBlock(exit, None, [loop])
@@ -0,0 +1,114 @@
+"""
+Loop-invariant code motion on the atomized AST.
+
+An expression inside a while loop is invariant if all variables it reads are never assigned
+in the loop (including nested statements) and it neither traps nor has side effects nor
+reads array elements. These are arithmetic and boolean operations and len(a): the length
+of an array never changes. The maximal invariant subexpressions of the loop condition and
+body are computed once in fresh variables before the loop:
+
+    while i < len(a):               tmp_7 = len(a)
+        tmp_3 = i * (n + 1)   =>    tmp_8 = n + 1
+        ...                         while i < tmp_7:
+                                        tmp_3 = i * tmp_8
+                                        ...
+
+Subscripts are never hoisted, they might trap with an IndexError, and allocations of
+arrays must happen in every iteration.
+"""
+from __future__ import annotations
+from typing import *
+from lang_array.array_astAtom import *
+from lang_array.array_transform import Ctx, assertExpNotVoid
+
+type Hoisted = list[tuple[Ident, exp]]
+
+def hoistStmts(stmts: list[stmt], ctx: Ctx) -> list[stmt]:
+    """
+    Hoists the invariant expressions out of all loops in stmts. The fresh variables
+    are registered in ctx.
+    """
+    res: list[stmt] = []
+    for s in stmts:
+        match s:
+            case WhileStmt(cond, body):
+                assigned = _assigned(body)
+                hoisted: Hoisted = []
+                cond = _hoistExp(cond, assigned, hoisted, ctx)
+                body = [_hoistStmt(t, assigned, hoisted, ctx) for t in body]
+                res.extend(Assign(x, e) for (x, e) in hoisted)
+                # Expressions invariant only in nested loops go before these loops
+                res.append(WhileStmt(cond, hoistStmts(body, ctx)))
+            case IfStmt(cond, thenBody, elseBody):
+                res.append(IfStmt(cond, hoistStmts(thenBody, ctx), hoistStmts(elseBody, ctx)))
+            case StmtExp() | Assign() | SubscriptAssign():
+                res.append(s)
+    return res
+
+def _hoistStmt(s: stmt, assigned: set[Ident], hoisted: Hoisted, ctx: Ctx) -> stmt:
+    """
+    Replaces the invariant expressions in s (and in the statements nested in s).
+    """
+    def stmts(ss: list[stmt]) -> list[stmt]:
+        return [_hoistStmt(t, assigned, hoisted, ctx) for t in ss]
+    match s:
+        case StmtExp(e):
+            return StmtExp(_hoistExp(e, assigned, hoisted, ctx))
+        case Assign(x, e):
+            return Assign(x, _hoistExp(e, assigned, hoisted, ctx))
+        case IfStmt(cond, thenBody, elseBody):
+            return IfStmt(_hoistExp(cond, assigned, hoisted, ctx), stmts(thenBody), stmts(elseBody))
+        case WhileStmt(cond, body):
+            return WhileStmt(_hoistExp(cond, assigned, hoisted, ctx), stmts(body))
+        case SubscriptAssign(array, index, right):
+            return SubscriptAssign(array, index, _hoistExp(right, assigned, hoisted, ctx))
+
+def _hoistExp(e: exp, assigned: set[Ident], hoisted: Hoisted, ctx: Ctx) -> exp:
+    match e:
+        case UnOp() | BinOp() | Call() if _isInvariant(e, assigned):
+            for (x, h) in hoisted:
+                if h == e:
+                    return AtomExp(Name(x, assertExpNotVoid(e)), e.ty)
+            t = assertExpNotVoid(e)
+            x = ctx.newVar(t)
+            hoisted.append((x, e))
+            return AtomExp(Name(x, t), e.ty)
+        case Call(f, args):
+            return Call(f, [_hoistExp(a, assigned, hoisted, ctx) for a in args], e.ty)
+        case UnOp(op, arg):
+            return UnOp(op, _hoistExp(arg, assigned, hoisted, ctx), e.ty)
+        case BinOp(left, op, right):
+            return BinOp(_hoistExp(left, assigned, hoisted, ctx), op,
+                         _hoistExp(right, assigned, hoisted, ctx), e.ty)
+        case AtomExp() | ArrayInitDyn() | ArrayInitStatic() | Subscript():
+            return e
+
+def _isInvariant(e: exp, assigned: set[Ident]) -> bool:
+    match e:
+        case AtomExp(Name(x)):
+            return x not in assigned
+        case AtomExp():
+            return True
+        case Call(Ident('len'), [arg]):
+            return _isInvariant(arg, assigned)
+        case UnOp(_, arg):
+            return _isInvariant(arg, assigned)
+        case BinOp(left, _, right):
+            return _isInvariant(left, assigned) and _isInvariant(right, assigned)
+        case Call() | ArrayInitDyn() | ArrayInitStatic() | Subscript():
+            return False
+
+def _assigned(stmts: list[stmt]) -> set[Ident]:
+    res: set[Ident] = set()
+    for s in stmts:
+        match s:
+            case Assign(x, _):
+                res.add(x)
+            case IfStmt(_, thenBody, elseBody):
+                res.update(_assigned(thenBody))
+                res.update(_assigned(elseBody))
+            case WhileStmt(_, body):
+                res.update(_assigned(body))
+            case StmtExp() | SubscriptAssign():
+                pass
+    return res
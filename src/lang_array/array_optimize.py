@@ -0,0 +1,125 @@
+"""
+Optimizations on the type-checked AST: folding of constant expressions, algebraic
+simplifications (x*1, x+0, not not b, ...) and removal of branches that are never executed.
+
+Integer arithmetic wraps around at 64 bits, as in the generated code. Expressions with
+side effects (calls, array creation, and subscripts, which might fail with an IndexError)
+are never removed.
+"""
+from __future__ import annotations
+from typing import *
+from lang_array.array_ast import *
+from common.utils import wrap64
+
+def optimizeModule(m: mod) -> mod:
+    return Module(optimizeStmts(m.stmts))
+
+def optimizeStmts(stmts: list[stmt]) -> list[stmt]:
+    res: list[stmt] = []
+    for s in stmts:
+        res.extend(optimizeStmt(s))
+    return res
+
+def optimizeStmt(s: stmt) -> list[stmt]:
+    match s:
+        case StmtExp(e):
+            return [StmtExp(optimizeExp(e))]
+        case Assign(x, e):
+            return [Assign(x, optimizeExp(e))]
+        case IfStmt(cond, thenBody, elseBody):
+            match optimizeExp(cond):
+                case BoolConst(True):
+                    return optimizeStmts(thenBody)
+                case BoolConst(False):
+                    return optimizeStmts(elseBody)
+                case c:
+                    return [IfStmt(c, optimizeStmts(thenBody), optimizeStmts(elseBody))]
+        case WhileStmt(cond, body):
+            match optimizeExp(cond):
+                case BoolConst(False):
+                    return []
+                case c:
+                    return [WhileStmt(c, optimizeStmts(body))]
+        case SubscriptAssign(left, index, right):
+            return [SubscriptAssign(optimizeExp(left), optimizeExp(index), optimizeExp(right))]
+
+def isPure(e: exp) -> bool:
+    match e:
+        case IntConst() | BoolConst() | Name():
+            return True
+        case Call() | ArrayInitDyn() | ArrayInitStatic() | Subscript():
+            return False
+        case UnOp(_, arg):
+            return isPure(arg)
+        case BinOp(left, _, right):
+            return isPure(left) and isPure(right)
+
+def optimizeExp(e: exp) -> exp:
+    match e:
+        case IntConst() | BoolConst() | Name():
+            return e
+        case Call(f, args):
+            return Call(f, [optimizeExp(a) for a in args], e.ty)
+        case UnOp(op, arg):
+            return optimizeUnOp(op, optimizeExp(arg), e.ty)
+        case BinOp(left, op, right):
+            return optimizeBinOp(optimizeExp(left), op, optimizeExp(right), e.ty)
+        case ArrayInitDyn(n, elemInit):
+            return ArrayInitDyn(optimizeExp(n), optimizeExp(elemInit), e.ty)
+        case ArrayInitStatic(elems):
+            return ArrayInitStatic([optimizeExp(x) for x in elems], e.ty)
+        case Subscript(array, index):
+            return Subscript(optimizeExp(array), optimizeExp(index), e.ty)
+
+def optimizeUnOp(op: unaryop, arg: exp, t: optional[resultTy]) -> exp:
+    match (op, arg):
+        case (USub(), IntConst(v)):
+            return IntConst(wrap64(-v), t)
+        case (USub(), UnOp(USub(), x)):
+            return x
+        case (Not(), BoolConst(b)):
+            return BoolConst(not b, t)
+        case (Not(), UnOp(Not(), x)):
+            return x
+        case _:
+            return UnOp(op, arg, t)
+
+def optimizeBinOp(left: exp, op: binaryop, right: exp, t: optional[resultTy]) -> exp:
+    match (left, op, right):
+        case (IntConst(a), _, IntConst(b)):
+            match op:
+                case Add(): return IntConst(wrap64(a + b), t)
+                case Sub(): return IntConst(wrap64(a - b), t)
+                case Mul(): return IntConst(wrap64(a * b), t)
+                case Less(): return BoolConst(a < b, t)
+                case LessEq(): return BoolConst(a <= b, t)
+                case Greater(): return BoolConst(a > b, t)
+                case GreaterEq(): return BoolConst(a >= b, t)
+                case Eq(): return BoolConst(a == b, t)
+                case NotEq(): return BoolConst(a != b, t)
+                case _: pass
+        case (BoolConst(a), Eq(), BoolConst(b)):
+            return BoolConst(a == b, t)
+        case (BoolConst(a), NotEq(), BoolConst(b)):
+            return BoolConst(a != b, t)
+        case (BoolConst(True), And(), x) | (x, And(), BoolConst(True)):
+            return x
+        case (BoolConst(False), Or(), x) | (x, Or(), BoolConst(False)):
+            return x
+        case (BoolConst(False), And(), _):
+            return left
+        case (BoolConst(True), Or(), _):
+            return left
+        case (x, And(), BoolConst(False)) if isPure(x):
+            return right
+        case (x, Or(), BoolConst(True)) if isPure(x):
+            return right
+        case (IntConst(0), Add(), x) | (x, Add(), IntConst(0)) | (x, Sub(), IntConst(0)):
+            return x
+        case (IntConst(1), Mul(), x) | (x, Mul(), IntConst(1)):
+            return x
+        case (IntConst(0), Mul(), x) | (x, Mul(), IntConst(0)) if isPure(x):
+            return IntConst(0, t)
+        case _:
+            pass
+    return BinOp(left, op, right, t)
@@ -0,0 +1,121 @@
+"""
+Loop-invariant code motion on the type-checked AST.
+
+An expression inside a while loop is invariant if it does not call a function and all
+variables it reads are never assigned in the loop (including nested statements). The
+maximal invariant subexpressions of the loop condition and body are computed once in
+fresh variables before the loop:
+
+    while i < n * m:            tmp = n * m
+        print(i + n * m)   =>   while i < tmp:
+        i = i + 1                   print(i + tmp)
+                                    i = i + 1
+
+Expressions of lang_loop cannot trap and invariant expressions have no side effects, so
+evaluating them before the loop is safe, even if the loop body is never executed.
+"""
+from __future__ import annotations
+from typing import *
+from lang_loop.loop_ast import *
+
+type Hoisted = list[tuple[Ident, exp]]
+
+class Ctx:
+    """
+    The fresh variables introduced by the transformation.
+    """
+    def __init__(self):
+        self.freshVars: dict[ident, ty] = {}
+    def newVar(self, t: ty) -> ident:
+        # @ cannot appear in source identifiers
+        x = Ident(f'@licm_{len(self.freshVars)}')
+        self.freshVars[x] = t
+        return x
+
+def hoistModule(m: mod, ctx: Ctx) -> mod:
+    return Module(hoistStmts(m.stmts, ctx))
+
+def hoistStmts(stmts: list[stmt], ctx: Ctx) -> list[stmt]:
+    res: list[stmt] = []
+    for s in stmts:
+        match s:
+            case WhileStmt(cond, body):
+                assigned = _assigned(body)
+                hoisted: Hoisted = []
+                cond = _hoistExp(cond, assigned, hoisted, ctx)
+                body = [_hoistStmt(t, assigned, hoisted, ctx) for t in body]
+                res.extend(Assign(x, e) for (x, e) in hoisted)
+                # Expressions invariant only in nested loops go before these loops
+                res.append(WhileStmt(cond, hoistStmts(body, ctx)))
+            case IfStmt(cond, thenBody, elseBody):
+                res.append(IfStmt(cond, hoistStmts(thenBody, ctx), hoistStmts(elseBody, ctx)))
+            case StmtExp() | Assign():
+                res.append(s)
+    return res
+
+def _hoistStmt(s: stmt, assigned: set[Ident], hoisted: Hoisted, ctx: Ctx) -> stmt:
+    """
+    Replaces the invariant expressions in s (and in the statements nested in s).
+    """
+    def stmts(ss: list[stmt]) -> list[stmt]:
+        return [_hoistStmt(t, assigned, hoisted, ctx) for t in ss]
+    match s:
+        case StmtExp(e):
+            return StmtExp(_hoistExp(e, assigned, hoisted, ctx))
+        case Assign(x, e):
+            return Assign(x, _hoistExp(e, assigned, hoisted, ctx))
+        case IfStmt(cond, thenBody, elseBody):
+            return IfStmt(_hoistExp(cond, assigned, hoisted, ctx), stmts(thenBody), stmts(elseBody))
+        case WhileStmt(cond, body):
+            return WhileStmt(_hoistExp(cond, assigned, hoisted, ctx), stmts(body))
+
+def _hoistExp(e: exp, assigned: set[Ident], hoisted: Hoisted, ctx: Ctx) -> exp:
+    match e:
+        case IntConst() | BoolConst() | Name():
+            return e
+        case UnOp() | BinOp() if _isInvariant(e, assigned):
+            for (x, h) in hoisted:
+                if h == e:
+                    return Name(x, e.ty)
+            match e.ty:
+                case NotVoid(t):
+                    x = ctx.newVar(t)
+                case _:
+                    raise ValueError(f'Expression without type: {e}')
+            hoisted.append((x, e))
+            return Name(x, e.ty)
+        case Call(f, args):
+            return Call(f, [_hoistExp(a, assigned, hoisted, ctx) for a in args], e.ty)
+        case UnOp(op, arg):
+            return UnOp(op, _hoistExp(arg, assigned, hoisted, ctx), e.ty)
+        case BinOp(left, op, right):
+            return BinOp(_hoistExp(left, assigned, hoisted, ctx), op,
+                         _hoistExp(right, assigned, hoisted, ctx), e.ty)
+
+def _isInvariant(e: exp, assigned: set[Ident]) -> bool:
+    match e:
+        case IntConst() | BoolConst():
+            return True
+        case Name(x):
+            return x not in assigned
+        case Call():
+            return False
+        case UnOp(_, arg):
+            return _isInvariant(arg, assigned)
+        case BinOp(left, _, right):
+            return _isInvariant(left, assigned) and _isInvariant(right, assigned)
+
+def _assigned(stmts: list[stmt]) -> set[Ident]:
+    res: set[Ident] = set()
+    for s in stmts:
+        match s:
+            case Assign(x, _):
+                res.add(x)
+            case IfStmt(_, thenBody, elseBody):
+                res.update(_assigned(thenBody))
+                res.update(_assigned(elseBody))
+            case WhileStmt(_, body):
+                res.update(_assigned(body))
+            case StmtExp():
+                pass
+    return res
@@ -0,0 +1,69 @@
+"""
+Optimizations on the type-checked AST: folding of constant expressions and algebraic
+simplifications (x*1, x+0, ...).
+
+Integer arithmetic wraps around at 64 bits, as in the generated code. Expressions with
+side effects (calls of input_int or print) are never removed.
+"""
+from __future__ import annotations
+from typing import *
+from lang_var.var_ast import *
+from common.utils import wrap64
+
+def optimizeModule(m: mod) -> mod:
+    return Module([optimizeStmt(s) for s in m.stmts])
+
+def optimizeStmt(s: stmt) -> stmt:
+    match s:
+        case StmtExp(e):
+            return StmtExp(optimizeExp(e))
+        case Assign(x, e):
+            return Assign(x, optimizeExp(e))
+
+def isPure(e: exp) -> bool:
+    match e:
+        case IntConst() | Name():
+            return True
+        case Call():
+            return False
+        case UnOp(_, arg):
+            return isPure(arg)
+        case BinOp(left, _, right):
+            return isPure(left) and isPure(right)
+
+def optimizeExp(e: exp) -> exp:
+    match e:
+        case IntConst() | Name():
+            return e
+        case Call(f, args):
+            return Call(f, [optimizeExp(a) for a in args])
+        case UnOp(op, arg):
+            return optimizeUnOp(op, optimizeExp(arg))
+        case BinOp(left, op, right):
+            return optimizeBinOp(optimizeExp(left), op, optimizeExp(right))
+
+def optimizeUnOp(op: unaryop, arg: exp) -> exp:
+    match (op, arg):
+        case (USub(), IntConst(v)):
+            return IntConst(wrap64(-v))
+        case (USub(), UnOp(USub(), x)):
+            return x
+        case _:
+            return UnOp(op, arg)
+
+def optimizeBinOp(left: exp, op: binaryop, right: exp) -> exp:
+    match (left, op, right):
+        case (IntConst(a), Add(), IntConst(b)):
+            return IntConst(wrap64(a + b))
+        case (IntConst(a), Sub(), IntConst(b)):
+            return IntConst(wrap64(a - b))
+        case (IntConst(a), Mul(), IntConst(b)):
+            return IntConst(wrap64(a * b))
+        case (IntConst(0), Add(), x) | (x, Add(), IntConst(0)) | (x, Sub(), IntConst(0)):
+            return x
+        case (IntConst(1), Mul(), x) | (x, Mul(), IntConst(1)):
+            return x
+        case (IntConst(0), Mul(), x) | (x, Mul(), IntConst(0)) if isPure(x):
+            return IntConst(0)
+        case _:
+            return BinOp(left, op, right)
@@ -1,23 +1,37 @@
+# Only modules needed by all commands are imported here. Every command imports the modules
+# it needs itself, so that startup stays fast (see test/test_importTime.py).
 import argparse
 from typing import *
-import common.genericCompiler as genericCompiler
-import common.genericInterp as genericInterp
-import common.genericParser as genericParser
 import common.utils as utils
 import common.log as log
 import common.constants as constants
-import parsers.lang_simple.simple_parser as simple_parser
-import assembly.compiler as tac_comp
-import assembly.tacInterp as tac_interp
+import common.compileServer as compileServer
+import common.timings as timings
+from common.langModules import importModule, getFun, guessLang
 import importlib
 import shell
 import sys
-import os
-import typing
 
 DEFAULT_OUTPUT = 'out.wasm'
 
-def parseArgs():
+def addTimingsArg(p: argparse.ArgumentParser):
+    # --timings without a value is rewritten to --timings=text by parseArgs
+    p.add_argument('--timings', choices=['text', 'json'], metavar='FORMAT',
+                   help='Print wall time, CPU time, and peak memory of each phase to stderr ' \
+                       '(--timings or --timings=json). Memory tracing slows down all phases.')
+
+def addOptArg(p: argparse.ArgumentParser):
+    p.add_argument('-O', dest='opt_level', type=int, metavar='LEVEL',
+                   choices=range(constants.MAX_OPT_LEVEL + 1), default=constants.DEFAULT_OPT_LEVEL,
+                   help=f'Optimization level, -O0 disables all optimizations ' \
+                       f'(default: -O{constants.DEFAULT_OPT_LEVEL})')
+
+def addGcArg(p: argparse.ArgumentParser):
+    p.add_argument('--gc', action='store_true',
+                   help='Reclaim unreachable arrays with a mark-sweep collector instead of ' \
+                       'never freeing them (only lang_array)')
+
+def parseArgs(argv: Optional[list[str]] = None):
     parser = argparse.ArgumentParser(description=f'Run the compiler or interpreter for some language')
     parser.add_argument('--lang', choices=['simple', 'var', 'loop', 'array', 'fun', 'tinyJson'],
                         help='The language (guessed from path of input file if not given)')
@@ -31,30 +45,66 @@ Exit code {constants.COMPILE_ERROR_EXIT_CODE} for compile error (source program
 exit codes signal a bug in the compiler itself.'''
     cp = subparsers.add_parser('compile', help=helpCompiler)
     def addCompilerArgs(p: argparse.ArgumentParser):
-        p.add_argument('--wat2wasm', default='wat2wasm',
-                           help='Path to the wat2wasm tool')
+        p.add_argument('--wat2wasm',
+                       help='Path to the wat2wasm tool (default: use the builtin encoder)')
         p.add_argument('--output', default=DEFAULT_OUTPUT,
                        help=f'Output file (.wat or .wasm). Default: {DEFAULT_OUTPUT}')
         p.add_argument('--max-mem-size', type=int,
                        help="Max memory size in number of 64kB pages")
         p.add_argument('--max-array-size', type=int,
                        help="Max size of an array in bytes")
+        p.add_argument('--no-cache', action='store_true',
+                       help='Do not use the compile cache')
+        p.add_argument('--pretty-wat', action='store_true',
+                       help='Use a prettier but slower layout for .wat files')
+        addOptArg(p)
+        addGcArg(p)
+        addTimingsArg(p)
         p.add_argument('input', help='Input file .py')
     addCompilerArgs(cp)
+    batch = subparsers.add_parser('compile-batch',
+                                  help='Compiles many input files (or all .py files in the given ' \
+                                      'directories) in parallel. Also see the compile command for help')
+    batch.add_argument('--wat2wasm',
+                       help='Path to the wat2wasm tool (default: use the builtin encoder)')
+    batch.add_argument('--output-dir', default='out',
+                       help='Output directory (default: out)')
+    batch.add_argument('--format', choices=['wat', 'wasm'], default='wasm',
+                       help='Output format (default: wasm)')
+    batch.add_argument('--jobs', '-j', type=int,
+                       help='Number of worker processes (default: number of CPUs)')
+    batch.add_argument('--max-mem-size', type=int,
+                       help="Max memory size in number of 64kB pages")
+    batch.add_argument('--max-array-size', type=int,
+                       help="Max size of an array in bytes")
+    batch.add_argument('--no-cache', action='store_true',
+                       help='Do not use the compile cache')
+    batch.add_argument('--pretty-wat', action='store_true',
+                       help='Use a prettier but slower layout for .wat files')
+    addOptArg(batch)
+    addGcArg(batch)
+    batch.add_argument('inputs', nargs='+', help='Input files .py or directories')
     run = subparsers.add_parser('run', help='Compiles the given program and runs it with iwasm. Also see the ' \
         'compile command for help')
     run.add_argument('--run-wasm', default='wasm-support/run_iwasm',
                      help=f'Command to run wasm files')
+    run.add_argument('--engine', choices=['iwasm', 'builtin'], default='iwasm',
+                     help='iwasm: run the wasm file with the command given by --run-wasm, ' \
+                         'builtin: run the compiled module in-process with our own wasm ' \
+                         'interpreter (default: iwasm)')
     addCompilerArgs(run)
 
     interp = subparsers.add_parser('interp', help='Runs the given file through our own interpeter')
     interp.add_argument('--level', help='The loglevel (debug, info, warn)')
+    addTimingsArg(interp)
     interp.add_argument('input', help='Input file .py')
 
     tacInterp = subparsers.add_parser('tacInterp',
                                       help='Compiles the given file to wasm, generates TAC, and ' \
                                         'interpretes the TAC (only works for lang_var and lang_loop)')
     tacInterp.add_argument('--level', help='The loglevel (debug, info, warn)')
+    addTimingsArg(tacInterp)
+    addOptArg(tacInterp)
     tacInterp.add_argument('input', help='Input file .py')
     tacInterp.add_argument('--print-tac', action='store_true',
                            help='Print the three-address code instructions')
@@ -66,6 +116,11 @@ exit codes signal a bug in the compiler itself.'''
     assembly.add_argument('--level', help='The loglevel (debug, info, warn)')
     assembly.add_argument('--max-registers', type=int,
                           help="Max number of registers used")
+    assembly.add_argument('--regalloc', choices=['coloring', 'linear'], default='coloring',
+                          help='Register allocation by graph coloring (default) or by linear ' \
+                              'scan (faster for big programs, but spills more)')
+    addTimingsArg(assembly)
+    addOptArg(assembly)
     assembly.add_argument('input', help='Input file .py')
     assembly.add_argument('output', default='out.as', help='Output file .as (default: out.as)')
 
@@ -83,34 +138,24 @@ exit codes signal a bug in the compiler itself.'''
                    help='Optional .png for for parse tree visualization')
     p.add_argument('input', help='Input file .py')
 
-    args = parser.parse_args()
+    serve = subparsers.add_parser('serve',
+                                  help='Starts a server that keeps the compiler loaded. ' \
+                                      'Use src/client.py (same arguments as this script) ' \
+                                      'to send requests to the server.')
+    serve.add_argument('--socket', default=compileServer.defaultSocketPath(),
+                       help=f'Path of the unix socket (default: ${compileServer.SOCKET_ENV_VAR} or ' \
+                           f'{compileServer.defaultSocketPath()})')
+
+    if argv is None:
+        argv = sys.argv[1:]
+    argv = ['--timings=text' if a == '--timings' else a for a in argv]
+    args = parser.parse_args(argv)
     if args.cmd is None:
         utils.abort(f'No command given')
     if args.lang == 'simple' and args.cmd != 'parse':
         utils.abort('Language simple only available when parsing')
     return args
 
-def importModule(lang: str, kind: Literal['compile', 'interp', 'ast', 'parse']):
-    if lang == 'simple':
-        return None
-    match kind:
-        case "compile":
-            modName = f'compilers.lang_{lang}.{lang}_compiler'
-        case "parse":
-            modName = f'parsers.lang_{lang}.{lang}_parser'
-        case "interp":
-            modName = f'lang_{lang}.{lang}_interp'
-        case "ast":
-            modName = f'lang_{lang}.{lang}_ast'
-    m = importlib.import_module(modName)
-    return m
-
-def getFun(mod: Any, fun: str):
-    try:
-        return getattr(mod, fun)
-    except AttributeError:
-        utils.abort(f'Module {mod} does not define function {fun}')
-
 def runWasm(runWasmCmd: str, file: str):
     delim = 80 * '-'
     print(delim)
@@ -119,62 +164,150 @@ def runWasm(runWasmCmd: str, file: str):
     cmd = [runWasmCmd, file]
     if shell.isFile(runWasmCmd) and not utils.isExecutable(runWasmCmd):
         cmd = ['bash'] + cmd
-    res = shell.run(cmd, onError='ignore')
+    with timings.phase('run wasm'):
+        res = shell.run(cmd, onError='ignore')
     ecode = 0 if res.exitcode == 0 else constants.RUN_ERROR_EXIT_CODE
     print(delim)
     print(f'Finished running wasm file {file}, exit code: {ecode}')
     sys.exit(ecode)
 
-PRELUDE_DICT = {
-    'input_int': lambda: utils.inputInt('Input some int: '),
-    'Callable': cast(Any, typing.Callable)
-}
+def runWasmBuiltin(wasmMod: Any, file: str):
+    import common.wasmInterp as wasmInterp
+    delim = 80 * '-'
+    print(delim)
+    print(f'Running wasm file {file} with the builtin interpreter')
+    print(delim)
+    sys.stdout.flush()
+    with timings.phase('run wasm'):
+        ecode = wasmInterp.runModule(wasmMod)
+    print(delim)
+    print(f'Finished running wasm file {file}, exit code: {ecode}')
+    sys.exit(ecode)
+
+# Grammars and start symbols whose parsers are constructed before the server starts to
+# accept requests.
+WARM_GRAMMARS: list[tuple[str, str, str]] = [
+    ('lalr', 'src/parsers/lang_var/var_grammar.lark', 'mod'),
+    ('lalr', 'src/parsers/lang_simple/simple_grammar.lark', 'exp'),
+    ('earley', 'src/parsers/lang_simple/simple_grammar.lark', 'exp'),
+    ('earley', 'src/parsers/tinyJson/tinyJson_grammar.lark', 'start')
+]
 
-def runWithPython(srcFile: str):
-    src = utils.readTextFile(srcFile)
-    exec(src, PRELUDE_DICT)
+def warmup():
+    """
+    Imports all modules and builds all parsers a request might need.
+    """
+    import parsers.common as parsers_common
+    for modName in ['common.genericCompiler', 'common.genericInterp', 'common.genericParser',
+                    'common.batchCompiler', 'common.pretty', 'assembly.compiler',
+                    'assembly.tacInterp', 'parsers.lang_simple.simple_parser']:
+        importlib.import_module(modName)
+    kinds: list[Literal['compile', 'interp', 'ast', 'parse']] = ['ast', 'compile', 'interp', 'parse']
+    for lang in constants.ALL_LANGUAGES:
+        for kind in kinds:
+            try:
+                importModule(lang, kind)
+            except ImportError as e:
+                log.debug(f'Not preloading {kind} module for {lang}: {e}')
+    for modName in ['compilers.assembly.liveness', 'compilers.assembly.graphColoring',
+                    'compilers.assembly.tacSpillAssignToMips', 'parsers.tinyJson.tinyJson_parser']:
+        try:
+            importlib.import_module(modName)
+        except ImportError as e:
+            log.debug(f'Not preloading {modName}: {e}')
+    for (alg, grammarFile, start) in WARM_GRAMMARS:
+        if shell.isFile(grammarFile):
+            try:
+                parsers_common.mkParser(cast(Any, alg), grammarFile, start)
+            except parsers_common.ParseError as e:
+                log.debug(f'Not preloading parser for {grammarFile}: {e}')
 
-def main():
-    args = parseArgs()
+def compileBatch(args: argparse.Namespace) -> int:
+    import common.genericCompiler as genericCompiler
+    import common.batchCompiler as batchCompiler
+    jobs: list[batchCompiler.BatchJob] = []
+    for (input, relPath) in batchCompiler.collectInputs(args.inputs):
+        lang = args.lang or guessLang(input)
+        if lang is None:
+            utils.abort(f'Language not given with --lang and input file {input} does not allow ' \
+                'guessing the language.')
+        output = batchCompiler.outputFile(args.output_dir, relPath, '.' + args.format)
+        shell.mkdirs(shell.dirname(output))
+        compileArgs = genericCompiler.Args(input, output, args.wat2wasm,
+                                           args.max_mem_size, args.max_array_size,
+                                           useCache=not args.no_cache,
+                                           prettyWat=args.pretty_wat,
+                                           optLevel=args.opt_level, gc=args.gc)
+        jobs.append(batchCompiler.BatchJob(lang, compileArgs))
+    return batchCompiler.batchMain(jobs, args.jobs)
+
+def startServer(socketPath: str):
+    warmup()
+    compileServer.serve(socketPath, main)
+
+def main(argv: Optional[list[str]] = None):
+    args = parseArgs(argv)
     level = log.resolveLevelName(args.level or 'warn')
     log.init(level, 'minipy.log')
+    timingsFormat = getattr(args, 'timings', None)
+    if timingsFormat is None:
+        runCommand(args)
+        return
+    timings.enable()
+    try:
+        runCommand(args)
+    finally:
+        timings.report(timingsFormat)
+        timings.disable()
+
+def runCommand(args: argparse.Namespace):
+    if args.cmd == 'serve':
+        startServer(args.socket)
+        return
+    if args.cmd == 'compile-batch':
+        sys.exit(compileBatch(args))
     if args.lang:
         lang = args.lang
     else:
-        lang = None
-        for x in args.input.split(os.sep):
-            if x.startswith('lang_'):
-                lang = x[len('lang_'):]
+        lang = guessLang(args.input)
         if lang is None:
-            if args.input.endswith('.json'):
-                lang = 'tinyJson'
-            else:
-                utils.abort(f'Language not given with --lang and input file does not allow guessing '\
-                    'the language.')
+            utils.abort(f'Language not given with --lang and input file does not allow guessing '\
+                'the language.')
     match args.cmd:
         case "compile" | "run":
+            import common.genericCompiler as genericCompiler
             ast = importModule(lang, 'ast')
             if args.cmd == "run" and not args.output.endswith('.wasm'):
                 utils.abort("For mode=run, output file must be a .wasm file")
             compilerMod = importModule(lang, 'compile')
             compileFun = getFun(compilerMod, 'compileModule')
             compileArgs = genericCompiler.Args(args.input, args.output, args.wat2wasm,
-                                                args.max_mem_size, args.max_array_size)
-            genericCompiler.compileMain(compileArgs, compileFun, ast)
-            if args.cmd == "run":
+                                                args.max_mem_size, args.max_array_size,
+                                                useCache=not args.no_cache,
+                                                prettyWat=args.pretty_wat,
+                                                optLevel=args.opt_level, gc=args.gc)
+            wasmMod = genericCompiler.compileMain(compileArgs, compileFun, ast)
+            if args.cmd == "run" and args.engine == 'builtin':
+                runWasmBuiltin(wasmMod, args.output)
+            elif args.cmd == "run":
                 runWasm(args.run_wasm, args.output)
         case "interp":
+            import common.genericInterp as genericInterp
             ast = importModule(lang, 'ast')
             interpMod = importModule(lang, 'interp')
             interpFun = getFun(interpMod, 'interpModule')
             interpArgs = genericInterp.Args(args.input)
             genericInterp.interpMain(interpArgs, interpFun, ast)
         case "pyrun":
-            runWithPython(args.input)
+            import common.pyrun as pyrun
+            pyrun.runWithPython(args.input)
         case "parse":
-            parserArgs = genericParser.ParserArgs(utils.readTextFile(args.input),
+            import common.genericParser as genericParser
+            import parsers.common as parsers_common
+            parserArgs = parsers_common.ParserArgs(utils.readTextFile(args.input),
                                                   args.alg, args.png, args.grammar)
             if lang == 'simple':
+                import parsers.lang_simple.simple_parser as simple_parser
                 simple_parser.parse(parserArgs)
             elif lang == 'tinyJson':
                 tinyJson_parser = utils.importModuleNotInStudent('parsers.tinyJson.tinyJson_parser')
@@ -188,12 +321,16 @@ def main():
                 parseFun = getFun(parseMod, 'parseModule')
                 genericParser.parseWithOwnParser(args.input, parserArgs, ast, parseFun)
         case "tacInterp":
-            compileArgs = genericCompiler.Args(args.input, '/tmp/dummy.wasm', 'wat2wasm', 1, 1)
-            tac_interp.interpFile(compileArgs, args.print_tac)
+            import common.genericCompiler as genericCompiler
+            import assembly.tacInterp as tac_interp
+            compileArgs = genericCompiler.Args(args.input, '/tmp/dummy.wasm', None, 1, 1)
+            tac_interp.interpFile(compileArgs, args.print_tac, args.opt_level)
         case "assembly":
-            compileArgs = genericCompiler.Args(args.input, args.output, 'wat2wasm', 1, 1,
+            import common.genericCompiler as genericCompiler
+            import assembly.compiler as tac_comp
+            compileArgs = genericCompiler.Args(args.input, args.output, None, 1, 1,
                                                args.max_registers)
-            tac_comp.compileFile(compileArgs)
+            tac_comp.compileFile(compileArgs, args.opt_level, args.regalloc)
         case _:
             utils.abort(f'Unknown command: {args.cmd}')
 
@@ -1,10 +1,12 @@
 from typing import *
 from lark import Lark, Token, Tree, ParseTree, tree, exceptions
-import pydot
 import common.log as log
 import common.utils as utils
 from dataclasses import dataclass
 import os
+if TYPE_CHECKING:
+    # pydot is only loaded by lark when visualizing a parse tree
+    import pydot
 
 type ParseAlg = Literal['earley', 'lalr']
 
@@ -124,7 +126,19 @@ class ParseError(Exception):
 def mkLexer(grammarFile: str) -> Lark:
     return mkParser('earley', grammarFile, 'start')
 
+# Parsers constructed so far. The key contains the modification time of the grammar file,
+# so that a long-running process (see common.compileServer) notices changes to the grammar.
+_parserCache: dict[tuple[ParseAlg, str, str, int], Lark] = {}
+
 def mkParser(alg: ParseAlg, grammarFile: str, start: str) -> Lark:
+    key = (alg, os.path.abspath(grammarFile), start, os.stat(grammarFile).st_mtime_ns)
+    parser = _parserCache.get(key)
+    if parser is None:
+        parser = _mkParser(alg, grammarFile, start)
+        _parserCache[key] = parser
+    return parser
+
+def _mkParser(alg: ParseAlg, grammarFile: str, start: str) -> Lark:
     grammar = utils.readTextFile(grammarFile)
     try:
         match alg:
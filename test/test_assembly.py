@@ -7,10 +7,11 @@ import shell
 
 pytestmark = pytest.mark.instructor
 
-def params() -> list[tuple[str, str, int]]:
+def params() -> list[tuple[str, str, int, str]]:
     l = testsupport.collectTestFiles(['test_files'], ['var', 'simple'], ignoreErrorFiles=True)
     maxRegisters = [8, 2, 1, 0]
-    return [(lang, src, maxReg) for (lang, src) in l for maxReg in maxRegisters]
+    return [(lang, src, maxReg, regAlloc) for (lang, src) in l for maxReg in maxRegisters
+            for regAlloc in ['coloring', 'linear']]
 
 def checkMaxRegisters(asFile: str, maxRegisters: int):
     # We use the registers $s0, $s1 ... for use variables
@@ -23,10 +24,11 @@ def checkMaxRegisters(asFile: str, maxRegisters: int):
             raise ValueError(f'Assembler code uses forbidden register {r}. ' \
                 f'Only {maxRegisters} are allowed.')
 
-def runTest(lang: str, srcFile: str, maxRegisters: int,
+def runTest(lang: str, srcFile: str, maxRegisters: int, regAlloc: str,
             tmp: str, hasErr: bool, input: str|None, extraArgs: str|None) -> shell.RunResult:
     out = shell.mkTempFile('.as')
-    cmd = f'python src/main.py --lang={lang} assembly --max-registers {maxRegisters} {srcFile} {out}'
+    cmd = f'python src/main.py --lang={lang} assembly --max-registers {maxRegisters} ' \
+        f'--regalloc {regAlloc} {srcFile} {out}'
     log.info(f'Running command {cmd}')
     res1 = shell.run(cmd, onError='ignore')
     if res1.exitcode != 0:
@@ -45,11 +47,11 @@ def runTest(lang: str, srcFile: str, maxRegisters: int,
     res2.stdout = '\n'.join(cleanLines)
     return res2
 
-@pytest.mark.parametrize("lang, srcFile, maxRegisters", params())
-def test_assembly(lang: str, srcFile: str, maxRegisters: int, tmp_path: str):
+@pytest.mark.parametrize("lang, srcFile, maxRegisters, regAlloc", params())
+def test_assembly(lang: str, srcFile: str, maxRegisters: int, regAlloc: str, tmp_path: str):
     testsupport.runFileTest(
         srcFile,
         lambda captureErr, input, extraArgs: \
-            runTest(lang, srcFile, maxRegisters, tmp_path, captureErr, input, extraArgs)
+            runTest(lang, srcFile, maxRegisters, regAlloc, tmp_path, captureErr, input, extraArgs)
     )
 
@@ -0,0 +1,42 @@
+import subprocess
+import shell
+import common.constants as constants
+import common.utils as utils
+import common.testRunner as testRunner
+
+def test_compileBatch(tmp_path: str):
+    srcDir = shell.pjoin(tmp_path, 'src')
+    outDir = shell.pjoin(tmp_path, 'out')
+    shell.mkdirs(shell.pjoin(srcDir, 'sub'))
+    utils.writeTextFile(shell.pjoin(srcDir, 'a.py'), 'print(1)\n')
+    utils.writeTextFile(shell.pjoin(srcDir, 'sub', 'b.py'), 'x = 2\nprint(x)\n')
+    res = subprocess.run(['python', 'src/main.py', '--lang=var', 'compile-batch', '--jobs=2',
+                          '--format=wat', '--output-dir', outDir, srcDir],
+                         capture_output=True, text=True)
+    assert res.returncode == 0
+    assert shell.isFile(shell.pjoin(outDir, 'a.wat'))
+    assert shell.isFile(shell.pjoin(outDir, 'sub', 'b.wat'))
+    utils.writeTextFile(shell.pjoin(srcDir, 'c.py'), 'print(y)\n')
+    res = subprocess.run(['python', 'src/main.py', '--lang=var', 'compile-batch', '--jobs=2',
+                          '--format=wat', '--output-dir', outDir, srcDir],
+                         capture_output=True, text=True)
+    assert res.returncode == constants.COMPILE_ERROR_EXIT_CODE
+    assert 'c.py' in res.stdout
+
+def test_compileBatchDuplicateNames(tmp_path: str):
+    for d in ['a', 'b']:
+        shell.mkdirs(shell.pjoin(tmp_path, d))
+        utils.writeTextFile(shell.pjoin(tmp_path, d, 'x.py'), 'print(1)\n')
+    outDir = shell.pjoin(tmp_path, 'out')
+    res = subprocess.run(['python', 'src/main.py', '--lang=var', 'compile-batch',
+                          '--format=wat', '--output-dir', outDir,
+                          shell.pjoin(tmp_path, 'a', 'x.py'), shell.pjoin(tmp_path, 'b', 'x.py')],
+                         capture_output=True, text=True)
+    assert res.returncode != 0
+    assert 'would both be compiled to x' in res.stderr
+    assert not shell.exists(outDir)
+
+def test_testArgs():
+    args = testRunner.testArgs('t.py', 't.wasm', '--max-mem-size=1 --gc')
+    assert (args.maxMemSize, args.maxArraySize, args.gc) == (1, None, True)
+    assert not args.useCache
@@ -0,0 +1,53 @@
+import pathlib
+import common.genericParser as genericParser
+import common.testRunner as testRunner
+import lang_array.array_ast as array_ast
+import lang_array.array_tychecker as array_tychecker
+import lang_array.array_transform as array_transform
+import compilers.lang_array.array_compiler as array_compiler
+from lang_array.array_boundsCheck import safeSubscripts
+
+dotProduct = """
+a = [1, 2, 3]
+b = [4, 5, 6]
+s = 0
+i = 0
+while i < len(a):
+    s = s + a[i] * b[i]
+    a[i] = 0
+    i = i + 1
+print(s)
+"""
+
+def countSafe(tmp_path: pathlib.Path, src: str) -> int:
+    f = tmp_path / 'test.py'
+    f.write_text(src)
+    m = genericParser.parseFile(str(f), array_ast)
+    array_tychecker.tycheckModule(m)
+    return len(safeSubscripts(array_transform.transStmts(m.stmts, array_transform.Ctx())))
+
+def run(tmp_path: pathlib.Path, src: str, optLevel: int) -> tuple[int, str]:
+    return testRunner.runSource(str(tmp_path / 'test.py'), src, array_compiler.compileModule,
+                                array_ast, optLevel)
+
+def test_dotProduct(tmp_path: pathlib.Path):
+    # a[i] is safe (read and write), b[i] is not because the loop is bounded by len(a)
+    assert countSafe(tmp_path, dotProduct) == 2
+    assert run(tmp_path, dotProduct, 0) == run(tmp_path, dotProduct, 1) == (0, '32\n')
+
+def test_unsafeLoops(tmp_path: pathlib.Path):
+    # i might be negative
+    assert countSafe(tmp_path, dotProduct.replace('i = 0', 'i = input_int()')) == 0
+    # a is reassigned in the loop
+    assert countSafe(tmp_path, dotProduct.replace('a[i] = 0', 'a = [0]')) == 0
+    # i is decremented
+    assert countSafe(tmp_path, dotProduct.replace('i = i + 1', 'i = i + 1\n    i = i - 2')) == 0
+    # the subscripts after the increment are not safe
+    assert countSafe(tmp_path, dotProduct.replace('a[i] = 0\n    i = i + 1',
+                                                  'i = i + 1\n    a[i] = 0')) == 1
+
+def test_outOfBoundsStillTraps(tmp_path: pathlib.Path):
+    src = dotProduct.replace('a[i] = 0', 'a[i + 1] = 0')
+    (code, out) = run(tmp_path, src, 1)
+    assert code != 0
+    assert 'IndexError' in out
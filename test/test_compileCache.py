@@ -0,0 +1,67 @@
+import os
+import shell
+import pytest
+import common.utils as utils
+import common.compileCache as compileCache
+import common.genericCompiler as genCompiler
+from common.compileCache import CompileCache
+import lang_var.var_ast as var_ast
+
+def test_storeAndLookup(tmp_path: str):
+    cache = CompileCache(shell.pjoin(tmp_path, 'cache'))
+    assert cache.lookup('abc', 'x') is None
+    cache.store('abc', {'x': b'1'})
+    cache.store('abc', {'y': b'2'})
+    p = cache.lookup('abc', 'x')
+    assert p is not None and open(p, 'rb').read() == b'1'
+    p = cache.lookup('abc', 'y')
+    assert p is not None and open(p, 'rb').read() == b'2'
+
+def test_evict(tmp_path: str):
+    cache = CompileCache(shell.pjoin(tmp_path, 'cache'), maxSize=25)
+    for (i, k) in enumerate(['k1', 'k2', 'k3']):
+        cache.store(k, {'x': 10 * b'x'})
+        d = cache.entryDir(k)
+        os.utime(d, (i, i))
+    assert cache.lookup('k1', 'x') is not None # k1 is now the most recently used entry
+    cache.evict()
+    assert cache.lookup('k1', 'x') is not None
+    assert cache.lookup('k2', 'x') is None
+    assert cache.lookup('k3', 'x') is not None
+
+def test_compileMainCached(tmp_path: str, monkeypatch: pytest.MonkeyPatch):
+    var_compiler = utils.importModuleNotInStudent('compilers.lang_var.var_compiler')
+    monkeypatch.setenv(compileCache.CACHE_DIR_ENV_VAR, shell.pjoin(tmp_path, 'cache'))
+    src = shell.pjoin(tmp_path, 'input.py')
+    out = shell.pjoin(tmp_path, 'out.wat')
+    utils.writeTextFile(src, 'x = 1\nprint(x)\n')
+    args = genCompiler.Args(src, out)
+    m1 = genCompiler.compileMain(args, var_compiler.compileModule, var_ast)
+    wat = utils.readTextFile(out)
+    os.remove(out)
+    calls: list[int] = []
+    def compileFun(m: var_ast.mod, cfg: genCompiler.CompilerConfig) -> genCompiler.WasmModule:
+        calls.append(1)
+        return var_compiler.compileModule(m, cfg)
+    compileFun.__qualname__ = var_compiler.compileModule.__qualname__
+    compileFun.__module__ = var_compiler.compileModule.__module__
+    m2 = genCompiler.compileMain(args, compileFun, var_ast)
+    assert calls == []
+    assert m1 == m2
+    assert utils.readTextFile(out) == wat
+    # different settings or sources must not hit the cache
+    genCompiler.compileMain(genCompiler.Args(src, out, maxMemSize=7), compileFun, var_ast)
+    assert calls == [1]
+    utils.writeTextFile(src, 'x = 2\nprint(x)\n')
+    genCompiler.compileMain(args, compileFun, var_ast)
+    assert calls == [1, 1]
+    genCompiler.compileMain(genCompiler.Args(src, out, useCache=False), compileFun, var_ast)
+    assert calls == [1, 1, 1]
+
+def test_compilerFiles():
+    files = compileCache.compilerFiles()
+    # modules not imported by this test are covered as well
+    assert any(f.endswith(os.path.join('lang_array', 'array_compilerSupport.py')) for f in files)
+    assert any(f.endswith('.lark') for f in files)
+    assert not any('__pycache__' in f for f in files)
+    assert compileCache.compilerHash() == compileCache.compilerHash()
@@ -0,0 +1,33 @@
+import subprocess
+import time
+import os
+import shell
+import common.utils as utils
+
+def waitForSocket(path: str):
+    for _ in range(100):
+        if os.path.exists(path):
+            return
+        time.sleep(0.1)
+    raise Exception(f'Server did not create socket {path}')
+
+def test_compileServer(tmp_path: str):
+    sock = shell.pjoin(tmp_path, 'server.sock')
+    src = shell.pjoin(tmp_path, 'input.py')
+    utils.writeTextFile(src, 'x = input_int()\nprint(x + 1)\n')
+    env = dict(os.environ, MINIPY_SERVER_SOCKET=sock)
+    server = subprocess.Popen(['python', 'src/main.py', 'serve'], env=env,
+                              stderr=subprocess.DEVNULL)
+    try:
+        waitForSocket(sock)
+        res = subprocess.run(['python', 'src/client.py', '--lang=var', 'interp', src],
+                             env=env, input='41', capture_output=True, text=True)
+        assert res.returncode == 0
+        assert res.stdout.strip() == '42'
+        res = subprocess.run(['python', 'src/client.py', '--lang=var', 'interp',
+                              shell.pjoin(tmp_path, 'missing.py')],
+                             env=env, capture_output=True, text=True)
+        assert res.returncode != 0
+    finally:
+        server.terminate()
+        server.wait()
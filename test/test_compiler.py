@@ -3,6 +3,8 @@ import common.testsupport as testsupport
 import pytest
 import common.log as log
 import common.constants as constants
+import common.testRunner as testRunner
+import sys
 
 pytestmark = pytest.mark.instructor
 
@@ -15,27 +17,28 @@ def run(wasm: str, input: str|None) -> shell.RunResult:
         res = shell.RunResult(res.stderr, res.stderr, constants.RUN_ERROR_EXIT_CODE)
     return res
 
-def runTest(lang: str, srcFile: str, tmp: str, captureErr: bool, input: str|None, extraArgs: str|None) -> shell.RunResult:
-    output = shell.pjoin(tmp, 'out.wasm')
-    cmd = f'python src/main.py --lang={lang} compile --output={output}'
-    if extraArgs:
-        cmd = cmd + ' ' + extraArgs
-    cmd = cmd + ' ' + srcFile
-    log.info(f'Running command {cmd}')
-    res = shell.run(cmd,
-                    captureStderr=captureErr, captureStdout=False, onError='ignore')
-    if captureErr and res.stderr:
-        log.info(f'Output on stderr: {res.stderr}')
-    if res.exitcode == 0:
-        return run(shell.pjoin(tmp, 'out.wasm'), input)
-    else:
-        return res
+@pytest.fixture(scope='session')
+def compiledTests(request: pytest.FixtureRequest, tmp_path_factory: pytest.TempPathFactory) \
+        -> dict[tuple[str, str], shell.RunResult]:
+    """
+    Compiles and runs all selected test_compiler tests at once, with warm worker processes.
+    """
+    tests: list[tuple[str, str]] = []
+    for item in request.session.items:
+        callspec = getattr(item, 'callspec', None)
+        if getattr(item, 'originalname', None) == 'test_compiler' and callspec is not None:
+            tests.append((callspec.params['lang'], callspec.params['srcFile']))
+    return testRunner.compileAndRunAll(tests, str(tmp_path_factory.mktemp('compiled')), run)
 
 @pytest.mark.parametrize("lang, srcFile", testsupport.collectTestFiles())
-def test_compiler(lang: str, srcFile: str, tmp_path: str):
+def test_compiler(lang: str, srcFile: str, compiledTests: dict[tuple[str, str], shell.RunResult]):
+    def getResult(captureErr: bool) -> shell.RunResult:
+        res = compiledTests[(lang, srcFile)]
+        if not captureErr and res.stderr:
+            sys.stderr.write(res.stderr)
+        return res
     testsupport.runFileTest(
         srcFile,
-        lambda captureErr, input, extraArgs: \
-            runTest(lang, srcFile, tmp_path, captureErr, input, extraArgs)
+        lambda captureErr, _input, _extraArgs: getResult(captureErr)
     )
 
@@ -19,9 +19,10 @@ def graphColoringTester(vars: list[str],
     for x,y in deps:
         g.addEdge(tac.Ident(x), tac.Ident(y))
     secondaryOrder = dict([(tac.Ident(x), i) for i, x in enumerate(reversed(vars))])
-    rm = graphColoring.colorInterfGraph(g, secondaryOrder, maxRegs)
-    for x,r in expectedRegs:
-        assert rm.resolve(tac.Ident(x)) == tacSpill.Ident(r)
+    for queue in ['heap', 'bucket']:
+        rm = graphColoring.colorInterfGraph(g, secondaryOrder, maxRegs, queue)
+        for x,r in expectedRegs:
+            assert rm.resolve(tac.Ident(x)) == tacSpill.Ident(r), f'queue={queue}'
 
 def test_NoConflict():
     graphColoringTester(['x', 'y'], [], [('x', '$s0'), ('y', '$s0')])
@@ -38,4 +39,15 @@ def test_ManyVarsConflict():
 
 def test_TooManyVarsConflict():
     graphColoringTester(['x', 'y', 'z'], [('x', 'y'), ('y', 'z'), ('x', 'z')],
-                   [('x', '$s0'), ('y', '$s1')], maxRegs=2)
\ No newline at end of file
+                   [('x', '$s0'), ('y', '$s1')], maxRegs=2)
+
+def test_adjacent():
+    graphColoring = utils.importModuleNotInStudent('compilers.assembly.graphColoring')
+    g: InterfGraph = Graph('undirected')
+    for x in ['x', 'y', 'z', 'w']:
+        g.addVertex(tac.Ident(x), None)
+    for x,y in [('x', 'y'), ('y', 'z'), ('x', 'z'), ('y', 'x')]:
+        g.addEdge(tac.Ident(x), tac.Ident(y))
+    assert set(graphColoring.getAdjacent(tac.Ident('x'), g)) == {tac.Ident('y'), tac.Ident('z')}
+    assert graphColoring.getAdjacent(tac.Ident('w'), g) == []
+    assert [g.degree(tac.Ident(x)) for x in ['x', 'y', 'z', 'w']] == [2, 2, 2, 0]
@@ -0,0 +1,60 @@
+import os
+import re
+import subprocess
+import sys
+import pytest
+import shell
+
+# Budgets for the total import time (in milliseconds) of each command, as reported by
+# python -X importtime. The budgets are about 2.5 times the time measured when they
+# were recorded. Wall-clock budgets depend on the machine and its load, so they are only
+# checked if the environment variable MINIPY_TIMING_TESTS is set (e.g. MINIPY_TIMING_TESTS=1).
+# Also, some modules are slow to import and must only be loaded by commands that need them.
+COMMANDS: dict[str, tuple[list[str], int, list[str]]] = {
+    'pyrun': (['--lang=var', 'pyrun', '{input}'], 250,
+              ['lark', 'pydot', 'prettyprinter', 'common.genericParser', 'common.genericCompiler']),
+    'interp': (['--lang=var', 'interp', '{input}'], 400,
+               ['lark', 'pydot', 'prettyprinter', 'common.genericCompiler', 'assembly.tacInterp']),
+    'compile': (['--lang=var', 'compile', '--no-cache', '--output={out}.wasm', '{input}'], 450,
+                ['lark', 'pydot', 'prettyprinter', 'assembly.tacInterp']),
+    'compileWat': (['--lang=var', 'compile', '--no-cache', '--output={out}.wat', '{input}'], 450,
+                   ['lark', 'pydot', 'prettyprinter', 'assembly.tacInterp']),
+    'tacInterp': (['--lang=var', 'tacInterp', '{input}'], 550,
+                  ['lark', 'pydot', 'prettyprinter']),
+    'assembly': (['--lang=var', 'assembly', '{input}', '{out}.as'], 550,
+                 ['lark', 'pydot', 'prettyprinter', 'assembly.tacInterp']),
+    'parse': (['--lang=simple', 'parse', '{input}'], 400,
+              ['pydot', 'prettyprinter', 'common.genericCompiler', 'assembly.tacInterp'])
+}
+
+TIMING_TESTS_ENV_VAR = 'MINIPY_TIMING_TESTS'
+
+def importTimes(args: list[str]) -> dict[str, int]:
+    """
+    Runs src/main.py with the given arguments and returns the self import time (in
+    microseconds) for every module imported.
+    """
+    res = subprocess.run([sys.executable, '-X', 'importtime', 'src/main.py'] + args,
+                         input='1\n', capture_output=True, text=True)
+    assert res.returncode == 0, res.stderr
+    times: dict[str, int] = {}
+    for l in res.stderr.splitlines():
+        m = re.match(r'import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)', l)
+        if m:
+            times[m.group(2)] = int(m.group(1))
+    return times
+
+@pytest.mark.parametrize('cmd', list(COMMANDS))
+def test_importTime(cmd: str, tmp_path: str):
+    (args, budgetMs, forbidden) = COMMANDS[cmd]
+    input = shell.pjoin(tmp_path, 'input.py')
+    with open(input, 'w') as f:
+        f.write('1 + 2' if cmd == 'parse' else 'x = input_int()\nprint(x + 1)\n')
+    out = shell.pjoin(tmp_path, 'out')
+    times = importTimes([a.format(input=input, out=out) for a in args])
+    loaded = [m for m in forbidden if m in times]
+    assert loaded == [], f'Command {cmd} should not import {loaded}'
+    if not os.environ.get(TIMING_TESTS_ENV_VAR):
+        return
+    totalMs = sum(times.values()) // 1000
+    assert totalMs <= budgetMs, f'Import time of command {cmd} is {totalMs}ms, budget is {budgetMs}ms'
@@ -0,0 +1,92 @@
+import pathlib
+from types import ModuleType
+from typing import *
+import common.genericCompiler as genericCompiler
+import common.genericParser as genericParser
+import common.testRunner as testRunner
+import lang_loop.loop_ast as loop_ast
+import lang_loop.loop_tychecker as loop_tychecker
+import lang_loop.loop_licm as loop_licm
+import lang_array.array_ast as array_ast
+import lang_array.array_astAtom as atom
+import lang_array.array_tychecker as array_tychecker
+import lang_array.array_transform as array_transform
+import lang_array.array_licm as array_licm
+from lang_array.array_boundsCheck import safeSubscripts
+import compilers.lang_loop.loop_compiler as loop_compiler
+import compilers.lang_array.array_compiler as array_compiler
+
+loopSrc = """
+n = input_int()
+i = 0
+s = 0
+while i < n * 2:
+    j = 0
+    while j < n:
+        s = s + (i + 1) * (n * 2) + j
+        j = j + 1
+    print(i * i)
+    i = i + 1
+print(s)
+"""
+
+arraySrc = """
+a = [1, 2, 3]
+b = 3 * [0]
+i = 0
+while i < len(a):
+    b[i] = a[i] * len(a) + a[0]
+    a = a
+    i = i + 1
+i = 0
+s = 0
+while i < len(b):
+    s = s + b[i] + len(b)
+    i = i + 1
+print(s)
+"""
+
+def parse(tmp_path: pathlib.Path, src: str, ast: ModuleType) -> Any:
+    f = tmp_path / 'test.py'
+    f.write_text(src)
+    return genericParser.parseFile(str(f), ast)
+
+def run(tmp_path: pathlib.Path, src: str, ast: ModuleType, compileModule: genericCompiler.CompileFun,
+        optLevel: int, input: str = '') -> tuple[int, str]:
+    return testRunner.runSource(str(tmp_path / 'test.py'), src, compileModule, ast, optLevel, input)
+
+def test_loopHoisting(tmp_path: pathlib.Path):
+    m = parse(tmp_path, loopSrc, loop_ast)
+    loop_tychecker.tycheckModule(m)
+    ctx = loop_licm.Ctx()
+    stmts = loop_licm.hoistModule(m, ctx).stmts
+    # n * 2 before the outer loop, i + 1 before the inner loop, i * i stays in the loop
+    hoisted = [s.right for s in stmts if isinstance(s, loop_ast.Assign) and s.var in ctx.freshVars]
+    assert len(hoisted) == 1
+    outer = stmts[-2]
+    assert isinstance(outer, loop_ast.WhileStmt)
+    assert isinstance(outer.cond, loop_ast.BinOp)
+    assert isinstance(outer.cond.right, loop_ast.Name)
+    assert [s.var.name for s in outer.body if isinstance(s, loop_ast.Assign)][:2] == ['j', '@licm_1']
+    assert len(ctx.freshVars) == 2
+    assert run(tmp_path, loopSrc, loop_ast, loop_compiler.compileModule, 0, '3') == \
+        run(tmp_path, loopSrc, loop_ast, loop_compiler.compileModule, 1, '3')
+
+def test_arrayHoisting(tmp_path: pathlib.Path):
+    m = parse(tmp_path, arraySrc, array_ast)
+    array_tychecker.tycheckModule(m)
+    ctx = array_transform.Ctx()
+    stmts = array_transform.transStmts(m.stmts, ctx)
+    n = len(ctx.freshVars)
+    stmts = array_licm.hoistStmts(stmts, ctx)
+    # only len(b) is hoisted: a is assigned in the first loop and subscripts are never hoisted
+    assert len(ctx.freshVars) == n + 1
+    match [s.right for s in stmts if isinstance(s, atom.Assign) and s.var == list(ctx.freshVars)[-1]]:
+        case [atom.Call(atom.Ident('len'), [atom.AtomExp(atom.Name(atom.Ident('b')))])]:
+            pass
+        case x:
+            assert False, x
+    # the bounds check analysis still recognizes the hoisted length
+    assert len(safeSubscripts(stmts)) == 1
+    assert run(tmp_path, arraySrc, array_ast, array_compiler.compileModule, 0) == \
+        run(tmp_path, arraySrc, array_ast, array_compiler.compileModule, 1) == (0, '30\n')
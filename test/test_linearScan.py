@@ -0,0 +1,54 @@
+import assembly.tac_ast as tac
+import assembly.controlFlow as controlFlow
+import assembly.linearScan as linearScan
+from assembly.loopToTac import loopToTac
+import common.genericCompiler as genCompiler
+import common.utils as utils
+import shell
+
+src = """
+n = input_int()
+a = 1
+b = 2
+i = 0
+s = 0
+while i < n:
+    c = a + b
+    s = s + c * i
+    if s > 10:
+        a = a + 1
+    else:
+        b = b + s
+    i = i + 1
+print(s)
+print(a + b)
+"""
+
+def loopSrcToTac(src: str) -> list[tac.instr]:
+    with shell.tempDir() as d:
+        srcFile = shell.pjoin(d, 'input.py')
+        utils.writeTextFile(srcFile, src)
+        return loopToTac(genCompiler.Args(srcFile, shell.pjoin(d, 'out.wasm')))
+
+def test_intervals():
+    g = controlFlow.buildControlFlowGraph(loopSrcToTac('x = input_int()\ny = x + 1\nprint(y)'))
+    intervals = {i.var.name: (i.start, i.end) for i in linearScan.liveIntervals(g)}
+    # $x is defined by instruction 0 and used by instruction 1
+    assert intervals['$x'] == (1, 2)
+    assert intervals['$y'] == (3, 4)
+
+def test_noConflicts():
+    liveness = utils.importModuleNotInStudent('compilers.assembly.liveness')
+    g = controlFlow.buildControlFlowGraph(loopSrcToTac(src))
+    interfG = liveness.buildInterfGraph(g)
+    for maxRegs in [8, 3, 1, 0]:
+        m = linearScan.linearScan(g, maxRegs)
+        regs = {x: m.resolve(x) for x in interfG.vertices}
+        for (x, y) in interfG.edges:
+            assert regs[x] is None or regs[x] != regs[y], f'{x} and {y} share {regs[x]}'
+        used = set(r for r in regs.values() if r is not None)
+        assert len(used) <= maxRegs
+        if maxRegs == 8:
+            assert all(r is not None for r in regs.values())
+        if maxRegs == 1:
+            assert any(r is None for r in regs.values())
@@ -91,6 +91,47 @@ def test_computeLiveness():
     }
     assert builder.before == expectedBefore
     assert builder.after == expectedAfter
+    # equal live sets must not be shared, callers may modify them
+    builder.after[(1, 0)].add(tac.Ident('$x'))
+    assert builder.before[(1, 1)] == set()
+    assert builder.after[(2, 0)] == set()
+
+src4 = """
+n = input_int()
+i = 0
+s = 0
+while i < n:
+    j = 0
+    while j < i:
+        s = s + i * j
+        j = j + 1
+    if s > 10:
+        s = s - n
+    else:
+        s = s + 1
+    i = i + 1
+print(s)
+"""
+
+def test_computeLivenessNested():
+    # Compare with the plain fixpoint iteration over all blocks, built from liveStart
+    ctrlFlowG = controlFlow.buildControlFlowGraph(loopSrcToTac(src4))
+    liveness = utils.importModuleNotInStudent('compilers.assembly.liveness')
+    expected = liveness.InterfGraphBuilder()
+    insets: dict[int, set[tac.ident]] = {v: set() for v in ctrlFlowG.vertices}
+    changes = True
+    while changes:
+        changes = False
+        for v in ctrlFlowG.vertices:
+            out = set[tac.ident]().union(*[insets[w] for w in ctrlFlowG.succs(v)])
+            x = expected.liveStart(ctrlFlowG.getData(v), out)
+            if x != insets[v]:
+                changes = True
+            insets[v] = x
+    builder = liveness.InterfGraphBuilder()
+    builder.liveness(ctrlFlowG)
+    assert builder.before == expected.before
+    assert builder.after == expected.after
 
 def loopToTac(args: genCompiler.Args) -> list[tac.instr]:
     log.debug(f'Compiling to TAC')
@@ -0,0 +1,46 @@
+import lang_var.var_ast as var_ast
+import lang_loop.loop_ast as loop_ast
+import lang_array.array_ast as array_ast
+import lang_var.var_optimize as var_optimize
+import lang_loop.loop_optimize as loop_optimize
+import lang_array.array_optimize as array_optimize
+
+def test_varConstantFolding():
+    x = var_ast.Name(var_ast.Ident('x'))
+    e = var_ast.BinOp(var_ast.BinOp(var_ast.IntConst(2), var_ast.Mul(), var_ast.IntConst(3)),
+                      var_ast.Add(),
+                      var_ast.UnOp(var_ast.USub(), var_ast.IntConst(2**63 - 1)))
+    assert var_optimize.optimizeExp(e) == var_ast.IntConst(-2**63 + 7)
+    e = var_ast.BinOp(var_ast.BinOp(x, var_ast.Mul(), var_ast.IntConst(1)),
+                      var_ast.Add(), var_ast.IntConst(0))
+    assert var_optimize.optimizeExp(e) == x
+    # input_int() must still be called
+    call = var_ast.Call(var_ast.Ident('input_int'), [])
+    e = var_ast.BinOp(call, var_ast.Mul(), var_ast.IntConst(0))
+    assert var_optimize.optimizeExp(e) == e
+
+def test_loopBranches():
+    x = loop_ast.Ident('x')
+    printX = loop_ast.StmtExp(loop_ast.Call(loop_ast.Ident('print'), [loop_ast.Name(x)]))
+    cond = loop_ast.UnOp(loop_ast.Not(), loop_ast.BinOp(loop_ast.IntConst(1), loop_ast.Less(),
+                                                        loop_ast.IntConst(2)))
+    stmts: list[loop_ast.stmt] = [
+        loop_ast.IfStmt(cond, [loop_ast.Assign(x, loop_ast.IntConst(1))], [printX]),
+        loop_ast.WhileStmt(cond, [printX])
+    ]
+    assert loop_optimize.optimizeStmts(stmts) == [printX]
+    b = loop_ast.Name(loop_ast.Ident('b'))
+    notNot = loop_ast.UnOp(loop_ast.Not(), loop_ast.UnOp(loop_ast.Not(), b))
+    assert loop_optimize.optimizeExp(notNot) == b
+    e = loop_ast.BinOp(b, loop_ast.Or(), loop_ast.BinOp(loop_ast.BoolConst(True), loop_ast.And(),
+                                                        loop_ast.BoolConst(False)))
+    assert loop_optimize.optimizeExp(e) == b
+
+def test_arraySubscriptsAreKept():
+    a = array_ast.Name(array_ast.Ident('a'))
+    sub = array_ast.Subscript(a, array_ast.BinOp(array_ast.IntConst(1), array_ast.Sub(),
+                                                 array_ast.IntConst(2)))
+    e = array_ast.BinOp(sub, array_ast.Mul(), array_ast.IntConst(0))
+    assert array_optimize.optimizeExp(e) == \
+        array_ast.BinOp(array_ast.Subscript(a, array_ast.IntConst(-1)), array_ast.Mul(),
+                        array_ast.IntConst(0))
@@ -1,4 +1,5 @@
 from common.prioQueue import *
+import pytest
 
 def lessInt(x: int, y: int) -> bool:
     return x < y
@@ -25,18 +26,20 @@ def test_heapSort():
     heapSort(h)
     assert h.data == [1,2,3,4,5]
 
-def test_prioQueuePushPop():
+@pytest.mark.parametrize("queueClass", [PrioQueue, BucketPrioQueue])
+def test_prioQueuePushPop(queueClass: type):
     d = {'a': 4, 'b': 3, 'c':5, 'd':1, 'e':2}
-    q = PrioQueue[str]()
+    q = queueClass()
     for k, v in d.items():
         q.push(k, v)
     p = ['c', 'a', 'b', 'e', 'd']
     for i in range(0, len(p)):
         assert q.pop() == p[i]
 
-def test_prioQueuePushPopIncreaseKey():
+@pytest.mark.parametrize("queueClass", [PrioQueue, BucketPrioQueue])
+def test_prioQueuePushPopIncreaseKey(queueClass: type):
     d = {'a': 4, 'b': 3, 'c':5, 'd':1, 'e':2}
-    q = PrioQueue[str]()
+    q = queueClass()
     for k, v in d.items():
         q.push(k, v)
     q.incPrio('a')
@@ -48,9 +51,10 @@ def test_prioQueuePushPopIncreaseKey():
     for i in range(0, len(p)):
         assert q.pop() == p[i]
 
-def test_prioQueueIncreaseKey():
+@pytest.mark.parametrize("queueClass", [PrioQueue, BucketPrioQueue])
+def test_prioQueueIncreaseKey(queueClass: type):
     d = {'a': 4, 'b': 3, 'c':5, 'd':1, 'e':2}
-    q = PrioQueue[str]()
+    q = queueClass()
     for k, v in d.items():
         q.push(k, v)
     for k, _ in d.items():
@@ -61,3 +65,14 @@ def test_prioQueueIncreaseKey():
         l.append(k)
     assert l == ['c', 'a', 'b', 'e', 'd']
 
+def test_bucketQueueSecondaryOrder():
+    q = BucketPrioQueue[str]({'a': 1, 'b': 3, 'c': 2})
+    for k in ['a', 'b', 'c', 'd']:
+        q.push(k)
+    q.incPrio('a', 2)
+    q.incPrio('d', 2)
+    q.incPrio('a', 0)
+    assert q.pop() == 'a'
+    q.incPrio('a') # already popped
+    assert [q.pop(), q.pop(), q.pop()] == ['d', 'b', 'c']
+    assert q.isEmpty()
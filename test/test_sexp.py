@@ -0,0 +1,38 @@
+import io
+from common.sexp import *
+from common.wasm import *
+
+def write(s: SExp) -> str:
+    out = io.StringIO()
+    writeSExp(s, out)
+    return out.getvalue()
+
+def test_writeFlat():
+    s = mkNamedSeq('import', SExpStr('env'), SExpStr('print'),
+                   mkNamedSeq('func', SExpId('$print'), mkNamedSeq('param', SExpId('i32'))))
+    assert write(s) == '(import "env" "print" (func $print (param i32)))'
+
+def test_writeNested():
+    instrs: list[WasmInstr] = [
+        WasmInstrConst('i32', 1),
+        WasmInstrIf('i32', [WasmInstrConst('i32', 2)], [WasmInstrConst('i32', 3)]),
+        WasmInstrLoop(WasmId('$l'), [WasmInstrBranch(WasmId('$l'), False)]),
+        WasmInstrDrop()
+    ]
+    f = WasmFunc(WasmId('$f'), [], 'i32', [(WasmId('$x'), 'i64')], instrs)
+    assert write(f.render()) == '\n'.join([
+        '(func $f',
+        '  (result i32)',
+        '  (local $x i64)',
+        '  (i32.const 1)',
+        '  if',
+        '    (result i32)',
+        '    (i32.const 2)',
+        '  else',
+        '    (i32.const 3)',
+        '  end',
+        '  loop $l',
+        '    (br $l)',
+        '  end',
+        '  drop)'
+    ])
@@ -0,0 +1,95 @@
+import assembly.tac_ast as tac
+import assembly.tacOptimize as tacOptimize
+import assembly.tacInterp as tacInterp
+from assembly.loopToTac import loopToTac
+import common.genericCompiler as genCompiler
+import common.utils as utils
+import shell
+import pytest
+
+def name(x: str) -> tac.Name:
+    return tac.Name(tac.Ident(x))
+
+def assign(x: str, e: tac.exp) -> tac.Assign:
+    return tac.Assign(tac.Ident(x), e)
+
+def printVar(x: str) -> tac.Call:
+    return tac.Call(None, tac.Ident('$print_i64'), [name(x)])
+
+def test_propagateAndFold():
+    instrs: list[tac.instr] = [
+        assign('$x', tac.Prim(tac.Const(2))),
+        assign('%R0', tac.BinOp(name('$x'), tac.Op('MUL'), tac.Const(3))),
+        assign('$y', tac.Prim(name('%R0'))),
+        assign('%R1', tac.BinOp(name('$y'), tac.Op('LT_S'), tac.Const(5))),
+        tac.GotoIf(name('%R1'), 'L_then_0'),
+        printVar('$y'),
+        tac.Label('L_then_0'),
+        tac.Call(tac.Ident('$z'), tac.Ident('$input_i64'), []),
+        assign('%R2', tac.Prim(name('$z'))),
+        printVar('%R2')
+    ]
+    assert tacOptimize.optimizeInstrs(instrs) == [
+        tac.Call(None, tac.Ident('$print_i64'), [tac.Const(6)]),
+        tac.Label('L_then_0'),
+        tac.Call(tac.Ident('$z'), tac.Ident('$input_i64'), []),
+        printVar('$z')
+    ]
+
+def test_loopFactsAreMerged():
+    # x is 0 before the loop but changes in the loop, so it must not be replaced by 0
+    instrs: list[tac.instr] = [
+        assign('$x', tac.Prim(tac.Const(0))),
+        tac.Label('$loop_start_1'),
+        assign('%R0', tac.BinOp(name('$x'), tac.Op('LT_S'), tac.Const(3))),
+        tac.GotoIf(name('%R0'), 'L_then_0'),
+        tac.Goto('$loop_exit_1'),
+        tac.Label('L_then_0'),
+        assign('$x', tac.BinOp(name('$x'), tac.Op('ADD'), tac.Const(1))),
+        tac.Goto('$loop_start_1'),
+        tac.Label('$loop_exit_1'),
+        printVar('$x')
+    ]
+    assert tacOptimize.optimizeInstrs(instrs) == instrs
+
+def test_jumpToNext():
+    instrs: list[tac.instr] = [
+        tac.Goto('L_end_1'),
+        tac.Goto('L_other'),
+        tac.Label('L_other'),
+        tac.Label('L_end_1'),
+        printVar('$x')
+    ]
+    assert tacOptimize.optimizeInstrs(instrs) == instrs[2:]
+
+nestedLoops = """
+n = input_int()
+i = 0
+s = 0
+while i < n:
+    j = 0
+    while j < 2:
+        s = s + i * j + 1
+        j = j + 1
+    if s > 5:
+        s = s + 100
+    else:
+        s = s - 1
+    i = i + 1
+print(s)
+"""
+
+def test_sameOutput(capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch):
+    with shell.tempDir() as d:
+        srcFile = shell.pjoin(d, 'input.py')
+        utils.writeTextFile(srcFile, nestedLoops)
+        args = genCompiler.Args(srcFile, shell.pjoin(d, 'out.wasm'), optLevel=0)
+        unoptimized = loopToTac(args)
+        optimized = loopToTac(args, 1)
+    assert len(optimized) < len(unoptimized)
+    def inputInt(_prompt: str) -> int:
+        return 3
+    monkeypatch.setattr(utils, 'inputInt', inputInt)
+    tacInterp.interpInstrs(unoptimized)
+    tacInterp.interpInstrs(optimized)
+    assert capsys.readouterr().out.split() == ['107', '107']
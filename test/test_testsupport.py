@@ -0,0 +1,48 @@
+import concurrent.futures
+import pytest
+import shell
+import common.testsupport as testsupport
+import common.utils as utils
+import common.pyrun as pyrun
+
+def test_getGolden(tmp_path: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(testsupport, '_CACHE_DIR', shell.pjoin(tmp_path, 'cache'))
+    src = shell.pjoin(tmp_path, 'prog.py')
+    utils.writeTextFile(src, 'x = input_int()\nprint(x + 1)\nprint(x == 41)\n')
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(testsupport.getGolden, src, '41') for _ in range(8)]
+        results = [f.result() for f in futures]
+    assert results == ['42\nTrue'] * 8
+    cacheFile = shell.pjoin(tmp_path, 'cache', shell.removeExt(src) + '.golden')
+    assert utils.readTextFile(cacheFile) == '42\nTrue'
+    # changing the source invalidates the cached golden file
+    utils.writeTextFile(src, 'print(input_int() * 2)\n')
+    assert testsupport.getGolden(src, '21') == '42'
+
+def test_getGoldenFails(tmp_path: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(testsupport, '_CACHE_DIR', shell.pjoin(tmp_path, 'cache'))
+    src = shell.pjoin(tmp_path, 'prog.py')
+    utils.writeTextFile(src, 'print(1 // 0)\n')
+    with pytest.raises(Exception, match='failed'):
+        testsupport.getGolden(src, None)
+
+@pytest.mark.parametrize('inThread', [False, True])
+def test_getGoldenTimeoutAndExit(tmp_path: str, monkeypatch: pytest.MonkeyPatch, inThread: bool):
+    monkeypatch.setattr(testsupport, '_CACHE_DIR', shell.pjoin(tmp_path, 'cache'))
+    monkeypatch.setattr(pyrun, 'TIMEOUT', 1)
+    def golden(src: str) -> str:
+        if inThread:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+                return pool.submit(testsupport.getGolden, src, None).result()
+        return testsupport.getGolden(src, None)
+    loop = shell.pjoin(tmp_path, 'loop.py')
+    utils.writeTextFile(loop, 'while True:\n    pass\n')
+    with pytest.raises(Exception, match='failed'):
+        golden(loop)
+    exit0 = shell.pjoin(tmp_path, 'exit0.py')
+    utils.writeTextFile(exit0, 'print(1)\nexit()\nprint(2)\n')
+    assert golden(exit0) == '1'
+    exit1 = shell.pjoin(tmp_path, 'exit1.py')
+    utils.writeTextFile(exit1, 'print(1)\nexit(1)\n')
+    with pytest.raises(Exception, match='failed'):
+        golden(exit1)
@@ -0,0 +1,40 @@
+import json
+import subprocess
+import shell
+import common.timings as timings
+import common.utils as utils
+
+def test_phases():
+    with timings.phase('ignored'):
+        pass
+    assert timings.phases() == []
+    timings.enable()
+    try:
+        with timings.phase('outer'):
+            with timings.phase('inner'):
+                x = [0] * 100000
+            del x
+        ps = timings.phases()
+    finally:
+        timings.disable()
+    assert [(p.name, p.depth) for p in ps] == [('outer', 0), ('inner', 1)]
+    assert ps[0].wallSeconds >= ps[1].wallSeconds
+    assert ps[1].peakMemBytes >= 800000
+    assert ps[0].peakMemBytes >= ps[1].peakMemBytes
+    assert 'inner' in timings.formatText(ps)
+
+def test_timingsFlag(tmp_path: str):
+    src = shell.pjoin(tmp_path, 'input.py')
+    utils.writeTextFile(src, 'print(1)\n')
+    res = subprocess.run(['python', 'src/main.py', '--lang=var', 'interp', '--timings=json', src],
+                         capture_output=True, text=True)
+    assert res.returncode == 0
+    assert res.stdout.strip() == '1'
+    report = json.loads(res.stderr.strip().splitlines()[-1])
+    assert [p['name'] for p in report['phases']] == ['parse', 'interp']
+    res = subprocess.run(['python', 'src/main.py', '--lang=var', 'compile', '--no-cache',
+                          '--timings', '--output', shell.pjoin(tmp_path, 'out.wasm'), src],
+                         capture_output=True, text=True)
+    assert res.returncode == 0
+    for phase in ['parse', 'type check', 'codegen', 'encode wasm']:
+        assert phase in res.stderr
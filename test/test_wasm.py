@@ -0,0 +1,22 @@
+import pickle
+from common.wasm import *
+
+def test_interning():
+    assert WasmInstrConst('i32', 4) is WasmInstrConst('i32', 4)
+    assert WasmInstrVarLocal('get', WasmId('$x')) is WasmInstrVarLocal('get', WasmId('$x'))
+    assert WasmInstrDrop() is WasmInstrDrop()
+    # equal but differently typed arguments give different nodes
+    assert WasmInstrConst('f64', 1.0) is not WasmInstrConst('f64', 1)
+    assert WasmInstrConst('i32', 5) is not WasmInstrConst('i32', 4)
+    # nodes with nested instructions are not shared
+    assert WasmInstrLoop(WasmId('$l'), []) is not WasmInstrLoop(WasmId('$l'), [])
+
+def test_picklePreservesSharing():
+    i = WasmInstrNumBinOp('i64', 'add')
+    [j, k] = pickle.loads(pickle.dumps([i, WasmInstrBranch(WasmId('$l'), True)]))
+    assert j is i
+    assert k is WasmInstrBranch(WasmId('$l'), True)
+
+def test_slots():
+    assert not hasattr(WasmInstrConst('i32', 4), '__dict__')
+    assert not hasattr(WasmFunc(WasmId('$f'), [], None, [], []), '__dict__')
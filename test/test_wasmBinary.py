@@ -0,0 +1,105 @@
+import pytest
+from common.wasm import *
+import common.wasmBinary as wasmBinary
+from common.sexp import renderSExp
+
+def test_leb128():
+    assert wasmBinary.unsignedLeb128(0) == b'\x00'
+    assert wasmBinary.unsignedLeb128(127) == b'\x7f'
+    assert wasmBinary.unsignedLeb128(128) == b'\x80\x01'
+    assert wasmBinary.unsignedLeb128(624485) == b'\xe5\x8e\x26'
+    assert wasmBinary.signedLeb128(0) == b'\x00'
+    assert wasmBinary.signedLeb128(-1) == b'\x7f'
+    assert wasmBinary.signedLeb128(63) == b'\x3f'
+    assert wasmBinary.signedLeb128(64) == b'\xc0\x00'
+    assert wasmBinary.signedLeb128(-64) == b'\x40'
+    assert wasmBinary.signedLeb128(-65) == b'\xbf\x7f'
+    assert wasmBinary.signedLeb128(-123456) == b'\xc0\xbb\x78'
+    with pytest.raises(wasmBinary.EncodeError):
+        wasmBinary.unsignedLeb128(-1)
+
+def mkModule(instrs: list[WasmInstr], locals: list[tuple[WasmId, WasmValtype]]=[]) -> WasmModule:
+    idMain = WasmId('$main')
+    return WasmModule(
+        imports=[WasmImport('env', 'memory', WasmImportMemory(1, None)),
+                 WasmImport('env', 'print_i64', WasmImportFunc(WasmId('$print_i64'), ['i64'], None))],
+        exports=[WasmExport('main', WasmExportFunc(idMain))],
+        globals=[WasmGlobal(WasmId('$g'), 'i32', True, [WasmInstrConst('i32', 100)])],
+        data=[WasmData(0, 'ab')],
+        funcTable=WasmFuncTable([]),
+        funcs=[WasmFunc(idMain, [], None, locals, instrs)])
+
+def codeSection(b: bytes) -> bytes:
+    i = 8
+    while i < len(b):
+        sid = b[i]
+        size = b[i + 1] # all test modules are small
+        if sid == 10:
+            return b[i + 2:i + 2 + size]
+        i += 2 + size
+    raise ValueError('no code section')
+
+def test_encodeModule():
+    x = WasmId('$x')
+    b = wasmBinary.encodeModule(mkModule([
+        WasmInstrConst('i64', -1),
+        WasmInstrVarLocal('set', x),
+        WasmInstrBlock(WasmId('$exit'), None, [
+            WasmInstrLoop(WasmId('$loop'), [
+                WasmInstrConst('i32', 1),
+                WasmInstrBranch(WasmId('$exit'), True),
+                WasmInstrComment('ignored'),
+                WasmInstrConst('i32', 4294967295),
+                WasmInstrIf(None, [WasmInstrBranch(WasmId('$loop'), False)], [])
+            ])
+        ]),
+        WasmInstrVarLocal('get', x),
+        WasmInstrCall(WasmId('$print_i64'))
+    ], [(x, 'i64')]))
+    assert b[:8] == wasmBinary.MAGIC + wasmBinary.VERSION
+    body = bytes([
+        0x01, 0x01, 0x7e, # one local of type i64
+        0x42, 0x7f, 0x21, 0x00, # i64.const -1, local.set 0
+        0x02, 0x40, 0x03, 0x40, # block, loop
+        0x41, 0x01, 0x0d, 0x01, # i32.const 1, br_if 1
+        0x41, 0x7f, # i32.const -1
+        0x04, 0x40, 0x0c, 0x01, 0x0b, # if br 1 end (empty else omitted)
+        0x0b, 0x0b, # end loop, end block
+        0x20, 0x00, 0x10, 0x00, # local.get 0, call 0
+        0x0b])
+    assert codeSection(b) == bytes([1, len(body)]) + body
+
+def test_bulkMemory():
+    b = wasmBinary.encodeModule(mkModule([
+        WasmInstrConst('i32', 0), WasmInstrConst('i32', 0), WasmInstrConst('i32', 8),
+        WasmInstrMemBulk('fill'),
+        WasmInstrConst('i32', 8), WasmInstrConst('i32', 0), WasmInstrConst('i32', 8),
+        WasmInstrMemBulk('copy'),
+        WasmInstrMemSize('size'), WasmInstrMemSize('grow'), WasmInstrDrop()
+    ]))
+    body = bytes([
+        0x00, # no locals
+        0x41, 0x00, 0x41, 0x00, 0x41, 0x08, 0xfc, 0x0b, 0x00, # memory.fill
+        0x41, 0x08, 0x41, 0x00, 0x41, 0x08, 0xfc, 0x0a, 0x00, 0x00, # memory.copy
+        0x3f, 0x00, 0x40, 0x00, 0x1a, # memory.size, memory.grow, drop
+        0x0b])
+    assert codeSection(b) == bytes([1, len(body)]) + body
+
+def test_passiveData():
+    d = WasmId('$d')
+    m = mkModule([WasmInstrConst('i32', 8), WasmInstrConst('i32', 0), WasmInstrConst('i32', 2),
+                  WasmInstrMemInit(d)])
+    m.data.append(WasmDataPassive(d, b'\x01\x02'))
+    b = wasmBinary.encodeModule(m)
+    body = bytes([
+        0x00, # no locals
+        0x41, 0x08, 0x41, 0x00, 0x41, 0x02, 0xfc, 0x08, 0x01, 0x00, # memory.init of segment 1
+        0x0b])
+    assert codeSection(b) == bytes([1, len(body)]) + body
+    assert bytes([12, 1, 2]) in b # data count section
+    assert bytes([0x01, 0x02, 0x01, 0x02]) in b # passive segment
+    assert '(data $d "\\01\\02")' in renderSExp(m.render())
+
+def test_unknownLabel():
+    with pytest.raises(wasmBinary.EncodeError):
+        wasmBinary.encodeModule(mkModule([WasmInstrBranch(WasmId('$nowhere'), False)]))
@@ -0,0 +1,180 @@
+import dataclasses
+import io
+import sys
+import pytest
+import shell
+import common.constants as constants
+import common.genericCompiler as genericCompiler
+import common.log as log
+import common.testsupport as testsupport
+import common.wasmInterp as wasmInterp
+from common.compileServer import exitCodeOf
+from common.compilerSupport import CompilerConfig, wasmImports
+from common.langModules import importModule, getFun
+from common.wasm import *
+
+def mkModule(instrs: list[WasmInstr], locals: list[tuple[WasmId, WasmValtype]] = [],
+             funcs: list[WasmFunc] = [], table: list[WasmId] = [],
+             data: list[WasmDataPassive] = []) -> WasmModule:
+    main = WasmFunc(WasmId('$main'), [], None, locals, instrs)
+    return WasmModule(wasmImports(1), [WasmExport('main', WasmExportFunc(WasmId('$main')))],
+                      [], [WasmData(0, 'hello'), *data], WasmFuncTable(table), funcs + [main])
+
+def runInstrs(instrs: list[WasmInstr], **kw: Any) -> tuple[int, str, str]:
+    out = io.StringIO()
+    err = io.StringIO()
+    code = wasmInterp.runModule(mkModule(instrs, **kw), wasmInterp.WasmEnv(io.StringIO(), out, err))
+    return (code, out.getvalue(), err.getvalue())
+
+def i64(n: int) -> WasmInstr:
+    return WasmInstrConst('i64', n)
+
+def i32(n: int) -> WasmInstr:
+    return WasmInstrConst('i32', n)
+
+printI64 = WasmInstrCall(WasmId('$print_i64'))
+printI32 = WasmInstrCall(WasmId('$print_i32'))
+
+def test_arithmeticWraps():
+    code, out, _ = runInstrs([
+        i64(2**63 - 1), i64(1), WasmInstrNumBinOp('i64', 'add'), printI64,
+        i32(-1), i32(28), WasmInstrNumBinOp('i32', 'shr_u'), printI32,
+        i64(-1), WasmInstrConvOp('i32.wrap_i64'), WasmInstrConvOp('i64.extend_i32_u'), printI64,
+        i32(-1), i32(1), WasmInstrIntRelOp('i32', 'lt_u'), WasmInstrCall(WasmId('$print_bool'))
+    ])
+    assert code == 0
+    assert out.split() == [str(-2**63), '15', str(2**32 - 1), 'False']
+
+def test_loopAndBranches():
+    x = WasmId('$x')
+    loop = WasmInstrLoop(WasmId('$loop'), [
+        WasmInstrVarLocal('get', x), i64(3), WasmInstrIntRelOp('i64', 'ge_s'),
+        WasmInstrBranch(WasmId('$exit'), True),
+        WasmInstrVarLocal('get', x), printI64,
+        WasmInstrVarLocal('get', x), i64(1), WasmInstrNumBinOp('i64', 'add'),
+        WasmInstrVarLocal('set', x),
+        WasmInstrBranch(WasmId('$loop'), False)
+    ])
+    code, out, _ = runInstrs([
+        WasmInstrBlock(WasmId('$exit'), None, [loop]),
+        WasmInstrBlock(WasmId('$b'), 'i64', [
+            i64(1), i64(42), WasmInstrBranch(WasmId('$b'), False), WasmInstrTrap()]),
+        printI64
+    ], locals=[(x, 'i64')])
+    assert code == 0
+    assert out.split() == ['0', '1', '2', '42']
+
+def test_callIndirect():
+    f = WasmFunc(WasmId('$f'), [(WasmId('$a'), 'i64')], 'i64', [],
+                 [WasmInstrVarLocal('get', WasmId('$a')), i64(2), WasmInstrNumBinOp('i64', 'mul')])
+    code, out, _ = runInstrs([i64(21), i32(0), WasmInstrCallIndirect(['i64'], 'i64'), printI64],
+                             funcs=[f], table=[WasmId('$f')])
+    assert code == 0
+    assert out.strip() == '42'
+    code, _, err = runInstrs([i32(0), WasmInstrCallIndirect([], 'i64'), printI64],
+                             funcs=[f], table=[WasmId('$f')])
+    assert code == constants.RUN_ERROR_EXIT_CODE
+    assert 'type mismatch' in err
+
+def test_memory():
+    code, out, err = runInstrs([
+        i32(0), i32(5), WasmInstrCall(WasmId('$print')),
+        i32(1000), i64(-7), WasmInstrMem('i64', 'store'),
+        i32(1000), WasmInstrMem('i64', 'load'), printI64,
+        i32(0), i32(5), WasmInstrCall(WasmId('$print_err')),
+        i32(65536 - 3), WasmInstrMem('i32', 'load'), printI32
+    ])
+    assert code == constants.RUN_ERROR_EXIT_CODE
+    assert out.split() == ['hello', '-7']
+    assert 'ERROR: hello' in err
+    assert 'out of bounds' in err
+
+def test_memoryGrow():
+    size = WasmInstrMemSize('size')
+    grow = WasmInstrMemSize('grow')
+    code, out, _ = runInstrs([size, printI32, i32(0), grow, printI32, i32(1), grow, printI32])
+    assert code == 0
+    assert out.split() == ['1', '1', '-1'] # wasmImports(1) allows at most one page
+    m = mkModule([i32(2), grow, printI32, size, printI32, i32(3 * 65536 - 8), i64(5),
+                  WasmInstrMem('i64', 'store')])
+    m = dataclasses.replace(m, imports=wasmImports(4))
+    out = io.StringIO()
+    assert wasmInterp.runModule(m, wasmInterp.WasmEnv(io.StringIO(), out, out)) == 0
+    assert out.getvalue().split() == ['1', '3']
+
+def test_bulkMemory():
+    code, out, err = runInstrs([
+        i32(1000), i32(0xFF), i32(8), WasmInstrMemBulk('fill'),
+        i32(1000), WasmInstrMem('i64', 'load'), printI64,
+        i32(1004), i32(1000), i32(8), WasmInstrMemBulk('copy'),
+        i32(1008), WasmInstrMem('i32', 'load'), printI32,
+        i32(65530), i32(0), i32(7), WasmInstrMemBulk('fill')
+    ])
+    assert code == constants.RUN_ERROR_EXIT_CODE
+    assert out.split() == ['-1', '-1']
+    assert 'out of bounds' in err
+
+def test_memoryInit():
+    d = WasmId('$d')
+    code, out, err = runInstrs([
+        i32(1000), i32(0), i32(8), WasmInstrMemInit(d),
+        i32(1000), WasmInstrMem('i64', 'load'), printI64,
+        i32(1000), i32(4), i32(4), WasmInstrMemInit(d),
+        i32(1000), WasmInstrMem('i32', 'load'), printI32,
+        # the data at address 0 is still there
+        i32(0), WasmInstrMem('i32', 'load'), printI32,
+        i32(1000), i32(4), i32(5), WasmInstrMemInit(d)
+    ], data=[WasmDataPassive(d, (-2).to_bytes(8, 'little', signed=True))])
+    assert code == constants.RUN_ERROR_EXIT_CODE
+    assert out.split() == ['-2', '-1', str(int.from_bytes(b'hell', 'little'))]
+    assert 'out of bounds' in err
+
+def compileAndRun(lang: str, srcFile: str, input: str|None, extraArgs: str|None) -> shell.RunResult:
+    cfg = CompilerConfig(CompilerConfig.defaultMaxMemSize, CompilerConfig.defaultMaxArraySize)
+    for a in (extraArgs or '').split():
+        (k, _, v) = a.partition('=')
+        match k:
+            case '--max-mem-size': cfg = dataclasses.replace(cfg, maxMemSize=int(v))
+            case '--max-array-size': cfg = dataclasses.replace(cfg, maxArraySize=int(v))
+            case '--gc': cfg = dataclasses.replace(cfg, gc=True)
+            case _: raise ValueError(f'Unsupported argument in .args file: {a}')
+    err = io.StringIO()
+    oldStderr = sys.stderr
+    oldStreams = log.setConsoleStream(err)
+    sys.stderr = err
+    try:
+        ast = importModule(lang, 'ast')
+        compileFun = getFun(importModule(lang, 'compile'), 'compileModule')
+        wasmMod = genericCompiler.compileToModule(compileFun, ast, cfg, srcFile)
+    except SystemExit as e:
+        return shell.RunResult('', err.getvalue(), exitCodeOf(e))
+    finally:
+        sys.stderr = oldStderr
+        log.restoreConsoleStream(oldStreams)
+    out = io.StringIO()
+    env = wasmInterp.WasmEnv(io.StringIO(input or ''), out, err)
+    code = wasmInterp.runModule(wasmMod, env)
+    if code != 0:
+        return shell.RunResult(err.getvalue(), err.getvalue(), code)
+    return shell.RunResult(out.getvalue(), err.getvalue(), code)
+
+@pytest.mark.instructor
+@pytest.mark.parametrize("lang, srcFile",
+                         testsupport.collectTestFiles(['test_files'], ['var', 'loop', 'array']))
+def test_wasmInterp(lang: str, srcFile: str):
+    testsupport.runFileTest(
+        srcFile,
+        lambda _captureErr, input, extraArgs: compileAndRun(lang, srcFile, input, extraArgs)
+    )
+
+@pytest.mark.instructor
+@pytest.mark.parametrize("name", ['array_not_out_of_mem', 'array_not_out_of_mem_bool',
+                                  'array_not_out_of_mem_arr'])
+def test_gcSanityChecks(name: str):
+    # With --gc, arrays filling the whole memory must still fit
+    srcFile = shell.pjoin('test_files', 'lang_array', 'sanity-checks', name + '.py')
+    testsupport.runFileTest(
+        srcFile,
+        lambda _captureErr, input, extraArgs: \
+            compileAndRun('array', srcFile, input, (extraArgs or '') + ' --gc')
+    )
@@ -0,0 +1,61 @@
+from common.wasm import *
+from common.wasmLocals import optimizeFunc
+
+a, b, c, d = WasmId('$a'), WasmId('$b'), WasmId('$c'), WasmId('$d')
+printI64 = WasmInstrCall(WasmId('$print_i64'))
+
+def i64(n: int) -> WasmInstr:
+    return WasmInstrConst('i64', n)
+
+def get(x: WasmId) -> WasmInstr:
+    return WasmInstrVarLocal('get', x)
+
+def set(x: WasmId) -> WasmInstr:
+    return WasmInstrVarLocal('set', x)
+
+def mkFunc(instrs: list[WasmInstr]) -> WasmFunc:
+    return WasmFunc(WasmId('$main'), [], None,
+                    [(a, 'i64'), (b, 'i64'), (c, 'i64'), (d, 'i32')], instrs)
+
+def test_removeUnused():
+    f = optimizeFunc(mkFunc([i64(1), set(a), i64(2), WasmInstrVarLocal('tee', b), printI64]))
+    assert f.locals == []
+    assert f.instrs == [i64(1), WasmInstrDrop(), i64(2), printI64]
+
+def test_packing():
+    f = optimizeFunc(mkFunc([
+        i64(1), set(a), get(a), printI64,
+        i64(2), set(b), get(b), printI64,
+        WasmInstrConst('i32', 3), set(d), get(d), WasmInstrCall(WasmId('$print_i32'))
+    ]))
+    assert f.locals == [(a, 'i64'), (d, 'i32')]
+    assert f.instrs[4:7] == [i64(2), set(a), get(a)]
+
+def test_noPackingOfOverlappingLocals():
+    f = optimizeFunc(mkFunc([
+        i64(1), set(a), i64(2), set(b), get(a), get(b), WasmInstrNumBinOp('i64', 'add'), printI64
+    ]))
+    assert f.locals == [(a, 'i64'), (b, 'i64')]
+
+def test_loopCarriedLocal():
+    # b is live around the loop because its value from the previous iteration is printed
+    loop = WasmInstrLoop(WasmId('$loop'), [
+        get(b), printI64,
+        i64(7), set(c), get(c), set(b),
+        get(a), i64(1), WasmInstrNumBinOp('i64', 'sub'), WasmInstrVarLocal('tee', a),
+        WasmInstrBranch(WasmId('$loop'), True)
+    ])
+    f = optimizeFunc(mkFunc([i64(3), set(a), i64(0), set(b), loop]))
+    assert f.locals == [(a, 'i64'), (b, 'i64')]
+    # c is only live between its set and get, so it shares its slot with a or b
+    match f.instrs[-1]:
+        case WasmInstrLoop(_, body):
+            assert body[3] in [set(a), set(b)]
+        case _:
+            assert False
+
+def test_readBeforeWrite():
+    # a is read before it is written, so it must keep the initial value 0
+    f = optimizeFunc(mkFunc([get(a), printI64, i64(1), set(b), get(b), printI64,
+                             i64(2), set(a), get(a), printI64]))
+    assert f.locals == [(a, 'i64'), (b, 'i64')]
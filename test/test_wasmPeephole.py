@@ -0,0 +1,44 @@
+from common.wasm import *
+from common.wasmPeephole import optimizeInstrs
+
+x = WasmId('$x')
+printI64 = WasmInstrCall(WasmId('$print_i64'))
+
+def i64(n: int) -> WasmInstr:
+    return WasmInstrConst('i64', n)
+
+def i32(n: int) -> WasmInstr:
+    return WasmInstrConst('i32', n)
+
+def test_tee():
+    instrs: list[WasmInstr] = [i64(1), WasmInstrVarLocal('set', x), WasmInstrVarLocal('get', x),
+                               printI64]
+    assert optimizeInstrs(instrs) == [i64(1), WasmInstrVarLocal('tee', x), printI64]
+    instrs = [i64(1), WasmInstrVarLocal('tee', x), WasmInstrDrop()]
+    assert optimizeInstrs(instrs) == [i64(1), WasmInstrVarLocal('set', x)]
+
+def test_constantFolding():
+    instrs: list[WasmInstr] = [
+        i64(1), i64(2), i64(3), WasmInstrNumBinOp('i64', 'mul'), WasmInstrNumBinOp('i64', 'add'),
+        printI64,
+        i32(2**31 - 1), i32(1), WasmInstrNumBinOp('i32', 'add'), WasmInstrConvOp('i64.extend_i32_s'),
+        printI64,
+        i64(1), i64(2), WasmInstrIntRelOp('i64', 'lt_s'), WasmInstrCall(WasmId('$print_bool'))
+    ]
+    assert optimizeInstrs(instrs) == [
+        i64(7), printI64, i64(-2**31), printI64, i32(1), WasmInstrCall(WasmId('$print_bool'))
+    ]
+
+def test_dropAndIf():
+    instrs: list[WasmInstr] = [
+        i32(1), WasmInstrDrop(),
+        WasmInstrVarLocal('get', x), WasmInstrIf(None, [], []),
+        i32(0), WasmInstrIf('i64', [i64(1)], [i64(2), i64(3), WasmInstrNumBinOp('i64', 'add')]),
+        printI64,
+        WasmInstrBlock(WasmId('$b'), None, [i64(4), WasmInstrVarLocal('set', x),
+                                            WasmInstrVarLocal('get', x), WasmInstrDrop()])
+    ]
+    assert optimizeInstrs(instrs) == [
+        i64(5), printI64,
+        WasmInstrBlock(WasmId('$b'), None, [i64(4), WasmInstrVarLocal('set', x)])
+    ]
@@ -0,0 +1,7 @@
+# The first array ends exactly at the end of the first memory page,
+# so the header of the second array is stored in the next page.
+
+a = 8179 * [0]
+b = 1 * [7]
+print(b[0])
+print(len(a))
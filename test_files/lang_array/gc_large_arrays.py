@@ -0,0 +1,9 @@
+# Arrays too big for a power-of-two block in 64kB get blocks of exact size, which are reused.
+i = 0
+s = 0
+while i < 20:
+    a = 3000 * [i]
+    b = [i, i + 1]
+    s = s + a[2999] + b[1] + len(a)
+    i = i + 1
+print(s)
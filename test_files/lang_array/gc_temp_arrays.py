@@ -0,0 +1,17 @@
+# Creates many temporary arrays. Without --gc, these do not fit into 64kB of memory.
+keep = [[1, 2], [3]]
+s = 0
+i = 0
+j = 0
+while i < 60:
+    tmp = 1000 * [i]
+    nested = [tmp, 5 * [i + 1], keep[0]]
+    s = s + tmp[999] + nested[1][4] + len(nested)
+    if j == 20:
+        keep = [nested[0], [i]]
+        j = 0
+    i = i + 1
+    j = j + 1
+print(s)
+print(keep[0][0] + keep[1][0])
+print(len(keep[0]))